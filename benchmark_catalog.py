@@ -0,0 +1,191 @@
+"""
+Diagnostic Catalog Benchmark
+Generates synthetic error catalogs and measures DiagnosticEngine query latency.
+
+Usage:
+    python benchmark_catalog.py                      # 1k, 10k and 100k entries
+    python benchmark_catalog.py --sizes 1000 50000   # custom sizes
+    python benchmark_catalog.py --write-catalog synthetic.json --sizes 10000
+
+The "snapshot" backend compiles the catalog with build_catalog_snapshot.py's
+format first and measures loading it through the memory-mapped snapshot. The
+"semantic" backend builds the semantic index (load ms) and times
+semantic-match queries instead of the detection pipeline.
+
+The synthetic entries follow the error_codes_complete.json schema
+(Error_Code, Tittle, Description, Solution), so the generated file can also
+be loaded directly by the application for manual testing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from chatbot.engine.diagnostic_engine import DiagnosticEngine
+from chatbot.engine.error_catalog import ErrorCatalog
+from chatbot.utils.catalog_snapshot import SNAPSHOT_SUFFIX
+from chatbot.utils.text_utils import normalize_text
+from chatbot.utils.vector_index import numpy_available
+
+COMPONENTS = [
+    "gun", "rectifier", "relay board", "contactor", "energy meter", "modem",
+    "hmi", "plc", "controller", "rfid reader", "led board", "fuse", "cable",
+    "connector", "inverter", "cooling fan", "power module", "dc meter",
+]
+FAULTS = [
+    "communication fail", "temperature high", "over voltage", "under voltage",
+    "over current", "failure", "timeout", "fault", "trip", "damage",
+    "calibration error", "self test failed", "firmware mismatch",
+]
+VENDORS = ["alpha", "volt", "ion", "terra", "nova", "apex", "zen", "orbit"]
+DESCRIPTION_TEMPLATES = [
+    "The {component} reported {fault} during the charging session",
+    "{fault} detected on the {component} of the {vendor} charger",
+    "Station stopped because the {component} indicates {fault}",
+]
+SOLUTION_TEMPLATES = [
+    "Check the {component} wiring and connection tightness.",
+    "Restart the charger and verify the {component} status on the HMI.",
+    "If the {fault} persists, contact {vendor} technical support.",
+]
+
+QUERIES = [
+    "ER00042",
+    "rectifier communication fail",
+    "gun temperature is too high after charging",
+    "my charger shows relay board over current again",
+    "energy meter calibration error on terra station",
+    "hello there",
+    "the cooling fan makes noise and the station stopped " * 20,
+]
+
+
+def generate_synthetic_catalog(size: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """
+    Generate a synthetic multi-vendor error catalog.
+    
+    Args:
+        size: Number of entries
+        seed: Random seed for reproducible catalogs
+    
+    Returns:
+        List of catalog entries in the error_codes_complete.json schema
+    """
+    rng = random.Random(seed)
+    catalog = []
+    
+    for i in range(size):
+        component = rng.choice(COMPONENTS)
+        fault = rng.choice(FAULTS)
+        vendor = rng.choice(VENDORS)
+        words = {"component": component, "fault": fault, "vendor": vendor}
+        
+        catalog.append({
+            "Error_Code": f"ER{i:05d}",
+            "Tittle": f"{vendor.title()} {component.title()} {fault.title()} {i}",
+            "Description": rng.choice(DESCRIPTION_TEMPLATES).format(**words),
+            "Solution": [template.format(**words) for template in SOLUTION_TEMPLATES],
+        })
+    
+    return catalog
+
+
+async def benchmark(size: int, backend: str, rounds: int) -> Dict[str, Any]:
+    """
+    Load a synthetic catalog and time uncached detection queries.
+    
+    Args:
+        size: Catalog size
+        backend: Scoring backend ("python", "numpy", "snapshot" or "semantic")
+        rounds: Passes over the query set
+    
+    Returns:
+        Timing summary
+    """
+    catalog = generate_synthetic_catalog(size)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "catalog.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(catalog, f)
+        
+        if backend == "snapshot":
+            ErrorCatalog.from_file("default", path, "numpy").write_snapshot(
+                os.path.splitext(path)[0] + SNAPSHOT_SUFFIX, source_path=path
+            )
+        
+        engine = DiagnosticEngine(
+            error_codes_path=path,
+            scoring_backend={"snapshot": "python", "semantic": "numpy"}.get(backend, backend)
+        )
+        engine.use_snapshots = backend == "snapshot"
+        engine.semantic_enabled = backend == "semantic"
+        
+        start = time.perf_counter()
+        await engine.load_error_codes()
+        load_ms = (time.perf_counter() - start) * 1000
+    
+    # Time the uncached pipeline; the detection cache would hide the scoring cost
+    queries = [normalize_text(query) for query in QUERIES]
+    if backend == "semantic":
+        def run(query):
+            return engine.catalog.semantic_match(
+                query, engine.semantic_threshold, engine.semantic_nprobe
+            )
+    else:
+        run = engine._detect
+    
+    timings = []
+    for _ in range(rounds):
+        for query in queries:
+            start = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - start) * 1000)
+    
+    timings.sort()
+    return {
+        "size": size,
+        "backend": "semantic" if backend == "semantic"
+        else "snapshot" if engine.catalog.snapshot_path else engine.scoring_backend,
+        "load_ms": load_ms,
+        "median_ms": statistics.median(timings),
+        "p99_ms": timings[int(len(timings) * 0.99) - 1],
+    }
+
+
+async def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--backends", nargs="+", default=["python", "numpy", "snapshot", "semantic"])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--write-catalog", help="Write a synthetic catalog of the first size and exit")
+    args = parser.parse_args()
+    
+    if args.write_catalog:
+        with open(args.write_catalog, "w", encoding="utf-8") as f:
+            json.dump(generate_synthetic_catalog(args.sizes[0]), f, indent=2)
+        print(f"Wrote {args.sizes[0]} entries to {args.write_catalog}")
+        return
+    
+    backends = args.backends
+    if not numpy_available():
+        print("numpy is not installed, skipping numpy, snapshot and semantic backends")
+        backends = [backend for backend in backends if backend == "python"]
+    
+    print(f"{'entries':>8} {'backend':>8} {'load ms':>10} {'median ms':>10} {'p99 ms':>10}")
+    for size in args.sizes:
+        for backend in backends:
+            result = await benchmark(size, backend, args.rounds)
+            print(
+                f"{result['size']:>8} {result['backend']:>8} {result['load_ms']:>10.1f} "
+                f"{result['median_ms']:>10.3f} {result['p99_ms']:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
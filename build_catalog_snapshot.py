@@ -0,0 +1,84 @@
+"""
+Catalog Snapshot Builder
+Compiles error catalogs and their search indexes into memory-mappable snapshots.
+
+Usage:
+    python build_catalog_snapshot.py                        # error_codes_complete.json + catalogs/*.json
+    python build_catalog_snapshot.py catalogs/acme_dc.json  # specific catalogs
+
+Each <catalog>.json gets a <catalog>.bin next to it, plus the semantic index
+<catalog>.vec. The application maps both read-only at startup (shared by every
+worker) and falls back to the JSON when the snapshot is missing or was built
+from an older JSON or synonyms.json (the semantic index is then rebuilt at
+startup). Re-run this after editing a catalog or the synonym table. Requires
+numpy.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from chatbot.core.config import get_settings
+from chatbot.engine.diagnostic_engine import DiagnosticEngine
+from chatbot.engine.error_catalog import ErrorCatalog
+from chatbot.utils.catalog_snapshot import SNAPSHOT_SUFFIX, file_sha256
+from chatbot.utils.semantic_index import SEMANTIC_SUFFIX
+from chatbot.utils.synonyms import SynonymTable
+from chatbot.utils.vector_index import numpy_available
+
+
+def default_sources() -> list:
+    """Get the default catalog and every namespaced catalog."""
+    engine = DiagnosticEngine()
+    sources = [Path(engine.error_codes_path)]
+    if engine.catalogs_dir.is_dir():
+        sources.extend(sorted(engine.catalogs_dir.glob("*.json")))
+    return sources
+
+
+def build(source: Path, synonyms: SynonymTable) -> Path:
+    """
+    Compile one catalog JSON into a snapshot.
+    
+    Args:
+        source: Catalog JSON file
+        synonyms: Synonym table compiled into the keyword index
+    
+    Returns:
+        Path of the written snapshot
+    """
+    catalog = ErrorCatalog.from_file(source.stem, str(source), scoring_backend="numpy", synonyms=synonyms)
+    target = source.with_suffix(SNAPSHOT_SUFFIX)
+    catalog.write_snapshot(str(target), source_path=str(source))
+    
+    semantic_path = source.with_suffix(SEMANTIC_SUFFIX)
+    semantic_path.unlink(missing_ok=True)
+    catalog.load_semantic_index(str(semantic_path), fingerprint=file_sha256(str(source)))
+    return target
+
+
+def main() -> int:
+    """Build snapshots from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sources", nargs="*", type=Path, help="Catalog JSON files")
+    args = parser.parse_args()
+    
+    if not numpy_available():
+        print("numpy is required to build catalog snapshots (pip install numpy)")
+        return 1
+    
+    if not get_settings().CATALOG_SNAPSHOTS_ENABLED:
+        print("Note: CATALOG_SNAPSHOTS_ENABLED is false, the application will ignore snapshots")
+    
+    synonyms = SynonymTable.from_file(DiagnosticEngine().synonyms_path)
+    for source in args.sources or default_sources():
+        start = time.perf_counter()
+        target = build(source, synonyms)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{source} -> {target} ({target.stat().st_size / 1024:.0f} KiB, {elapsed_ms:.0f} ms)")
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -101,6 +101,16 @@ async def lifespan(app: FastAPI):
             f"✓ Diagnostic engine loaded: {diagnostic_engine.get_total_error_count()} error codes"
         )
         
+        # Worker processes of CPU_OFFLOAD_MODE=process spawn now, not on the first long message
+        await diagnostic_engine.offload.start()
+        
+        # Same domain synonyms as the diagnostic keyword index
+        intent_engine.apply_synonyms(diagnostic_engine.synonyms)
+        intent_engine.load_classifier(
+            settings.INTENT_CLASSIFIER_PATH,
+            threshold=settings.INTENT_CLASSIFIER_THRESHOLD
+        )
+        
         # ──────────────────────────────────────────────────────────
         # 3. Initialize Conversation Manager
         # ──────────────────────────────────────────────────────────
@@ -111,6 +121,7 @@ async def lifespan(app: FastAPI):
             session_service=session_service,
             ai_service=ai_service
         )
+        conversation_manager.load_response_fragments()
         
         # Inject into routes
         set_conversation_manager(conversation_manager)
@@ -132,6 +143,12 @@ async def lifespan(app: FastAPI):
     # SHUTDOWN
     # ═══════════════════════════════════════════════════════════════
     logger.info("Shutting down application...")
+    if conversation_manager:
+        await conversation_manager.flush_deferred_writes()
+        conversation_manager.diagnostic_engine.batch_pool.shutdown()
+        conversation_manager.diagnostic_engine.offload.shutdown()
+        if conversation_manager.shadow_evaluator:
+            conversation_manager.shadow_evaluator.shutdown()
     if mongo_client:
         mongo_client.close()
         logger.info("✓ MongoDB connection closed")
@@ -2,14 +2,24 @@
 API Routes v1
 Versioned REST API endpoints for EV charging diagnostic chatbot.
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from datetime import datetime
-from typing import Any
+from typing import Any, Optional
+import hmac
 
-from ..models.request_models import ChatRequest
-from ..models.response_models import ChatResponse, HealthResponse
+from ..models.request_models import ChatRequest, BatchDiagnoseRequest, CatalogPatchRequest
+from ..models.response_models import (
+    CatalogPatchResponse,
+    ChatResponse,
+    HealthResponse,
+    PreEncodedResponse,
+    SuggestResponse,
+)
 from ..engine.conversation_manager import ConversationManager
+from ..engine.error_catalog import CatalogPatchError
 from ..core.logger import setup_logger
+from ..utils.deadline import DeadlineExceeded
 
 logger = setup_logger(__name__)
 
@@ -38,6 +48,8 @@ def get_conversation_manager() -> ConversationManager:
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    deadline_ms: Optional[float] = Header(None, alias="X-Deadline-Ms", gt=0),
     manager: ConversationManager = Depends(get_conversation_manager)
 ) -> ChatResponse:
     """
@@ -88,8 +100,18 @@ async def chat(
     type="flow" → Rule-based conversation flow
     type="ai" → AI-generated response
     
+    Sampled turns are also evaluated by the shadow candidate matchers
+    after the response has been sent (SHADOW_ENABLED).
+    
+    Each turn is answered within a time budget: the X-Deadline-Ms header,
+    else CHAT_DEADLINE_MS. Responses that had to cut corners to meet it
+    list what was skipped in "degraded"; 504 if the session could not be
+    read in time.
+    
     Args:
         request: ChatRequest with user_id, message, action, platform
+        background_tasks: Tasks run after the response is sent
+        deadline_ms: Optional X-Deadline-Ms header (time budget in milliseconds)
         manager: Injected ConversationManager
         
     Returns:
@@ -106,14 +128,29 @@ async def chat(
             }
         )
         
+        # Record matcher decisions for sampled turns (shadow evaluation)
+        shadow = manager.shadow_evaluator
+        decisions = {} if shadow and request.message and shadow.sample() else None
+        
         # Process message through conversation manager
         response = await manager.process_message(
             user_id=request.user_id,
             message=request.message,
             action=request.action,
-            platform=request.platform
+            platform=request.platform,
+            charger_model=request.charger_model,
+            decisions=decisions,
+            deadline_ms=deadline_ms
         )
         
+        if decisions:
+            background_tasks.add_task(
+                shadow.evaluate,
+                request.message,
+                request.charger_model,
+                decisions
+            )
+        
         logger.info(
             f"Response generated: type={response.type}",
             extra={
@@ -123,8 +160,17 @@ async def chat(
             }
         )
         
+        # Flow and diagnostic turns arrive pre-encoded; send the bytes as-is
+        if isinstance(response, PreEncodedResponse):
+            return Response(content=response.body(), media_type="application/json")
+        
         return response
         
+    except DeadlineExceeded:
+        raise HTTPException(
+            status_code=504,
+            detail="The request could not be answered within its deadline. Please try again."
+        )
     except Exception as e:
         logger.error(f"Error processing chat request: {e}", exc_info=True)
         raise HTTPException(
@@ -133,6 +179,172 @@ async def chat(
         )
 
 
+def require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Dependency: check the X-Admin-Token header against ADMIN_API_KEY."""
+    from ..core.config import get_settings
+    
+    admin_key = get_settings().ADMIN_API_KEY
+    if not admin_key:
+        raise HTTPException(status_code=503, detail="Admin API is disabled (ADMIN_API_KEY is not set)")
+    
+    # Constant-time comparison: response timing must not reveal the key
+    if not x_admin_token or not hmac.compare_digest(
+        x_admin_token.encode("utf-8"), admin_key.encode("utf-8")
+    ):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.post("/diagnose/batch", tags=["diagnostics"], dependencies=[Depends(require_admin_token)])
+async def diagnose_batch(
+    request: BatchDiagnoseRequest,
+    manager: ConversationManager = Depends(get_conversation_manager)
+) -> StreamingResponse:
+    """
+    Batch error code detection for back-office classification.
+    
+    Requires the `X-Admin-Token` header. Runs the chat error detection logic
+    over every message in a pool of worker processes and streams results
+    back as NDJSON in input order. The pool is capped at BATCH_WORKERS
+    processes (half of the CPUs by default) so chat keeps the rest, and at
+    most BATCH_MAX_CONCURRENT batches run at once (429 otherwise).
+    
+    Request:
+    ```json
+    {
+        "messages": ["ER001 at station 14", "rfid card not detected"],
+        "charger_model": null
+    }
+    ```
+    
+    Response (application/x-ndjson, one line per message):
+    ```
+    {"index": 0, "result": {"error_code": "ER001", "title": "...", "description": "...", "solutions": [...]}}
+    {"index": 1, "result": null}
+    ```
+    
+    Args:
+        request: BatchDiagnoseRequest with messages and optional charger_model
+        manager: Injected ConversationManager
+        
+    Returns:
+        Streaming NDJSON response
+    """
+    logger.info(f"Batch diagnosis request received: {len(request.messages)} messages")
+    
+    pool = manager.diagnostic_engine.batch_pool
+    job = pool.start_job()
+    if job is None:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many batch diagnoses running. Please retry later.",
+            headers={"Retry-After": "30"}
+        )
+    
+    return StreamingResponse(
+        pool.detect_ndjson(request.messages, request.charger_model, job=job),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get("/errors/suggest", response_model=SuggestResponse, tags=["diagnostics"])
+async def suggest_errors(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100, description="Text typed so far"),
+    limit: int = Query(5, ge=1, le=10),
+    charger_model: Optional[str] = Query(None, max_length=100),
+    manager: ConversationManager = Depends(get_conversation_manager)
+) -> SuggestResponse:
+    """
+    Error code and title typeahead.
+    
+    Completes "ER0" or "gun te" from a prefix trie built at startup. The
+    endpoint is stateless (no session, history or log writes), so clients
+    can call it on every keystroke and responses may be cached.
+    
+    Example: GET /v1/errors/suggest?q=gun%20te
+    ```json
+    {
+        "query": "gun te",
+        "suggestions": [{"error_code": "ER001", "title": "Gun Temperature Limit"}]
+    }
+    ```
+    
+    Args:
+        response: Outgoing response (Cache-Control header)
+        q: Prefix typed by the user
+        limit: Maximum number of suggestions
+        charger_model: Optional charger model/vendor selecting the catalog
+        manager: Injected ConversationManager
+        
+    Returns:
+        SuggestResponse
+    """
+    from ..core.config import get_settings
+    
+    suggestions = await manager.diagnostic_engine.suggest(q, limit, charger_model)
+    
+    response.headers["Cache-Control"] = f"public, max-age={get_settings().SUGGEST_CACHE_MAX_AGE}"
+    return SuggestResponse(query=q, suggestions=suggestions)
+
+
+@router.patch(
+    "/admin/catalog",
+    response_model=CatalogPatchResponse,
+    tags=["admin"],
+    dependencies=[Depends(require_admin_token)]
+)
+async def patch_catalog(
+    request: CatalogPatchRequest,
+    manager: ConversationManager = Depends(get_conversation_manager)
+) -> CatalogPatchResponse:
+    """
+    Add, update or delete error catalog entries without a restart.
+    
+    Requires the `X-Admin-Token` header. Operations are applied in order to
+    a new catalog version with its indexes updated incrementally. The new
+    version is persisted to the catalog JSON and then published atomically:
+    chat requests see either the old or the new catalog, never a mix.
+    
+    Request:
+    ```json
+    {
+        "operations": [
+            {"op": "add", "entry": {"Error_Code": "ER200", "Tittle": "Coolant Pump Failure",
+                                    "Description": "...", "Solution": ["..."]}},
+            {"op": "update", "error_code": "ER015", "entry": {"Solution": ["..."]}},
+            {"op": "delete", "error_code": "ER016"}
+        ]
+    }
+    ```
+    
+    Errors: 404 unknown error_code, 409 code already exists, 400 other
+    invalid operations (nothing is changed in any of these cases).
+    
+    Args:
+        request: CatalogPatchRequest with operations and optional charger_model
+        manager: Injected ConversationManager
+        
+    Returns:
+        CatalogPatchResponse with the published version
+    """
+    operations = [operation.model_dump(exclude_none=True) for operation in request.operations]
+    
+    try:
+        catalog = await manager.apply_catalog_patch(operations, request.charger_model)
+    except CatalogPatchError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except OSError as e:
+        logger.error(f"Failed to persist catalog patch: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not write the catalog file")
+    
+    return CatalogPatchResponse(
+        namespace=catalog.name,
+        version=catalog.version,
+        error_codes_count=len(catalog),
+        applied=len(operations)
+    )
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check(
     manager: ConversationManager = Depends(get_conversation_manager)
@@ -158,5 +370,13 @@ async def health_check(
         version=settings.APP_VERSION,
         timestamp=datetime.utcnow().isoformat(),
         diagnostics_loaded=diagnostics_loaded,
-        error_codes_count=error_codes_count
+        error_codes_count=error_codes_count,
+        diagnostic_cache=manager.diagnostic_engine.get_cache_stats(),
+        routing=manager.routing.get_stats(),
+        deadline=manager.get_deadline_stats(),
+        ai_prefetch=manager.get_ai_prefetch_stats(),
+        cpu_offload=manager.diagnostic_engine.offload.get_stats(),
+        shadow_evaluation=(
+            manager.shadow_evaluator.get_stats() if manager.shadow_evaluator else None
+        )
     )
@@ -28,6 +28,17 @@ class Settings(BaseSettings):
     # Session Configuration
     SESSION_TIMEOUT_MINUTES: int = 30
     
+    # Duplicate Chat Requests (retries, double taps)
+    # A request identical to the user's previous one within this many
+    # seconds gets that turn's response, unless that turn moved the session
+    # to another node or troubleshooting step (0 disables coalescing)
+    CHAT_DUPLICATE_WINDOW_SECONDS: float = 2.0
+    
+    # Request Deadline (the X-Deadline-Ms header overrides the default)
+    CHAT_DEADLINE_MS: int = 5000  # Time budget per chat turn, 0 disables
+    CHAT_DEADLINE_MAX_MS: int = 30000  # Cap on client-requested budgets, 0 for no cap
+    CHAT_DEADLINE_RESERVE_MS: int = 200  # Kept for the session write and response
+    
     # AI Service Configuration (Future OpenAI Integration Point)
     # When ready to integrate OpenAI:
     # 1. Set OPENAI_API_KEY in .env file
@@ -38,6 +49,93 @@ class Settings(BaseSettings):
     OPENAI_TEMPERATURE: float = 0.7
     OPENAI_MAX_TOKENS: int = 500
     
+    # Speculative AI: start the AI call alongside the rule stages for
+    # messages likely to fall through to the AI fallback (cancelled when a
+    # rule stage answers)
+    AI_PREFETCH_ENABLED: bool = True
+    AI_PREFETCH_MAX_INFLIGHT: int = 8  # Speculative calls running at once
+    
+    # Routing Stages (ConversationManager), run in this order until one
+    # answers; leave a stage out to disable it. "ai" always runs last.
+    # Known: troubleshooting, option, diagnostic, payment, action, intent,
+    # semantic, ai
+    ROUTING_STAGES: list[str] = [
+        "troubleshooting", "option", "diagnostic", "payment",
+        "action", "intent", "semantic", "ai"
+    ]
+    
+    # Diagnostic Detection Cache
+    DIAGNOSTIC_CACHE_SIZE: int = 4096  # Normalized messages remembered (0 disables)
+    DIAGNOSTIC_CACHE_TTL_SECONDS: int = 3600  # 0 means entries never expire
+    
+    # Diagnostic Scoring Backend
+    # "python" walks posting lists; "numpy" compiles them into sparse arrays
+    # for very large catalogs (falls back to "python" if numpy is missing)
+    DIAGNOSTIC_SCORING_BACKEND: str = "python"
+    
+    # Vendor/Charger-Model Catalogs
+    # catalogs/<model>.json files are loaded on first use and evicted
+    # (least recently used first) when either budget is exceeded
+    CATALOGS_DIR: str = "catalogs"
+    CATALOG_MAX_LOADED_NAMESPACES: int = 8
+    CATALOG_MAX_LOADED_ENTRIES: int = 200000
+    CATALOG_RELOAD_CHECK_SECONDS: float = 2.0  # Pick up catalog files patched by other workers, 0 disables
+    
+    # Compiled Catalog Snapshots
+    # Memory-map <catalog>.bin (build_catalog_snapshot.py) instead of parsing
+    # JSON when it is up to date; requires numpy, otherwise JSON is used
+    CATALOG_SNAPSHOTS_ENABLED: bool = True
+    
+    # Pre-encoded Responses
+    # Flow node and diagnostic bodies are serialized once and reused with
+    # only session_id spliced in
+    RESPONSE_FRAGMENTS_ENABLED: bool = True
+    RESPONSE_FRAGMENT_CACHE_SIZE: int = 4096  # Diagnostic fragments kept
+    
+    # Semantic Error Matching (before AI fallback, requires numpy)
+    # Catalog entries are embedded once into <catalog>.vec
+    SEMANTIC_MATCH_ENABLED: bool = True
+    SEMANTIC_MATCH_THRESHOLD: float = 0.5  # Minimum cosine similarity
+    SEMANTIC_MATCH_MARGIN: float = 0.1  # Minimum lead over the runner-up error code
+    SEMANTIC_NPROBE: int = 8  # Index clusters searched per query
+    
+    # Intent Classifier (train_intent_classifier.py, requires numpy)
+    # Predictions at or above the threshold skip keyword rules and the AI
+    # fallback; below it, scores only rank competing keyword matches
+    INTENT_CLASSIFIER_PATH: str = "intent_classifier.bin"
+    INTENT_CLASSIFIER_THRESHOLD: float = 0.9
+    
+    # Error Typeahead (GET /v1/errors/suggest)
+    SUGGEST_CACHE_MAX_AGE: int = 300  # Cache-Control max-age in seconds
+    
+    # Shadow Evaluation (candidate matchers on sampled /v1/chat traffic)
+    # Candidates: diagnostic-python, diagnostic-numpy, diagnostic-semantic,
+    # intent-keyword, intent-classifier; disagreements are written to a
+    # rotating JSON lines file
+    SHADOW_ENABLED: bool = False
+    SHADOW_CANDIDATES: list[str] = []
+    SHADOW_SAMPLE_RATE: float = 0.05  # Fraction of chat turns evaluated
+    SHADOW_MAX_PENDING: int = 32  # Evaluations in flight before shedding
+    SHADOW_WORKERS: int = 1  # Worker processes
+    SHADOW_LOG_PATH: str = "logs/shadow_disagreements.jsonl"
+    SHADOW_LOG_MAX_BYTES: int = 10485760  # Rotate at 10 MB
+    SHADOW_LOG_BACKUP_COUNT: int = 5
+    
+    # Batch Diagnosis (POST /v1/diagnose/batch, requires ADMIN_API_KEY)
+    BATCH_WORKERS: int = 0  # Worker processes, 0 means half of the CPUs
+    BATCH_CHUNK_SIZE: int = 500  # Messages per worker task
+    BATCH_MAX_MESSAGES: int = 100000  # Per request
+    BATCH_MAX_CONCURRENT: int = 1  # Batch requests running at once, others get 429
+    
+    # CPU Offload (fuzzy, keyword and semantic matching of long messages)
+    CPU_OFFLOAD_MODE: str = "thread"  # inline, thread or process (heavy catalogs; shares the BATCH_WORKERS processes)
+    CPU_OFFLOAD_MIN_COST_MS: float = 1.0  # Estimated matching cost from which work leaves the event loop
+    CPU_OFFLOAD_WORKERS: int = 2  # Threads (process mode also uses them for calls below its measured threshold)
+    
+    # Admin API (PATCH /v1/admin/catalog, POST /v1/diagnose/batch), disabled while unset
+    # Clients send it in the X-Admin-Token header
+    ADMIN_API_KEY: Optional[str] = None
+    
     # Rate Limiting (Placeholder for future middleware)
     RATE_LIMIT_PER_MINUTE: int = 60
     
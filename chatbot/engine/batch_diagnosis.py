@@ -0,0 +1,428 @@
+"""
+Batch Diagnosis
+Process pool for classifying large volumes of text with DiagnosticEngine.
+
+Each worker process builds its own DiagnosticEngine once (pool initializer)
+from the same catalog files as the serving engine - with a compiled catalog
+snapshot the catalog pages are shared between workers - and then classifies
+whole chunks of messages per task. The event loop only submits chunks and
+forwards finished results, so batch jobs never block the event loop and
+throughput scales with the number of worker processes.
+
+By default the pool uses half of the CPUs, leaving the rest to the chat
+server, and start_job() caps how many batch requests run at once.
+
+Workers keep the catalog versions they loaded. When a new version of a
+namespace is published, retire() replaces the workers only if they serve
+that namespace; a running batch stream keeps the workers it started on
+until it ends, so all of its results come from one catalog version.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from ..core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Per-process state, set by _init_worker() in each worker
+_worker_engine = None
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _init_worker(
+    error_codes_path: str,
+    catalogs_dir: str,
+    scoring_backend: str,
+    namespaces: Tuple[str, ...] = ()
+) -> None:
+    """Load the default catalog and the given namespaced ones once per worker process."""
+    global _worker_engine, _worker_loop
+    
+    # Imported here: diagnostic_engine imports this module for the pool
+    from .diagnostic_engine import DiagnosticEngine
+    
+    _worker_loop = asyncio.new_event_loop()
+    _worker_engine = DiagnosticEngine(
+        error_codes_path=error_codes_path,
+        scoring_backend=scoring_backend,
+        catalogs_dir=catalogs_dir,
+        offload_mode="inline",  # Already off the event loop
+        reload_check_seconds=0  # Restarted on every publish
+    )
+    _worker_loop.run_until_complete(_worker_engine.load_error_codes())
+    for namespace in namespaces:
+        _worker_loop.run_until_complete(_worker_engine.get_catalog(namespace))
+
+
+def worker_engine():
+    """
+    Get the DiagnosticEngine of the current worker process.
+    
+    Returns:
+        DiagnosticEngine (None outside a pool worker)
+    """
+    return _worker_engine
+
+
+def run_in_worker(coroutine) -> Any:
+    """
+    Run a coroutine on the current worker's event loop.
+    
+    Args:
+        coroutine: Coroutine using worker_engine()
+    
+    Returns:
+        Coroutine result
+    """
+    return _worker_loop.run_until_complete(coroutine)
+
+
+async def _detect_all(messages: List[str], charger_model: Optional[str]) -> List[Optional[Dict[str, Any]]]:
+    return [await _worker_engine.detect_error_code(message, charger_model) for message in messages]
+
+
+def _ping() -> int:
+    """Worker task: report that the worker has loaded its catalogs."""
+    return os.getpid()
+
+
+def _catalog_stamp(charger_model: Optional[str]) -> Any:
+    """Identify the catalog version the worker serves a charger model from."""
+    return _worker_engine._source_stamps.get(_worker_engine.catalog_namespace(charger_model))
+
+
+def _detect_chunk(
+    start: int,
+    messages: List[str],
+    charger_model: Optional[str]
+) -> Tuple[Any, List[Optional[Dict[str, Any]]]]:
+    """Worker task: (catalog version, detect_error_code() for each message of a chunk); start is unused."""
+    results = run_in_worker(_detect_all(messages, charger_model))
+    return _catalog_stamp(charger_model), results
+
+
+def _detect_chunk_ndjson(start: int, messages: List[str], charger_model: Optional[str]) -> Tuple[Any, bytes]:
+    """Worker task: like _detect_chunk(), encoded as NDJSON lines in the worker."""
+    results = run_in_worker(_detect_all(messages, charger_model))
+    return _catalog_stamp(charger_model), "".join(
+        json.dumps({"index": start + offset, "result": result}, ensure_ascii=False) + "\n"
+        for offset, result in enumerate(results)
+    ).encode("utf-8")
+
+
+class CatalogVersionChanged(RuntimeError):
+    """A batch stream's chunks came from different catalog versions."""
+
+
+class BatchJob:
+    """
+    Slot of a running batch request in a BatchDiagnosisPool.
+    
+    release() is idempotent and also runs when the job is garbage collected,
+    so a request whose stream never started cannot leak its slot.
+    """
+    
+    def __init__(self, pool: "BatchDiagnosisPool"):
+        self._pool: Optional[BatchDiagnosisPool] = pool
+    
+    def release(self) -> None:
+        """Give the slot back to the pool."""
+        if self._pool is not None:
+            self._pool.active_jobs -= 1
+            self._pool = None
+    
+    __del__ = release
+
+
+class _WorkerGeneration:
+    """Worker processes started together, holding the catalog versions they loaded."""
+    
+    __slots__ = ("executor", "preloaded", "namespaces", "streams", "retired", "started")
+    
+    def __init__(self, executor: ProcessPoolExecutor, preloaded: Tuple[str, ...], default_namespace: str):
+        self.executor = executor
+        self.preloaded = preloaded  # Namespaced catalogs loaded when the workers started
+        self.namespaces: Set[str] = {default_namespace, *preloaded}  # Every namespace served so far
+        self.streams = 0  # Batch streams pinned to these workers
+        self.retired = False
+        self.started = False  # start() saw the workers answer
+
+
+class BatchDiagnosisPool:
+    """
+    Process pool whose workers each hold a loaded DiagnosticEngine.
+    """
+    
+    def __init__(
+        self,
+        error_codes_path: str,
+        catalogs_dir: str,
+        scoring_backend: str,
+        max_workers: Optional[int] = None,
+        chunk_size: int = 500,
+        max_jobs: int = 0,
+        namespace_of: Optional[Callable[[Optional[str]], str]] = None
+    ):
+        """
+        Configure the pool (processes start on first use).
+        
+        Args:
+            error_codes_path: Catalog JSON the workers load
+            catalogs_dir: Directory of namespaced catalogs
+            scoring_backend: "python" or "numpy"
+            max_workers: Worker processes (None or 0 for half of the CPUs)
+            chunk_size: Messages per worker task
+            max_jobs: Batch requests allowed to run at once (0 for no limit)
+            namespace_of: Maps a charger model to its catalog namespace
+                (None for the default one), e.g.
+                DiagnosticEngine.catalog_namespace; without it every
+                charger model counts as the default namespace
+        """
+        self.initargs = (error_codes_path, catalogs_dir, scoring_backend)
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 1) // 2)
+        self.chunk_size = max(1, chunk_size)
+        self.max_jobs = max_jobs
+        self.active_jobs = 0
+        self.namespace_of = namespace_of or (lambda charger_model: "default")
+        self._current: Optional[_WorkerGeneration] = None
+        self._retired: List[_WorkerGeneration] = []  # Retired, still running pinned streams
+    
+    def start_job(self) -> Optional[BatchJob]:
+        """
+        Reserve a slot for a batch request.
+        
+        Returns:
+            BatchJob to release when the request ends, or None if max_jobs
+            requests are already running
+        """
+        if self.max_jobs and self.active_jobs >= self.max_jobs:
+            return None
+        self.active_jobs += 1
+        return BatchJob(self)
+    
+    def _generation(self, namespace: Optional[str] = None) -> _WorkerGeneration:
+        """
+        Get the current workers, starting them on first use.
+        
+        Args:
+            namespace: Namespaced catalog the workers must have loaded at
+                start (a batch stream's); when the current workers did not,
+                they are retired and replaced by workers that also load it
+        
+        Returns:
+            Current worker generation
+        """
+        default_namespace = self.namespace_of(None)
+        current = self._current
+        if current is not None and (namespace in (None, default_namespace) or namespace in current.preloaded):
+            return current
+        
+        preloaded = current.preloaded if current is not None else ()
+        if namespace not in (None, default_namespace):
+            preloaded = (*preloaded, namespace)
+        if current is not None:
+            self._retire(current)
+        
+        # spawn: never fork a process that has an event loop and threads running
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(*self.initargs, preloaded)
+        )
+        self._current = _WorkerGeneration(executor, preloaded, default_namespace)
+        logger.info(f"Started batch diagnosis pool with {self.max_workers} workers")
+        return self._current
+    
+    @property
+    def ready(self) -> bool:
+        """Whether start() finished for the current workers (no spawn on the next call)."""
+        return self._current is not None and self._current.started
+    
+    @property
+    def running_batches(self) -> int:
+        """Batch streams running on the current workers."""
+        return self._current.streams if self._current is not None else 0
+    
+    async def start(self) -> None:
+        """
+        Start the worker processes now instead of on first use.
+        
+        One task per worker is submitted at once, so every worker is spawned
+        right away; returns when they have answered, i.e. after the catalog
+        loading (about half a second) instead of during the first real call.
+        """
+        generation = self._generation()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(generation.executor, _ping) for _ in range(self.max_workers)))
+        generation.started = True
+    
+    async def run(self, fn: Callable, *args, charger_model: Optional[str] = None) -> Any:
+        """
+        Run a picklable function in a worker without blocking the event loop.
+        
+        Args:
+            fn: Module-level function (may use worker_engine())
+            *args: Picklable arguments
+            charger_model: Charger model whose catalog fn uses (a publish of
+                that namespace then retires these workers)
+        
+        Returns:
+            Function result
+        """
+        generation = self._generation()
+        generation.namespaces.add(self.namespace_of(charger_model))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(generation.executor, fn, *args)
+    
+    def retire(self, namespace: Optional[str] = None) -> None:
+        """
+        Stop using the current workers if they serve a namespace (e.g. after it was republished).
+        
+        Workers that never served the namespace keep running. Retired
+        workers exit once the batch streams pinned to them end; the next
+        call starts new ones.
+        
+        Args:
+            namespace: Catalog namespace that changed (None to retire the
+                current workers regardless, e.g. after one died)
+        """
+        if self._current is not None and (namespace is None or namespace in self._current.namespaces):
+            self._retire(self._current)
+    
+    def _retire(self, generation: _WorkerGeneration) -> None:
+        """Retire a worker generation (shut down now when no stream uses it)."""
+        generation.retired = True
+        if generation is self._current:
+            self._current = None
+        if generation.streams:
+            self._retired.append(generation)
+        else:
+            # Queued chat calls still finish (their results are not cached)
+            generation.executor.shutdown(wait=False)
+    
+    def _release_stream(self, generation: _WorkerGeneration) -> None:
+        """End a stream pinned to a generation, shutting it down when it was the last on retired workers."""
+        generation.streams -= 1
+        if generation.retired and not generation.streams and generation in self._retired:
+            self._retired.remove(generation)
+            generation.executor.shutdown(wait=False)
+    
+    async def _map_chunks(
+        self,
+        fn: Callable,
+        messages: Iterable[str],
+        charger_model: Optional[str]
+    ) -> AsyncIterator[Any]:
+        """
+        Apply a chunk task to consecutive chunks, yielding results in input order.
+        
+        At most two chunks per worker are in flight, so arbitrarily long
+        inputs are consumed lazily with bounded memory. Every chunk runs on
+        the workers current when the stream started, which loaded its
+        catalog at start; chunk tasks return (catalog version, result), and
+        a version change within the stream (only if the catalog file was
+        replaced while those workers were starting) ends it with
+        CatalogVersionChanged rather than mixing versions.
+        """
+        loop = asyncio.get_running_loop()
+        iterator = iter(messages)
+        pending: deque = deque()
+        start = 0
+        versions = set()
+        
+        generation = self._generation(self.namespace_of(charger_model))
+        generation.streams += 1
+        
+        def submit_next() -> bool:
+            nonlocal start
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                return False
+            pending.append(loop.run_in_executor(generation.executor, fn, start, chunk, charger_model))
+            start += len(chunk)
+            return True
+        
+        try:
+            while len(pending) < self.max_workers * 2 and submit_next():
+                pass
+            
+            while pending:
+                version, result = await pending.popleft()
+                versions.add(version)
+                if len(versions) > 1:
+                    logger.error("Batch diagnosis chunks came from different catalog versions, ending stream")
+                    if not generation.retired:
+                        self._retire(generation)
+                    raise CatalogVersionChanged("catalog changed while the batch workers were starting")
+                submit_next()
+                yield result
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start fresh next time
+            logger.error("Batch diagnosis worker terminated abruptly, restarting pool")
+            if not generation.retired:
+                self._retire(generation)
+            raise
+        finally:
+            # Consumer went away (e.g. client disconnected): drop queued chunks
+            for future in pending:
+                future.cancel()
+            self._release_stream(generation)
+    
+    async def detect(
+        self,
+        messages: Iterable[str],
+        charger_model: Optional[str] = None
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Detect the error code of every message.
+        
+        Args:
+            messages: Messages (any iterable, consumed lazily)
+            charger_model: Optional charger model/vendor selecting the catalog
+        
+        Yields:
+            detect_error_code() result for each message, in input order
+        """
+        async for results in self._map_chunks(_detect_chunk, messages, charger_model):
+            for result in results:
+                yield result
+    
+    async def detect_ndjson(
+        self,
+        messages: Iterable[str],
+        charger_model: Optional[str] = None,
+        job: Optional[BatchJob] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Detect error codes and stream them as NDJSON.
+        
+        Args:
+            messages: Messages (any iterable, consumed lazily)
+            charger_model: Optional charger model/vendor selecting the catalog
+            job: Slot from start_job(), released when the stream ends
+        
+        Yields:
+            Encoded lines {"index": i, "result": {...} | null}, one chunk at a time
+        """
+        try:
+            async for lines in self._map_chunks(_detect_chunk_ndjson, messages, charger_model):
+                yield lines
+        finally:
+            if job is not None:
+                job.release()
+    
+    def shutdown(self) -> None:
+        """Stop all worker processes, retired ones included (a later call to run/detect restarts them)."""
+        generations = [*self._retired, *([self._current] if self._current is not None else [])]
+        self._current = None
+        self._retired = []
+        for generation in generations:
+            generation.retired = True
+            generation.executor.shutdown(wait=False, cancel_futures=True)
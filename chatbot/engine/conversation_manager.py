@@ -6,6 +6,13 @@ Manages conversation priority logic and response routing.
 PRIORITY LOGIC FLOW:
 ═══════════════════════════════════════════════════════════════
 
+STEP 0: TROUBLESHOOTING TREE
+────────────────────────────────────────────────────────────────
+If the session is inside a code's troubleshooting tree → Next step
+Examples: ER018 → "❌ No, still having issues" → "Step 1: Check the
+emergency (ESD) button..." → "❌ No, still showing" → "Step 2: ..."
+→ Type: "flow"
+
 STEP 1: ERROR CODE DETECTION (HIGHEST PRIORITY)
 ────────────────────────────────────────────────────────────────
 If message contains error code pattern → Return diagnostic response
@@ -24,24 +31,76 @@ If message has detectable intent → Map to flow node
 Examples: "I need help" → support flow
 → Type: "flow"
 
+STEP 3.5: SEMANTIC ERROR MATCH
+────────────────────────────────────────────────────────────────
+If message describes a catalog fault in other words → Diagnostic response
+Examples: "plug is too hot to touch" → ER001 (Gun Temperature Limit)
+→ Type: "diagnostic"
+
 STEP 4: AI FALLBACK (LOWEST PRIORITY)
 ────────────────────────────────────────────────────────────────
 If nothing else matches → Call AI service
 Examples: Open-ended questions, general queries
 → Type: "ai"
+
+The steps are RoutingStage objects (routing.py) run by a RoutingPipeline:
+ROUTING_STAGES enables and orders them without code changes, and each
+stage's run time and hit rate are reported by GET /v1/health.
 """
-from typing import Optional
+from datetime import datetime
+from typing import Optional, Union
+import asyncio
 import re
-from difflib import SequenceMatcher
+import time
 from ..core.logger import setup_logger
-from ..models.response_models import ChatResponse
+from ..core.config import get_settings
+from ..models.response_models import ChatResponse, DiagnosticInfo, PreEncodedResponse
 from .flow_engine import FlowEngine
 from .intent_engine import IntentEngine
-from .diagnostic_engine import DiagnosticEngine
-from ..utils.text_utils import normalize_text
+from .diagnostic_engine import DiagnosticEngine, DEFAULT_NAMESPACE
+from .response_fragments import ResponseFragmentCache
+from .routing import CostClass, RouteContext, RouteResult, RoutingPipeline, RoutingStage
+from .shadow_evaluator import ShadowEvaluator
+from .troubleshooting import Transition, TroubleshootingStep
+from ..utils.cache import MISSING, LRUCache
+from ..utils.deadline import Deadline, DeadlineExceeded
+from ..utils.keyed_lock import KeyedLock
 
 logger = setup_logger(__name__)
 
+# Intent keywords that route straight to the wallet flow (STEP 1.5)
+PAYMENT_KEYWORDS = frozenset({'payment', 'wallet', 'balance', 'refund', 'billing'})
+
+
+class _Turn:
+    """A user's latest turn, shared with identical requests arriving right after it."""
+    
+    __slots__ = ("fingerprint", "future", "completed_at", "session_state", "next_session_state")
+    
+    def __init__(self, fingerprint: tuple, future: asyncio.Future):
+        self.fingerprint = fingerprint
+        self.future = future
+        self.completed_at: Optional[float] = None
+        # (current_node, troubleshooting code, step) the turn started from and left
+        self.session_state: Optional[tuple] = None
+        self.next_session_state: Optional[tuple] = None
+
+
+class _AIPrefetch:
+    """An AI call started before the rule stages have had their say."""
+    
+    __slots__ = ("task", "started_at")
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.started_at = time.monotonic()
+
+
+def _retrieve_exception(future: asyncio.Future) -> None:
+    """Mark a turn's failure as seen (it is re-raised to the request that ran it)."""
+    if not future.cancelled():
+        future.exception()
+
 
 class ConversationManager:
     """
@@ -50,6 +109,12 @@ class ConversationManager:
     This is where all conversation logic decisions are made.
     """
     
+    # Users whose latest turn is remembered for duplicate coalescing
+    LATEST_TURNS_SIZE = 10000
+    
+    # Flow node answering in place of an AI response that missed the deadline
+    DEGRADED_AI_NODE = "support"
+    
     def __init__(
         self,
         flow_engine: FlowEngine,
@@ -73,207 +138,763 @@ class ConversationManager:
         self.diagnostic_engine = diagnostic_engine
         self.session_service = session_service
         self.ai_service = ai_service
+        
+        # Pre-encoded flow/diagnostic bodies (see load_response_fragments)
+        settings = get_settings()
+        self.response_fragments: Optional[ResponseFragmentCache] = None
+        if settings.RESPONSE_FRAGMENTS_ENABLED:
+            self.response_fragments = ResponseFragmentCache(
+                max_diagnostics=settings.RESPONSE_FRAGMENT_CACHE_SIZE
+            )
+        
+        # Per-request time budget (see process_message)
+        self.deadline_ms = settings.CHAT_DEADLINE_MS
+        self.max_deadline_ms = settings.CHAT_DEADLINE_MAX_MS
+        self.deadline_reserve_ms = settings.CHAT_DEADLINE_RESERVE_MS
+        self._deferred_writes: dict[str, asyncio.Task] = {}
+        self._deadline_stats = {"degraded": 0, "deferred_writes": 0, "exceeded": 0}
+        
+        # AI calls started alongside the rule stages for turns likely to
+        # reach the AI fallback (see _prefetch_ai)
+        self.ai_prefetch_enabled = settings.AI_PREFETCH_ENABLED
+        self.ai_prefetch_max_inflight = settings.AI_PREFETCH_MAX_INFLIGHT
+        self._ai_prefetch_inflight = 0
+        self._ai_prefetch_stats = {
+            "started": 0, "used": 0, "wasted": 0, "capped": 0,
+            "wasted_ms_total": 0.0, "overlap_ms_total": 0.0
+        }
+        
+        # Routing stages in the configured order (see process_message)
+        self.routing = RoutingPipeline(
+            self._routing_stages(),
+            order=settings.ROUTING_STAGES,
+            fallback="ai",
+            reserve_ms=self.deadline_reserve_ms
+        )
+        
+        # Turns of one user run one at a time; identical back-to-back
+        # requests (retries, double taps) share one turn's response
+        self.user_locks = KeyedLock()
+        self.duplicate_window = settings.CHAT_DUPLICATE_WINDOW_SECONDS
+        self._latest_turns = LRUCache(max_size=self.LATEST_TURNS_SIZE)
+        
+        # Candidate matchers compared with production on sampled turns
+        self.shadow_evaluator: Optional[ShadowEvaluator] = None
+        if settings.SHADOW_ENABLED and settings.SHADOW_CANDIDATES:
+            self.shadow_evaluator = ShadowEvaluator(
+                candidates=settings.SHADOW_CANDIDATES,
+                error_codes_path=diagnostic_engine.error_codes_path,
+                catalogs_dir=str(diagnostic_engine.catalogs_dir),
+                sample_rate=settings.SHADOW_SAMPLE_RATE,
+                max_pending=settings.SHADOW_MAX_PENDING,
+                max_workers=settings.SHADOW_WORKERS,
+                log_path=settings.SHADOW_LOG_PATH,
+                log_max_bytes=settings.SHADOW_LOG_MAX_BYTES,
+                log_backup_count=settings.SHADOW_LOG_BACKUP_COUNT
+            )
+        
+        # Patched here or reloaded after a patch in another server process
+        diagnostic_engine.add_publish_listener(self._on_catalog_published)
+    
+    def load_response_fragments(self) -> None:
+        """
+        Pre-encode responses for every flow node and default catalog code.
+        
+        Called at startup after the flow and diagnostic engines are loaded
+        (and again whenever either is reloaded; a catalog publish only drops
+        that catalog's diagnostic fragments, see _on_catalog_published).
+        """
+        if self.response_fragments is None:
+            return
+        
+        flows = self.flow_engine.flows
+        self.response_fragments.load_flows(
+            list(flows),
+            lambda node_id: self._build_flow_response("", flows[node_id])
+        )
+        
+        self.response_fragments.load_steps(
+            self.diagnostic_engine.troubleshooting.steps(),
+            lambda step: self._build_troubleshooting_response("", step)
+        )
+        
+        self.response_fragments.clear()
+        catalog = self.diagnostic_engine.catalog
+        if len(catalog) <= self.response_fragments.diagnostics.max_size:
+            for error_code in catalog.code_positions:
+                self.response_fragments.diagnostic(
+                    DEFAULT_NAMESPACE,
+                    [catalog.lookup(error_code)],
+                    lambda diagnostics: self._build_diagnostic_response("", diagnostics)
+                )
+        
+        logger.info(
+            f"Pre-encoded {len(self.response_fragments.flows)} flow, "
+            f"{len(self.response_fragments.steps)} troubleshooting step and "
+            f"{len(self.response_fragments.diagnostics)} diagnostic responses"
+        )
+    
+    def _on_catalog_published(self, catalog) -> None:
+        """Drop every response derived from the previous catalog version."""
+        # Same event loop step as the publish: no turn sees the old fragments.
+        # Only that namespace's diagnostics; they are encoded again on first use
+        if self.response_fragments is not None:
+            self.response_fragments.clear(catalog.name)
+        if self.shadow_evaluator is not None:
+            self.shadow_evaluator.shutdown()
+    
+    async def apply_catalog_patch(self, operations: list[dict], charger_model: Optional[str] = None):
+        """
+        Patch a catalog (derived responses are rebuilt on publish).
+        
+        Args:
+            operations: Patch operations (see ErrorCatalog.patched())
+            charger_model: Charger model/vendor whose catalog is patched
+            
+        Returns:
+            The published ErrorCatalog
+        """
+        return await self.diagnostic_engine.apply_catalog_patch(operations, charger_model)
     
     async def process_message(
         self,
         user_id: str,
         message: Optional[str],
         action: Optional[str],
-        platform: str
-    ) -> ChatResponse:
+        platform: str,
+        charger_model: Optional[str] = None,
+        decisions: Optional[dict] = None,
+        deadline_ms: Optional[float] = None
+    ) -> Union[ChatResponse, PreEncodedResponse]:
         """
         ★★★ MAIN CONVERSATION PROCESSING ★★★
         
         Process incoming user message with priority routing.
         
-        Priority Flow:
-        1. Diagnostic detection (error codes)
+        Turns of the same user run one at a time, in arrival order (other
+        users are not blocked). A request identical to the user's previous
+        one (same message, action, platform and charger model) that arrives
+        while it is still running, or within CHAT_DUPLICATE_WINDOW_SECONDS
+        after it, gets that turn's response instead of running again. Once
+        the previous turn has moved the session on (flow node or
+        troubleshooting step), the same request is a new answer to the new
+        state ("❌ No, still having issues" twice) and runs.
+        
+        Priority Flow (default ROUTING_STAGES order):
+        0. Active troubleshooting tree, option buttons
+        1. Diagnostic detection (error codes), payment keywords
         2. Explicit actions
-        3. Intent-based routing
+        3. Intent-based routing, semantic error match
         4. AI fallback
         
+        The first routing stage that answers produces the response; the
+        session is then updated and the response saved once, whichever
+        stage it was.
+        
+        The turn runs within a time budget (deadline_ms, else
+        CHAT_DEADLINE_MS). When it runs short, optional routing stages are
+        skipped, an AI call that does not fit is replaced by the support
+        flow, and a session write that does not fit finishes in the
+        background (the user's next turn waits for it); the response lists
+        what was degraded. Only a session read that does not fit fails the
+        turn (DeadlineExceeded).
+        
         Args:
             user_id: Unique user identifier
             message: User's text message
             action: Explicit action/command
             platform: Client platform (web/android/ios)
+            charger_model: Optional charger vendor/model selecting the error catalog
+            decisions: Optional dict filled with the matcher decisions made for
+                this message ({"diagnostic": {"decision", "latency_ms"}, ...}),
+                for shadow evaluation
+            deadline_ms: Time budget of this request (capped at
+                CHAT_DEADLINE_MAX_MS), None for the configured default
+            
+        Returns:
+            Standardized ChatResponse, or a PreEncodedResponse carrying the
+            same JSON for flow and diagnostic turns
+        
+        Raises:
+            DeadlineExceeded: If the session could not be read in time
+        """
+        deadline = Deadline(self._deadline_budget(deadline_ms))
+        fingerprint = (message, action, platform, charger_model)
+        duplicate = self._duplicate_turn(user_id, fingerprint)
+        if duplicate is not None:
+            logger.info(
+                f"Coalescing duplicate request - user_id: {user_id}",
+                extra={"user_id": user_id, "platform": platform}
+            )
+            return await asyncio.shield(duplicate.future)
+        
+        turn = _Turn(fingerprint, asyncio.get_running_loop().create_future())
+        turn.future.add_done_callback(_retrieve_exception)
+        self._latest_turns.set(user_id, turn)
+        received_at = datetime.utcnow()
+        
+        try:
+            async with self.user_locks.hold(user_id):
+                response = await self._process_turn(
+                    user_id, message, action, platform, charger_model, decisions, received_at, deadline, turn
+                )
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                turn.future.cancel()
+            else:
+                turn.future.set_exception(e)
+            raise
+        
+        turn.completed_at = time.monotonic()
+        turn.future.set_result(response)
+        return response
+    
+    def _duplicate_turn(self, user_id: str, fingerprint: tuple) -> Optional[_Turn]:
+        """
+        Find the user's previous turn if this request repeats it.
+        
+        Args:
+            user_id: User identifier
+            fingerprint: (message, action, platform, charger_model)
+            
+        Returns:
+            The running identical turn, or the just completed one if it left
+            the session state as it found it; None otherwise
+        """
+        if self.duplicate_window <= 0:
+            return None
+        
+        turn = self._latest_turns.get(user_id)
+        if turn is MISSING or turn.fingerprint != fingerprint:
+            return None
+        if not turn.future.done():
+            return turn
+        if turn.future.cancelled() or turn.future.exception() is not None:
+            return None
+        if time.monotonic() - turn.completed_at > self.duplicate_window:
+            return None
+        if turn.next_session_state != turn.session_state:
+            # Sent against the state that turn left: a new answer, not a repeat
+            return None
+        return turn
+    
+    @staticmethod
+    def _session_state(current_node: str, troubleshooting: Optional[dict]) -> tuple:
+        """Where a session is in the conversation: flow node and troubleshooting step."""
+        if not troubleshooting:
+            return (current_node, None, None)
+        return (current_node, troubleshooting.get("code"), troubleshooting.get("step"))
+    
+    def _deadline_budget(self, deadline_ms: Optional[float]) -> Optional[float]:
+        """
+        Resolve a request's time budget.
+        
+        Args:
+            deadline_ms: Budget asked for by the client, if any
             
         Returns:
-            Standardized ChatResponse
+            Budget in milliseconds, or None for no deadline
+        """
+        if deadline_ms is None:
+            budget = self.deadline_ms
+        elif self.max_deadline_ms > 0:
+            budget = min(deadline_ms, self.max_deadline_ms)
+        else:
+            budget = deadline_ms
+        return budget if budget > 0 else None
+    
+    async def _process_turn(
+        self,
+        user_id: str,
+        message: Optional[str],
+        action: Optional[str],
+        platform: str,
+        charger_model: Optional[str],
+        decisions: Optional[dict],
+        received_at: datetime,
+        deadline: Deadline,
+        turn: _Turn
+    ) -> Union[ChatResponse, PreEncodedResponse]:
+        """
+        Route one turn and commit it to the session (see process_message()).
+        
+        Called with the user's lock held. Records the session state the turn
+        started from and left on turn (see _duplicate_turn()).
         """
         logger.info(
             f"Processing message - user_id: {user_id}, platform: {platform}",
             extra={"user_id": user_id, "platform": platform}
         )
         
-        # Get or create session
-        session = await self.session_service.get_or_create_session(user_id, platform)
-        session_id = session["session_id"]
-        current_node = session.get("current_node", "start")
-        
-        # Save user message to history
-        if message:
-            await self.session_service.add_message_to_history(
-                user_id=user_id,
-                session_id=session_id,
-                role="user",
-                content=message
+        # Get or create session (after the previous turn's deferred write landed)
+        try:
+            deferred = self._deferred_writes.get(user_id)
+            if deferred is not None:
+                await deadline.wait(asyncio.wait({deferred}))
+            session = await deadline.wait(self.session_service.get_or_create_session(user_id, platform))
+        except DeadlineExceeded:
+            self._deadline_stats["exceeded"] += 1
+            logger.warning(
+                f"Session not available within {deadline.budget_ms:.0f} ms - user_id: {user_id}",
+                extra={"user_id": user_id}
             )
+            raise
+        session_id = session["session_id"]
         
-        # ═══════════════════════════════════════════════════════════════
-        # STEP 0.5: DIRECT OPTION BUTTON MAPPING (HIGHEST PRIORITY)
-        # ═══════════════════════════════════════════════════════════════
-        # Button clicks should route directly without any intent checks
-        if message:
-            option_node = self._map_option_to_node(message)
-            
-            if option_node:
-                logger.debug(f"Routing option '{message}' to node: {option_node}")
-                
-                response = await self._generate_flow_response(
-                    session_id=session_id,
-                    node_id=option_node
-                )
-                
-                # Update session with new node
-                await self.session_service.update_session(
-                    user_id=user_id,
-                    session_id=session_id,
-                    current_node=option_node
-                )
-                
-                return await self._save_and_return_response(user_id, session_id, response)
-        
-        # ═══════════════════════════════════════════════════════════════
-        # STEP 1: ERROR CODE DETECTION (HIGH PRIORITY FOR FREE TEXT)
-        # ═══════════════════════════════════════════════════════════════
-        if message:
-            diagnostic_result = await self.diagnostic_engine.detect_error_code(message)
-            
-            if diagnostic_result:
-                logger.info(
-                    f"Diagnostic match found: {diagnostic_result['error_code']}",
-                    extra={"error_code": diagnostic_result["error_code"]}
-                )
-                
-                response = self._generate_diagnostic_response(
-                    session_id=session_id,
-                    diagnostic_data=diagnostic_result
-                )
-                
-                # Update session (keep current node, just update timestamp)
-                await self.session_service.update_session(
-                    user_id=user_id,
-                    session_id=session_id,
-                    current_node=current_node
-                )
-                
-                return await self._save_and_return_response(user_id, session_id, response)
-        
-        # ═══════════════════════════════════════════════════════════════
-        # STEP 1.5: PAYMENT/WALLET INTENT CHECK (BEFORE FREE TEXT INTENT)
-        # ═══════════════════════════════════════════════════════════════
-        # Use fuzzy matching to catch typos like "payement", "pamyent"
-        if message:
-            if self._is_payment_intent(message):
-                logger.debug("Payment/Wallet keywords detected (fuzzy), routing to wallet flow")
-                response = await self._generate_flow_response(
-                    session_id=session_id,
-                    node_id="wallet_issues"
-                )
-                
-                # Update session with new node
-                await self.session_service.update_session(
-                    user_id=user_id,
-                    session_id=session_id,
-                    current_node="wallet_issues"
+        context = RouteContext(user_id, session, message, action, charger_model, decisions, deadline)
+        context.ai_prefetch = await self._prefetch_ai(context)
+        try:
+            stage, result = await self.routing.route(context)
+        finally:
+            if context.ai_prefetch is not None:
+                self._discard_ai_prefetch(context.ai_prefetch)
+        logger.debug(f"Turn answered by routing stage '{stage.name}'")
+        
+        # Any answer that does not continue the troubleshooting tree leaves it
+        session_updates = {"troubleshooting": None} if session.get("troubleshooting") else {}
+        session_updates.update(result.session_updates or {})
+        
+        turn.session_state = self._session_state(context.current_node, session.get("troubleshooting"))
+        turn.next_session_state = self._session_state(
+            result.node_id or context.current_node,
+            session_updates.get("troubleshooting", session.get("troubleshooting"))
+        )
+        
+        # One session write for the whole turn: node, fields and both messages
+        messages = [{"role": "user", "content": message, "timestamp": received_at}] if message else []
+        messages.append({"role": "assistant", "content": result.response.text or ""})
+        
+        write = asyncio.ensure_future(self.session_service.commit_turn(
+            user_id=user_id,
+            session_id=session_id,
+            current_node=result.node_id or context.current_node,
+            messages=messages,
+            **session_updates
+        ))
+        try:
+            await deadline.wait(asyncio.shield(write))
+        except DeadlineExceeded:
+            self._defer_write(user_id, write)
+            context.degraded.append("session_write")
+        
+        if not context.degraded:
+            return result.response
+        
+        self._deadline_stats["degraded"] += 1
+        logger.warning(
+            f"Degraded turn to meet the {deadline.budget_ms:.0f} ms deadline: {', '.join(context.degraded)}",
+            extra={"user_id": user_id, "session_id": session_id}
+        )
+        return self._degraded_response(result.response, context.degraded)
+    
+    def _defer_write(self, user_id: str, write: asyncio.Future) -> None:
+        """
+        Let a session write that missed the deadline finish in the background.
+        
+        The user's next turn waits for it before reading the session.
+        
+        Args:
+            user_id: User identifier
+            write: Running commit_turn() call
+        """
+        self._deadline_stats["deferred_writes"] += 1
+        self._deferred_writes[user_id] = write
+        
+        def done(future: asyncio.Future) -> None:
+            if self._deferred_writes.get(user_id) is future:
+                del self._deferred_writes[user_id]
+            if not future.cancelled() and future.exception() is not None:
+                logger.error(
+                    f"Deferred session write failed: {future.exception()}",
+                    extra={"user_id": user_id}
                 )
-                
-                return await self._save_and_return_response(user_id, session_id, response)
-        
-        # ═══════════════════════════════════════════════════════════════
-        # STEP 2: EXPLICIT ACTION
-        # ═══════════════════════════════════════════════════════════════
-        if action:
-            logger.debug(f"Routing to explicit action: {action}")
-            
-            response = await self._generate_flow_response(
-                session_id=session_id,
-                node_id=action
-            )
+        
+        write.add_done_callback(done)
+    
+    async def flush_deferred_writes(self) -> None:
+        """Wait for session writes still running in the background (shutdown)."""
+        if self._deferred_writes:
+            await asyncio.wait(list(self._deferred_writes.values()))
+    
+    @staticmethod
+    def _degraded_response(
+        response: Union[ChatResponse, PreEncodedResponse],
+        degraded: list[str]
+    ) -> ChatResponse:
+        """
+        Mark a response as degraded.
+        
+        Args:
+            response: Routed response
+            degraded: What was skipped or substituted, in order
             
-            # Update session with new node
-            await self.session_service.update_session(
-                user_id=user_id,
-                session_id=session_id,
-                current_node=action
+        Returns:
+            ChatResponse with the degraded field set
+        """
+        if isinstance(response, PreEncodedResponse):
+            response = ChatResponse.model_validate_json(response.body())
+        return response.model_copy(update={"degraded": list(degraded)})
+    
+    def get_deadline_stats(self) -> dict:
+        """
+        Get request deadline statistics.
+        
+        Returns:
+            Dict with the default budget, the reserve kept for the session
+            write, degraded turns, deferred and pending session writes and
+            turns failed for the deadline
+        """
+        return {
+            "default_ms": self.deadline_ms,
+            "reserve_ms": self.deadline_reserve_ms,
+            **self._deadline_stats,
+            "pending_writes": len(self._deferred_writes),
+        }
+    
+    def _routing_stages(self) -> list[RoutingStage]:
+        """
+        Every routing stage, in the default order (see ROUTING_STAGES).
+        
+        Returns:
+            Registered RoutingStage objects
+        """
+        return [
+            RoutingStage("troubleshooting", CostClass.LOOKUP, self._route_troubleshooting),
+            RoutingStage("option", CostClass.LOOKUP, self._route_option),
+            RoutingStage("diagnostic", CostClass.INDEX, self._route_diagnostic),
+            RoutingStage("payment", CostClass.INDEX, self._route_payment),
+            RoutingStage("action", CostClass.LOOKUP, self._route_action),
+            RoutingStage("intent", CostClass.INDEX, self._route_intent),
+            RoutingStage("semantic", CostClass.VECTOR, self._route_semantic),
+            RoutingStage("ai", CostClass.REMOTE, self._route_ai),
+        ]
+    
+    async def _route_troubleshooting(self, context: RouteContext) -> Optional[RouteResult]:
+        """STEP 0: Answer to the current step of the session's troubleshooting tree."""
+        troubleshooting = context.session.get("troubleshooting")
+        if not troubleshooting or not context.message:
+            return None
+        
+        turn = self._troubleshooting_turn(troubleshooting, context.message)
+        if not turn:
+            return None
+        
+        transition, state = turn
+        if transition.step is not None:
+            return RouteResult(
+                self._generate_troubleshooting_response(context.session_id, state),
+                session_updates={"troubleshooting": {"code": state.code, "step": state.step}}
             )
-            
-            return await self._save_and_return_response(user_id, session_id, response)
         
-        # ═══════════════════════════════════════════════════════════════
-        # STEP 3: INTENT DETECTION
-        # ═══════════════════════════════════════════════════════════════
-        if message:
-            intent = await self.intent_engine.detect_intent(message)
-            
-            if intent:
-                # Map intent to flow node
-                node_id = self._map_intent_to_node(intent)
-                logger.debug(f"Mapped intent '{intent}' to node: {node_id}")
-                
-                response = await self._generate_flow_response(
-                    session_id=session_id,
-                    node_id=node_id
-                )
-                
-                # Update session
-                await self.session_service.update_session(
-                    user_id=user_id,
-                    session_id=session_id,
-                    current_node=node_id
-                )
-                
-                return await self._save_and_return_response(user_id, session_id, response)
+        response = await self._generate_flow_response(
+            session_id=context.session_id,
+            node_id=transition.flow_node
+        )
+        return RouteResult(response, node_id=transition.flow_node)
+    
+    async def _route_option(self, context: RouteContext) -> Optional[RouteResult]:
+        """STEP 0.5: Option button labels route directly, without intent checks."""
+        option_node = self._map_option_to_node(context.message) if context.message else None
+        if not option_node:
+            return None
         
-        # ═══════════════════════════════════════════════════════════════
-        # STEP 4: AI FALLBACK (LOWEST PRIORITY)
-        # ═══════════════════════════════════════════════════════════════
-        logger.debug("No match found, using AI fallback")
+        logger.debug(f"Routing option '{context.message}' to node: {option_node}")
+        response = await self._generate_flow_response(
+            session_id=context.session_id,
+            node_id=option_node
+        )
+        return RouteResult(response, node_id=option_node)
+    
+    async def _route_diagnostic(self, context: RouteContext) -> Optional[RouteResult]:
+        """STEP 1: Error code detection (high priority for free text)."""
+        if not context.message:
+            return None
         
-        response = await self._generate_ai_response(
-            session_id=session_id,
-            message=message or "Hello"
+        started = time.perf_counter()
+        diagnostic_results = await self.diagnostic_engine.detect_all_error_codes(
+            context.message,
+            charger_model=context.charger_model
+        )
+        self._record_decision(
+            context.decisions, "diagnostic",
+            [result["error_code"] for result in diagnostic_results], started
         )
         
-        # Update session (keep current node)
-        await self.session_service.update_session(
-            user_id=user_id,
-            session_id=session_id,
-            current_node=current_node
+        if not diagnostic_results:
+            return None
+        
+        error_codes = [result["error_code"] for result in diagnostic_results]
+        logger.info(
+            f"Diagnostic match found: {', '.join(error_codes)}",
+            extra={"error_code": error_codes[0]}
         )
         
-        return await self._save_and_return_response(user_id, session_id, response)
+        # Keep the current node, arm the code's troubleshooting tree
+        response = self._generate_diagnostic_response(
+            session_id=context.session_id,
+            diagnostics=diagnostic_results,
+            charger_model=context.charger_model
+        )
+        return RouteResult(
+            response,
+            session_updates={
+                "troubleshooting": self._troubleshooting_entry(diagnostic_results, context.charger_model)
+            }
+        )
+    
+    async def _route_payment(self, context: RouteContext) -> Optional[RouteResult]:
+        """STEP 1.5: Payment/wallet keywords, typo-tolerant ("payement", "pamyent")."""
+        if not context.message or not self._is_payment_intent(context.message):
+            return None
+        
+        logger.debug("Payment/Wallet keywords detected, routing to wallet flow")
+        response = await self._generate_flow_response(
+            session_id=context.session_id,
+            node_id="wallet_issues"
+        )
+        return RouteResult(response, node_id="wallet_issues")
+    
+    async def _route_action(self, context: RouteContext) -> Optional[RouteResult]:
+        """STEP 2: Explicit action."""
+        if not context.action:
+            return None
+        
+        logger.debug(f"Routing to explicit action: {context.action}")
+        response = await self._generate_flow_response(
+            session_id=context.session_id,
+            node_id=context.action
+        )
+        return RouteResult(response, node_id=context.action)
+    
+    async def _route_intent(self, context: RouteContext) -> Optional[RouteResult]:
+        """STEP 3: Intent detection, mapped to a flow node."""
+        if not context.message:
+            return None
+        
+        started = time.perf_counter()
+        if context.intent is MISSING:
+            # Not already resolved by _likely_ai_bound() for the AI prefetch
+            context.intent = await self.intent_engine.detect_intent(context.message)
+        intent = context.intent
+        self._record_decision(context.decisions, "intent", intent, started)
+        
+        if not intent:
+            return None
+        
+        if intent == "error_report":
+            # A described fault ("screen says earth fault") gets its diagnosis
+            # rather than the generic error code picker
+            result = await self.routing.run_stage("semantic", context)
+            if result is not None:
+                return result
+        
+        node_id = self._map_intent_to_node(intent)
+        logger.debug(f"Mapped intent '{intent}' to node: {node_id}")
+        response = await self._generate_flow_response(
+            session_id=context.session_id,
+            node_id=node_id
+        )
+        return RouteResult(response, node_id=node_id)
+    
+    async def _route_semantic(self, context: RouteContext) -> Optional[RouteResult]:
+        """STEP 3.5: Semantic error match (before AI fallback)."""
+        if not context.message:
+            return None
+        
+        semantic_result = await self.diagnostic_engine.semantic_match(
+            context.message,
+            charger_model=context.charger_model
+        )
+        if not semantic_result:
+            return None
+        
+        logger.info(f"Semantic match: {semantic_result['error_code']}")
+        response = self._generate_diagnostic_response(
+            session_id=context.session_id,
+            diagnostics=[semantic_result],
+            charger_model=context.charger_model
+        )
+        return RouteResult(
+            response,
+            session_updates={
+                "troubleshooting": self._troubleshooting_entry([semantic_result], context.charger_model)
+            }
+        )
+    
+    async def _route_ai(self, context: RouteContext) -> RouteResult:
+        """STEP 4: AI fallback (lowest priority, always answers)."""
+        logger.debug("No match found, using AI fallback")
+        prefetch, context.ai_prefetch = context.ai_prefetch, None
+        if prefetch is not None:
+            # Started before the rule stages ran: only the rest is waited for
+            self._ai_prefetch_stats["used"] += 1
+            self._ai_prefetch_stats["overlap_ms_total"] += (time.monotonic() - prefetch.started_at) * 1000
+            call = prefetch.task
+        else:
+            call = self._generate_ai_response(
+                session_id=context.session_id,
+                message=context.message or "Hello"
+            )
+        
+        try:
+            response = await context.deadline.wait(call, reserve_ms=self.deadline_reserve_ms)
+        except DeadlineExceeded:
+            logger.warning("AI response did not fit the deadline, answering with the support flow")
+            context.degraded.append("ai")
+            response = await self._generate_flow_response(
+                session_id=context.session_id,
+                node_id=self.DEGRADED_AI_NODE
+            )
+        return RouteResult(response)
+    
+    async def _likely_ai_bound(self, context: RouteContext) -> bool:
+        """
+        Guess whether a turn will fall through every rule stage to the AI.
+        
+        Explicit actions, troubleshooting replies, option labels and digits
+        (error codes) mean a rule stage is likely to answer. Otherwise the
+        turn's intent is resolved here, once: a detected intent means the
+        intent stage answers, and the result is kept on the context for that
+        stage to reuse. Last, a message sharing any term with the error
+        catalog ("plug overheat") is left to the diagnostic stages, which
+        answer most fault descriptions.
+        
+        Args:
+            context: The turn
+            
+        Returns:
+            True if the AI fallback is likely to answer
+        """
+        message = context.message
+        if not message or context.action or context.session.get("troubleshooting"):
+            return False
+        if self._map_option_to_node(message) or any(char.isdigit() for char in message):
+            return False
+        
+        context.intent = self.intent_engine.resolve_intent(message)
+        if context.intent is not None:
+            return False
+        
+        return not await self.diagnostic_engine.may_match(message, context.charger_model)
+    
+    async def _prefetch_ai(self, context: RouteContext) -> Optional[_AIPrefetch]:
+        """
+        Start the AI call of a likely AI-bound turn before routing it.
+        
+        The call then runs while the remaining rule stages (fuzzy and
+        keyword error matching, semantic match) are tried; _route_ai() picks
+        it up, and it is cancelled if a rule stage answers. At most
+        AI_PREFETCH_MAX_INFLIGHT speculative calls run at once.
+        
+        Args:
+            context: The turn
+            
+        Returns:
+            The started call, or None
+        """
+        if not self.ai_prefetch_enabled or not await self._likely_ai_bound(context):
+            return None
+        if self._ai_prefetch_inflight >= self.ai_prefetch_max_inflight:
+            self._ai_prefetch_stats["capped"] += 1
+            return None
+        
+        task = asyncio.ensure_future(self._generate_ai_response(
+            session_id=context.session_id,
+            message=context.message
+        ))
+        self._ai_prefetch_inflight += 1
+        self._ai_prefetch_stats["started"] += 1
+        task.add_done_callback(self._ai_prefetch_done)
+        return _AIPrefetch(task)
+    
+    def _ai_prefetch_done(self, task: asyncio.Task) -> None:
+        """Release a speculative call's slot (its failure is seen by _route_ai)."""
+        self._ai_prefetch_inflight -= 1
+        _retrieve_exception(task)
+    
+    def _discard_ai_prefetch(self, prefetch: _AIPrefetch) -> None:
+        """Cancel a speculative AI call a rule stage made unnecessary."""
+        prefetch.task.cancel()
+        self._ai_prefetch_stats["wasted"] += 1
+        self._ai_prefetch_stats["wasted_ms_total"] += (time.monotonic() - prefetch.started_at) * 1000
+        logger.debug("Cancelled speculative AI call, a rule stage answered")
+    
+    def get_ai_prefetch_stats(self) -> dict:
+        """
+        Get speculative AI call statistics.
+        
+        Returns:
+            Dict with the cap, calls in flight, started/used/wasted/capped
+            counts, waste rate, mean time a wasted call ran before it was
+            cancelled and mean rule-stage time overlapped by used calls
+        """
+        stats = self._ai_prefetch_stats
+        started, used, wasted = stats["started"], stats["used"], stats["wasted"]
+        return {
+            "enabled": self.ai_prefetch_enabled,
+            "max_inflight": self.ai_prefetch_max_inflight,
+            "inflight": self._ai_prefetch_inflight,
+            "started": started,
+            "used": used,
+            "wasted": wasted,
+            "capped": stats["capped"],
+            "waste_rate": round(wasted / started, 4) if started else 0.0,
+            "mean_wasted_ms": round(stats["wasted_ms_total"] / wasted, 3) if wasted else 0.0,
+            "mean_overlap_ms": round(stats["overlap_ms_total"] / used, 3) if used else 0.0,
+        }
     
     def _generate_diagnostic_response(
         self,
         session_id: str,
-        diagnostic_data: dict
-    ) -> ChatResponse:
+        diagnostics: list[dict],
+        charger_model: Optional[str] = None
+    ) -> Union[ChatResponse, PreEncodedResponse]:
         """
         Generate diagnostic response from error code detection.
         
+        Uses the pre-encoded fragment for these codes when fragments are enabled.
+        
+        Args:
+            session_id: Session identifier
+            diagnostics: Diagnostic information from diagnostic engine
+            charger_model: Charger model the diagnostics were detected for
+            
+        Returns:
+            ChatResponse or PreEncodedResponse with diagnostic data
+        """
+        if self.response_fragments is None:
+            return self._build_diagnostic_response(session_id, diagnostics)
+        
+        fragment = self.response_fragments.diagnostic(
+            self.diagnostic_engine.catalog_namespace(charger_model),
+            diagnostics,
+            lambda items: self._build_diagnostic_response("", items)
+        )
+        return fragment.bind(session_id)
+    
+    def _build_diagnostic_response(
+        self,
+        session_id: str,
+        diagnostics: list[dict]
+    ) -> ChatResponse:
+        """
+        Build the diagnostic response model.
+        
+        The top-level error_code/description/solutions fields describe the
+        first detected code; every detected code is listed in diagnostics.
+        
         Args:
             session_id: Session identifier
-            diagnostic_data: Diagnostic information from diagnostic engine
+            diagnostics: Diagnostic information from diagnostic engine
+                (one entry per detected error code, in order of mention)
             
         Returns:
             ChatResponse with diagnostic data and follow-up options
         """
-        error_code = diagnostic_data["error_code"]
-        title = diagnostic_data["title"]
+        primary = diagnostics[0]
+        found = ", ".join(f"{item['error_code']} - {item['title']}" for item in diagnostics)
         
-        text = f"I found information about {error_code} - {title}. Please review the solutions below."
+        text = f"I found information about {found}. Please review the solutions below."
         
         # Add smart follow-up options to get feedback
         follow_up_options = [
@@ -285,32 +906,188 @@ class ConversationManager:
         return ChatResponse(
             type="diagnostic",
             text=text,
-            error_code=error_code,
-            description=diagnostic_data["description"],
-            solutions=diagnostic_data["solutions"],
+            error_code=primary["error_code"],
+            description=primary["description"],
+            solutions=primary["solutions"],
+            diagnostics=[DiagnosticInfo(**item) for item in diagnostics],
             options=follow_up_options,  # Add follow-up options
             steps=None,
             action=None,
             session_id=session_id
         )
     
+    @staticmethod
+    def _record_decision(
+        decisions: Optional[dict],
+        kind: str,
+        decision,
+        started: float
+    ) -> None:
+        """
+        Record a production matcher decision for shadow evaluation.
+        
+        Args:
+            decisions: process_message() decisions dict (None when not sampled)
+            kind: "diagnostic" or "intent"
+            decision: Detected error codes or intent
+            started: perf_counter() value before the matcher ran
+        """
+        if decisions is not None:
+            decisions[kind] = {
+                "decision": decision,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 3)
+            }
+    
+    def _troubleshooting_entry(
+        self,
+        diagnostics: list[dict],
+        charger_model: Optional[str] = None
+    ) -> Optional[dict]:
+        """
+        Troubleshooting state to store after a diagnostic response.
+        
+        Trees are defined for default catalog codes; when the primary code
+        has one, "❌ No, still having issues" starts it instead of the
+        generic solution_not_resolved node.
+        
+        Args:
+            diagnostics: Diagnostic information from diagnostic engine
+            charger_model: Charger model the diagnostics were detected for
+            
+        Returns:
+            {"code": code, "step": None} or None if there is no tree
+        """
+        code = diagnostics[0]["error_code"]
+        if (
+            code not in self.diagnostic_engine.troubleshooting
+            or self.diagnostic_engine.catalog_namespace(charger_model) != DEFAULT_NAMESPACE
+        ):
+            return None
+        return {"code": code, "step": None}
+    
+    def _troubleshooting_turn(
+        self,
+        state: dict,
+        message: str
+    ) -> Optional[tuple[Transition, Optional[TroubleshootingStep]]]:
+        """
+        Follow a reply through the session's troubleshooting tree.
+        
+        Replies are looked up in the compiled transition table; no fuzzy or
+        intent matching is done inside a tree.
+        
+        Args:
+            state: Session troubleshooting state {"code": ..., "step": ...}
+                (step is None until the tree is started)
+            message: User's reply
+            
+        Returns:
+            (transition, next step or None) or None if the reply does not
+            belong to the tree
+        """
+        table = self.diagnostic_engine.troubleshooting
+        code, step = state.get("code"), state.get("step")
+        
+        if step is None:
+            if self._map_option_to_node(message) != "solution_not_resolved":
+                return None
+            start = table.start(code)
+            return (Transition(step=start.step), start) if start else None
+        
+        transition = table.transition(code, step, message)
+        if transition is None:
+            return None
+        if transition.step is not None:
+            return transition, table.step(code, transition.step)
+        return transition, None
+    
+    def _generate_troubleshooting_response(
+        self,
+        session_id: str,
+        step: TroubleshootingStep
+    ) -> Union[ChatResponse, PreEncodedResponse]:
+        """
+        Generate response for a troubleshooting step.
+        
+        Uses the pre-encoded fragment for the step when one was loaded.
+        
+        Args:
+            session_id: Session identifier
+            step: Troubleshooting step to ask
+            
+        Returns:
+            ChatResponse or PreEncodedResponse for the step
+        """
+        if self.response_fragments is not None:
+            fragment = self.response_fragments.step(step.code, step.step)
+            if fragment:
+                return fragment.bind(session_id)
+        
+        return self._build_troubleshooting_response(session_id, step)
+    
+    def _build_troubleshooting_response(
+        self,
+        session_id: str,
+        step: TroubleshootingStep
+    ) -> ChatResponse:
+        """
+        Build the troubleshooting step response model.
+        
+        Args:
+            session_id: Session identifier
+            step: Troubleshooting step to ask
+            
+        Returns:
+            ChatResponse with the step question and its answer options
+        """
+        return ChatResponse(
+            type="flow",
+            text=step.text,
+            error_code=step.code,
+            description=None,
+            solutions=None,
+            options=list(step.options),
+            steps=None,
+            action=None,
+            session_id=session_id
+        )
+    
     async def _generate_flow_response(
         self,
         session_id: str,
         node_id: str
-    ) -> ChatResponse:
+    ) -> Union[ChatResponse, PreEncodedResponse]:
         """
         Generate response from flow node.
         
+        Uses the pre-encoded fragment for the node when one was loaded.
+        
         Args:
             session_id: Session identifier
             node_id: Flow node ID
             
         Returns:
-            ChatResponse from flow data
+            ChatResponse or PreEncodedResponse from flow data
         """
+        if self.response_fragments is not None:
+            fragment = self.response_fragments.flow(node_id)
+            if fragment:
+                return fragment.bind(session_id)
+        
         node_data = await self.flow_engine.get_node(node_id)
+        return self._build_flow_response(session_id, node_data)
+    
+    def _build_flow_response(self, session_id: str, node_data: dict) -> ChatResponse:
+        """
+        Build the flow response model.
         
+        Args:
+            session_id: Session identifier
+            node_data: Flow node data
+            
+        Returns:
+            ChatResponse from flow data
+        """
         return ChatResponse(
             type="flow",
             text=node_data.get("text", "I'm not sure how to respond."),
@@ -450,13 +1227,14 @@ class ConversationManager:
     
     def _is_payment_intent(self, message: str) -> bool:
         """
-        Check if message is about payment/wallet using fuzzy matching.
+        Check if message is about payment/wallet, tolerating typos.
         
-        Handles typos like:
+        Uses the intent engine's keyword matching, which corrects typos like:
         - "pamyent" → "payment"
         - "payement" → "payment"
         - "walit" → "wallet"
         - "bilng" → "billing"
+        - "paymnt" → "payment"
         
         Args:
             message: User's message text
@@ -464,51 +1242,9 @@ class ConversationManager:
         Returns:
             True if message appears to be about payments/wallet
         """
-        payment_keywords = ['payment', 'wallet', 'balance', 'refund', 'billing']
-        normalized_msg = normalize_text(message)
-        
-        # Extract words from message
-        msg_words = normalized_msg.split()
-        
-        # For each word in message, check if it fuzzy matches any payment keyword
-        for msg_word in msg_words:
-            for keyword in payment_keywords:
-                # Calculate similarity ratio
-                ratio = SequenceMatcher(None, msg_word, keyword).ratio()
-                
-                # Accept matches with 70%+ similarity (handles typos)
-                if ratio >= 0.70:
-                    logger.debug(f"Payment keyword fuzzy match: '{msg_word}' ≈ '{keyword}' ({ratio:.2%})")
-                    return True
+        for match in self.intent_engine.detect_intents(message):
+            if match.keyword in PAYMENT_KEYWORDS:
+                logger.debug(f"Payment keyword match: '{match.keyword}'")
+                return True
         
         return False
-    
-    async def _save_and_return_response(
-        self,
-        user_id: str,
-        session_id: str,
-        response: ChatResponse
-    ) -> ChatResponse:
-        """
-        Save assistant response to conversation history and return it.
-        
-        Args:
-            user_id: User identifier
-            session_id: Session identifier
-            response: ChatResponse to save and return
-            
-        Returns:
-            The same ChatResponse after saving to history
-        """
-        # Extract text content from response
-        assistant_message = response.text or ""
-        
-        # Save to conversation history
-        await self.session_service.add_message_to_history(
-            user_id=user_id,
-            session_id=session_id,
-            role="assistant",
-            content=assistant_message
-        )
-        
-        return response
@@ -0,0 +1,254 @@
+"""
+CPU Offload
+Keeps CPU-heavy matching off the event loop.
+
+Exact lookups (cache hits, error code aliases, keyword automaton scans)
+take microseconds and run inline. Fuzzy title, keyword and semantic
+matching grow with the message length; a pasted log or a long complaint
+can take several milliseconds, during which the single event loop serves
+nobody else. Each such call carries a cost estimate (estimate_cost_ms) and
+is dispatched to a worker pool when the estimate reaches
+CPU_OFFLOAD_MIN_COST_MS:
+    
+    inline   everything runs on the event loop (no offloading)
+    thread   thread pool (the default): the event loop gets a turn only
+             when the matching thread yields the GIL (every switch
+             interval, 5 ms), so other chats still wait behind a long match
+    process  the batch diagnosis workers, which hold the catalogs already
+             (for heavy catalogs). A call costs a round trip between
+             processes, so only calls estimated at PROCESS_ROUND_TRIPS
+             times the round trip measured by start() go there; cheaper
+             ones, and calls while the workers are starting or a batch is
+             running, use the thread pool
+
+Results are the same in every mode.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+from ..core.logger import setup_logger
+from .batch_diagnosis import BatchDiagnosisPool, run_in_worker, worker_engine
+
+logger = setup_logger(__name__)
+
+OFFLOAD_MODES = ("inline", "thread", "process")
+
+# Matching cost model, measured on the bundled catalog: a fixed part plus a
+# part per message character (trigram and token lookups, embedding hashing)
+BASE_COST_MS = 0.3
+COST_PER_CHAR_MS = 0.0013
+
+# A call goes to a worker process only when its estimate covers this many
+# round trips: the estimate is rough, and the round trip adds to the reply
+PROCESS_ROUND_TRIPS = 3
+ROUND_TRIP_PROBES = 5
+
+
+def estimate_cost_ms(normalized_msg: str) -> float:
+    """
+    Estimate the CPU time of matching a message against a catalog.
+    
+    Args:
+        normalized_msg: Normalized user message
+    
+    Returns:
+        Estimated milliseconds of fuzzy, keyword or semantic matching
+    """
+    return BASE_COST_MS + COST_PER_CHAR_MS * len(normalized_msg)
+
+
+def match_text_task(normalized_msg: str, charger_model: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Worker task: ErrorCatalog.match_text() on the worker's catalog."""
+    catalog = run_in_worker(worker_engine().get_catalog(charger_model))
+    return catalog.match_text(normalized_msg)
+
+
+def semantic_match_task(
+    normalized_msg: str,
+    charger_model: Optional[str],
+    threshold: float,
+    nprobe: int,
+    margin: float
+) -> Optional[Dict[str, Any]]:
+    """Worker task: ErrorCatalog.semantic_match() on the worker's catalog."""
+    catalog = run_in_worker(worker_engine().get_catalog(charger_model))
+    return catalog.semantic_match(normalized_msg, threshold=threshold, nprobe=nprobe, margin=margin)
+
+
+def _log_start_failure(task: asyncio.Task) -> None:
+    """Log a failed background start of the worker processes (retried on next use)."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Failed to start CPU offload workers: {task.exception()}")
+
+
+class CpuOffload:
+    """
+    Runs CPU-heavy calls inline or in a worker pool, depending on their cost.
+    """
+    
+    def __init__(
+        self,
+        mode: str,
+        min_cost_ms: float,
+        max_workers: int,
+        process_pool: Optional[BatchDiagnosisPool] = None
+    ):
+        """
+        Configure offloading (the thread pool starts on first use, the
+        worker processes with start()).
+        
+        Args:
+            mode: "inline", "thread" or "process" (unknown modes fall back to thread)
+            min_cost_ms: Estimated cost from which calls are offloaded (to
+                threads; see start() for worker processes)
+            max_workers: Threads of the thread pool
+            process_pool: Worker processes for process mode, usually the
+                engine's batch pool (without one, process mode uses the
+                thread pool)
+        """
+        if mode not in OFFLOAD_MODES:
+            logger.warning(f"Unknown CPU_OFFLOAD_MODE '{mode}' (expected {', '.join(OFFLOAD_MODES)}), using thread")
+            mode = "thread"
+        if mode == "process" and process_pool is None:
+            mode = "thread"
+        
+        self.mode = mode
+        self.min_cost_ms = min_cost_ms
+        self.max_workers = max(1, max_workers)
+        self.process_pool = process_pool
+        self.round_trip_ms: Optional[float] = None  # Measured by start()
+        self.process_min_cost_ms = min_cost_ms
+        
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._starting: Optional[asyncio.Task] = None
+        self._stats: Dict[str, float] = {"inline": 0, "offloaded": 0, "errors": 0, "offloaded_ms_total": 0.0}
+    
+    @property
+    def threads(self) -> ThreadPoolExecutor:
+        """The thread pool, created on first use."""
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cpu-offload")
+        return self._threads
+    
+    async def start(self) -> None:
+        """
+        Start the worker processes of process mode and measure their round trip.
+        
+        Called at startup, so the first long chat message does not wait for
+        the workers to spawn and load the catalogs. The median round trip of
+        a trivial match sets process_min_cost_ms. Does nothing in the other
+        modes.
+        """
+        if self.mode != "process":
+            return
+        
+        await self.process_pool.start()
+        timings = []
+        for _ in range(ROUND_TRIP_PROBES):
+            started = time.perf_counter()
+            await self.process_pool.run(match_text_task, "", None)
+            timings.append((time.perf_counter() - started) * 1000)
+        
+        self.round_trip_ms = sorted(timings)[len(timings) // 2]
+        self.process_min_cost_ms = max(self.min_cost_ms, PROCESS_ROUND_TRIPS * self.round_trip_ms)
+        logger.info(
+            f"CPU offload workers ready: {self.round_trip_ms:.2f} ms round trip, "
+            f"calls from {self.process_min_cost_ms:.2f} ms go to worker processes"
+        )
+    
+    def _start_in_background(self) -> None:
+        """Restart the worker processes (e.g. after a catalog publish) without waiting."""
+        if self._starting is None or self._starting.done():
+            self._starting = asyncio.get_running_loop().create_task(self.start())
+            self._starting.add_done_callback(_log_start_failure)
+    
+    async def run(
+        self,
+        cost_ms: float,
+        fn: Callable[..., Any],
+        *args,
+        worker_task: Optional[Tuple[Callable[..., Any], tuple]] = None,
+        charger_model: Optional[str] = None
+    ) -> Any:
+        """
+        Run a CPU-bound call, offloading it when it is expensive.
+        
+        Args:
+            cost_ms: Estimated cost of the call (see estimate_cost_ms)
+            fn: Function to run inline or in a thread
+            *args: Arguments of fn
+            worker_task: (module-level function, picklable arguments) computing
+                the same result in a worker process (e.g. match_text_task);
+                without it, process mode runs fn in a thread
+            charger_model: Charger model selecting the catalog worker_task uses
+        
+        Returns:
+            Result of the call
+        """
+        if self.mode == "inline" or cost_ms < self.min_cost_ms:
+            self._stats["inline"] += 1
+            return fn(*args)
+        
+        use_process = (
+            self.mode == "process"
+            and worker_task is not None
+            and cost_ms >= self.process_min_cost_ms
+        )
+        if use_process and not self.process_pool.ready:
+            # Never spawn workers while a user waits: threads until they are up
+            self._start_in_background()
+            use_process = False
+        # While a batch keeps the workers busy a chat match would queue
+        # behind its chunks, so it takes a thread instead
+        use_process = use_process and not self.process_pool.running_batches
+        
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            if use_process:
+                task, task_args = worker_task
+                return await self.process_pool.run(task, *task_args, charger_model=charger_model)
+            return await loop.run_in_executor(self.threads, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory): answer inline, restart next time
+            logger.error("CPU offload worker terminated abruptly, restarting pool")
+            self._stats["errors"] += 1
+            self.process_pool.retire()
+            return fn(*args)
+        finally:
+            self._stats["offloaded"] += 1
+            self._stats["offloaded_ms_total"] += (time.perf_counter() - started) * 1000
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get offloading statistics.
+        
+        Returns:
+            Dict with the mode, cost thresholds, measured worker round trip,
+            inline and offloaded call counts, pool errors and mean offloaded
+            call time (queueing included)
+        """
+        offloaded = self._stats["offloaded"]
+        return {
+            "mode": self.mode,
+            "min_cost_ms": self.min_cost_ms,
+            "process_min_cost_ms": round(self.process_min_cost_ms, 3),
+            "round_trip_ms": None if self.round_trip_ms is None else round(self.round_trip_ms, 3),
+            "inline": self._stats["inline"],
+            "offloaded": offloaded,
+            "errors": self._stats["errors"],
+            "mean_offloaded_ms": round(self._stats["offloaded_ms_total"] / offloaded, 3) if offloaded else 0.0,
+        }
+    
+    def shutdown(self) -> None:
+        """Stop the worker pools (the next offloaded call restarts them)."""
+        if self._starting is not None:
+            self._starting.cancel()
+            self._starting = None
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
@@ -1,6 +1,6 @@
 """
 Diagnostic Engine
-★ CORE COMPONENT ★ 
+★ CORE COMPONENT ★
 Intelligent EV charging error code detection and solution retrieval.
 
 This engine:
@@ -8,15 +8,58 @@ This engine:
 2. Detects error codes using regex + fuzzy matching
 3. Returns structured diagnostic information
 4. Supports multiple error code formats
+5. Serves vendor/charger-model catalogs from CATALOGS_DIR, each with its
+   own indexes, loaded lazily on first use and evicted when over budget
+6. Memory-maps compiled catalog snapshots (<catalog>.bin, built with
+   build_catalog_snapshot.py) instead of parsing JSON when they are up to date
+7. Classifies large batches of messages in a process pool (detect_batch)
+8. Matches free-text fault descriptions by meaning (semantic_match), using
+   hashed embeddings and an approximate nearest-neighbour index
+9. Compiles domain synonyms (synonyms.json) into the keyword index
+10. Completes partially typed codes and titles from a prefix trie (suggest)
+11. Loads per-code troubleshooting trees (troubleshooting_trees.json)
+12. Applies add/update/delete patches to a catalog without a restart
+    (apply_catalog_patch), publishing each patch as a new catalog version;
+    catalogs changed on disk by another server process are reloaded
+13. Runs expensive fuzzy, keyword and semantic matching of long messages
+    in a worker pool so the event loop stays responsive (cpu_offload.py)
 """
+import asyncio
 import json
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, AsyncIterator, Callable, Iterable, List, Tuple
 from ..core.logger import setup_logger
-from ..utils.text_utils import extract_error_pattern, fuzzy_match_title, normalize_text, extract_keywords
+from ..core.config import get_settings
+from ..utils.text_utils import normalize_text
+from ..utils.cache import LRUCache, MISSING
+from ..utils.vector_index import numpy_available
+from ..utils.catalog_snapshot import SNAPSHOT_SUFFIX, SnapshotError, file_sha256
+from ..utils.semantic_index import SEMANTIC_SUFFIX
+from ..utils.synonyms import SYNONYMS_FILENAME, SynonymTable
+from .error_catalog import CatalogPatchError, ErrorCatalog
+from .batch_diagnosis import BatchDiagnosisPool
+from .cpu_offload import CpuOffload, estimate_cost_ms, match_text_task, semantic_match_task
+from .troubleshooting import TROUBLESHOOTING_FILENAME, TroubleshootingTable
 
 logger = setup_logger(__name__)
 
+# Name of the catalog loaded from error_codes_complete.json
+DEFAULT_NAMESPACE = "default"
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """Modification time and size of a file (None if it does not exist)."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
 
 class DiagnosticEngine:
     """
@@ -25,68 +68,542 @@ class DiagnosticEngine:
     This is the BRAIN of the diagnostic system.
     """
     
-    def __init__(self, error_codes_path: Optional[str] = None):
+    def __init__(
+        self,
+        error_codes_path: Optional[str] = None,
+        scoring_backend: Optional[str] = None,
+        catalogs_dir: Optional[str] = None,
+        synonyms_path: Optional[str] = None,
+        offload_mode: Optional[str] = None,
+        reload_check_seconds: Optional[float] = None
+    ):
         """
         Initialize the diagnostic engine.
         
         Args:
             error_codes_path: Path to error codes JSON file
+            scoring_backend: "python" or "numpy" (defaults to DIAGNOSTIC_SCORING_BACKEND)
+            catalogs_dir: Directory of per-vendor/model catalogs (defaults to CATALOGS_DIR)
+            synonyms_path: Domain synonym table (defaults to synonyms.json next to
+                the error codes file)
+            offload_mode: "inline", "thread" or "process" (defaults to CPU_OFFLOAD_MODE;
+                worker processes use "inline")
+            reload_check_seconds: How often catalog files are checked for changes
+                (defaults to CATALOG_RELOAD_CHECK_SECONDS; 0 disables, as in
+                worker processes, which are restarted on every publish)
         """
-        self.error_codes: List[Dict[str, Any]] = []
-        self.error_index: Dict[str, Dict[str, Any]] = {}  # Fast lookup by code
+        settings = get_settings()
+        
         self.error_codes_path = error_codes_path or self._get_default_path()
+        self.synonyms_path = synonyms_path or str(
+            Path(self.error_codes_path).with_name(SYNONYMS_FILENAME)
+        )
+        self.synonyms = SynonymTable()
+        self.troubleshooting_path = str(
+            Path(self.error_codes_path).with_name(TROUBLESHOOTING_FILENAME)
+        )
+        self.troubleshooting = TroubleshootingTable()
+        self.catalogs_dir = Path(catalogs_dir or self._get_base_path() / settings.CATALOGS_DIR)
+        self.scoring_backend = self._resolve_scoring_backend(
+            scoring_backend or settings.DIAGNOSTIC_SCORING_BACKEND
+        )
+        self.use_snapshots = settings.CATALOG_SNAPSHOTS_ENABLED
+        
+        # Semantic stage (needs numpy for the embedding matrix)
+        self.semantic_enabled = settings.SEMANTIC_MATCH_ENABLED and numpy_available()
+        self.semantic_threshold = settings.SEMANTIC_MATCH_THRESHOLD
+        self.semantic_margin = settings.SEMANTIC_MATCH_MARGIN
+        self.semantic_nprobe = settings.SEMANTIC_NPROBE
+        if settings.SEMANTIC_MATCH_ENABLED and not numpy_available():
+            logger.warning("numpy is not installed, semantic matching disabled")
+        
+        # Default catalog (error_codes_complete.json), always resident
+        self.catalog = ErrorCatalog(DEFAULT_NAMESPACE, [], self.scoring_backend)
         
+        # Namespaced catalogs: discovered at load time, built on first use
+        self.available_namespaces: Dict[str, Path] = {}
+        self._namespaces: "OrderedDict[str, ErrorCatalog]" = OrderedDict()
+        self._namespace_locks: Dict[str, asyncio.Lock] = {}
+        self._patch_lock = asyncio.Lock()
+        self._publish_listeners: List[Callable[[ErrorCatalog], None]] = []
+        self.max_loaded_namespaces = settings.CATALOG_MAX_LOADED_NAMESPACES
+        self.max_loaded_entries = settings.CATALOG_MAX_LOADED_ENTRIES
+        
+        # Catalog files are re-checked at most this often (on the request path)
+        # so a patch applied by another server process is picked up here
+        self.reload_check_seconds = (
+            settings.CATALOG_RELOAD_CHECK_SECONDS if reload_check_seconds is None else reload_check_seconds
+        )
+        self._source_stamps: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._next_reload_check = 0.0
+        self._reload_tasks: Dict[str, asyncio.Task] = {}
+        
+        # Memoized detection results keyed on (namespace, normalized message)
+        self.detection_cache = LRUCache(
+            max_size=settings.DIAGNOSTIC_CACHE_SIZE,
+            ttl_seconds=settings.DIAGNOSTIC_CACHE_TTL_SECONDS
+        )
+        
+        # Worker processes for detect_batch (started on first batch)
+        self.batch_pool = BatchDiagnosisPool(
+            self.error_codes_path,
+            str(self.catalogs_dir),
+            self.scoring_backend,
+            max_workers=settings.BATCH_WORKERS,
+            chunk_size=settings.BATCH_CHUNK_SIZE,
+            max_jobs=settings.BATCH_MAX_CONCURRENT,
+            namespace_of=self.catalog_namespace
+        )
+        
+        # Expensive per-message matching, off the event loop; process mode
+        # shares the batch workers, which already hold the catalogs
+        self.offload = CpuOffload(
+            offload_mode or settings.CPU_OFFLOAD_MODE,
+            min_cost_ms=settings.CPU_OFFLOAD_MIN_COST_MS,
+            max_workers=settings.CPU_OFFLOAD_WORKERS,
+            process_pool=self.batch_pool
+        )
+    
+    @property
+    def error_codes(self) -> List[Dict[str, Any]]:
+        """Raw entries of the default catalog."""
+        return self.catalog.entries
+    
+    @property
+    def error_index(self) -> Dict[str, Dict[str, Any]]:
+        """Code → entry index of the default catalog."""
+        return self.catalog.error_index
+    
+    def _resolve_scoring_backend(self, backend: str) -> str:
+        """
+        Validate the configured scoring backend.
+        
+        Args:
+            backend: "python" or "numpy"
+        
+        Returns:
+            Backend that will actually be used
+        """
+        backend = (backend or "python").lower()
+        if backend == "numpy" and not numpy_available():
+            logger.warning("numpy is not installed, using python scoring backend")
+            return "python"
+        if backend not in ("python", "numpy"):
+            logger.warning(f"Unknown scoring backend '{backend}', using python")
+            return "python"
+        return backend
+    
+    def _get_base_path(self) -> Path:
+        """Get the project root directory."""
+        # Navigate from engine/ to root
+        return Path(__file__).parent.parent.parent
+    
     def _get_default_path(self) -> str:
         """Get default path to error codes JSON file."""
-        # Navigate from engine/ to root
-        base_path = Path(__file__).parent.parent.parent
-        return str(base_path / "error_codes_complete.json")
+        return str(self._get_base_path() / "error_codes_complete.json")
+    
+    @staticmethod
+    def namespace_for(charger_model: Optional[str]) -> str:
+        """
+        Map a charger model or vendor name to a catalog namespace.
+        
+        "ACME DC-60kW" → "acme_dc_60kw" (matches catalogs/acme_dc_60kw.json)
+        
+        Args:
+            charger_model: Charger model or vendor name from the client
+        
+        Returns:
+            Namespace name (DEFAULT_NAMESPACE when not given)
+        """
+        if not charger_model:
+            return DEFAULT_NAMESPACE
+        return re.sub(r'[^a-z0-9]+', '_', charger_model.lower()).strip('_') or DEFAULT_NAMESPACE
+    
+    def catalog_namespace(self, charger_model: Optional[str] = None) -> str:
+        """
+        Get the namespace whose catalog serves a charger model.
+        
+        Args:
+            charger_model: Charger model or vendor name from the client
+        
+        Returns:
+            Namespace name (DEFAULT_NAMESPACE for unknown or missing models)
+        """
+        namespace = self.namespace_for(charger_model)
+        return namespace if namespace in self.available_namespaces else DEFAULT_NAMESPACE
     
     async def load_error_codes(self) -> None:
         """
         Load error codes from JSON file at startup.
         This is called ONCE during application initialization.
         All error data is cached in memory for fast lookup.
+        Reloading invalidates the detection cache and unloads every
+        namespaced catalog (they are rebuilt lazily on next use).
         """
+        self.detection_cache.clear()
+        self._namespaces.clear()
+        self._discover_namespaces()
+        self.synonyms = SynonymTable.from_file(self.synonyms_path)
+        self.troubleshooting = TroubleshootingTable.from_file(self.troubleshooting_path)
+        
         try:
-            with open(self.error_codes_path, "r", encoding="utf-8") as f:
-                self.error_codes = json.load(f)
+            self.catalog = self._load_catalog(DEFAULT_NAMESPACE, self.error_codes_path)
             
-            # Build index for O(1) lookup by error code
-            for error in self.error_codes:
-                error_code = error.get("Error_Code", "").upper()
-                if error_code:
-                    self.error_index[error_code] = error
+            # Build the typeahead trie now rather than on the first keystroke
+            self.catalog.suggestion_trie
             
             logger.info(
-                f"Loaded {len(self.error_codes)} error codes from diagnostic database",
-                extra={"error_count": len(self.error_codes)}
+                f"Loaded {len(self.catalog)} error codes from diagnostic database",
+                extra={"error_count": len(self.catalog)}
             )
-            
+        
         except FileNotFoundError:
             logger.error(f"Error codes file not found: {self.error_codes_path}")
-            self.error_codes = []
-            self.error_index = {}
+            self.catalog = ErrorCatalog(DEFAULT_NAMESPACE, [], self.scoring_backend)
         except json.JSONDecodeError as e:
             logger.error(f"Invalid JSON in error codes file: {e}")
-            self.error_codes = []
-            self.error_index = {}
+            self.catalog = ErrorCatalog(DEFAULT_NAMESPACE, [], self.scoring_backend)
+    
+    def _load_catalog(self, name: str, path: str) -> ErrorCatalog:
+        """
+        Load one catalog, preferring its compiled snapshot.
+        
+        The snapshot (same path with a .bin suffix) is memory-mapped when it
+        exists, numpy is installed and it was built from the current JSON
+        and synonym table;
+        otherwise the JSON is parsed and indexed in this process.
+        
+        Args:
+            name: Namespace name
+            path: Catalog JSON file
+        
+        Returns:
+            Built ErrorCatalog
+        
+        Raises:
+            FileNotFoundError: If neither a usable snapshot nor the JSON exists
+            json.JSONDecodeError: If the JSON is invalid
+        """
+        snapshot_path = Path(path).with_suffix(SNAPSHOT_SUFFIX)
+        stamp = _file_stamp(path)
+        catalog = None
+        
+        if self.use_snapshots and snapshot_path.exists():
+            if not numpy_available():
+                logger.warning(f"numpy is not installed, ignoring catalog snapshot {snapshot_path}")
+            else:
+                try:
+                    catalog = ErrorCatalog.from_snapshot(
+                        name, str(snapshot_path), source_path=path, synonyms=self.synonyms
+                    )
+                    logger.info(f"Mapped catalog snapshot {snapshot_path}")
+                except (OSError, SnapshotError) as e:
+                    logger.warning(f"Ignoring catalog snapshot {snapshot_path}: {e}")
+        
+        if catalog is None:
+            catalog = ErrorCatalog.from_file(name, path, self.scoring_backend, self.synonyms)
+        
+        if self.semantic_enabled:
+            source = path if os.path.exists(path) else str(snapshot_path)
+            catalog.load_semantic_index(
+                str(Path(path).with_suffix(SEMANTIC_SUFFIX)),
+                fingerprint=file_sha256(source)
+            )
+        
+        # Taken before reading: a change during the load is seen by the next check
+        self._source_stamps[name] = stamp
+        return catalog
     
-    async def detect_error_code(self, message: str) -> Optional[Dict[str, Any]]:
+    def _discover_namespaces(self) -> None:
+        """Record which vendor/model catalog files exist (without loading them)."""
+        self.available_namespaces = {}
+        if not self.catalogs_dir.is_dir():
+            return
+        
+        for path in sorted(self.catalogs_dir.glob("*.json")):
+            namespace = self.namespace_for(path.stem)
+            if namespace != DEFAULT_NAMESPACE:
+                self.available_namespaces[namespace] = path
+        
+        if self.available_namespaces:
+            logger.info(
+                f"Found {len(self.available_namespaces)} namespaced catalogs: "
+                f"{', '.join(self.available_namespaces)}"
+            )
+    
+    async def get_catalog(self, charger_model: Optional[str] = None) -> ErrorCatalog:
+        """
+        Get the catalog for a charger model, loading it on first use.
+        
+        Unknown models (or no model) use the default catalog.
+        
+        Args:
+            charger_model: Charger model or vendor name from the client
+        
+        Returns:
+            ErrorCatalog to search
+        """
+        self._check_catalog_files()
+        
+        namespace = self.namespace_for(charger_model)
+        if namespace not in self.available_namespaces:
+            return self.catalog
+        
+        catalog = self._namespaces.get(namespace)
+        if catalog is not None:
+            self._namespaces.move_to_end(namespace)
+            return catalog
+        
+        lock = self._namespace_locks.setdefault(namespace, asyncio.Lock())
+        async with lock:
+            # Another request may have finished loading while we waited
+            catalog = self._namespaces.get(namespace)
+            if catalog is not None:
+                return catalog
+            
+            try:
+                catalog = await asyncio.to_thread(
+                    self._load_catalog,
+                    namespace,
+                    str(self.available_namespaces[namespace])
+                )
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"Failed to load catalog '{namespace}': {e}")
+                return self.catalog
+            
+            self._namespaces[namespace] = catalog
+            logger.info(f"Loaded catalog '{namespace}' with {len(catalog)} error codes")
+            self._evict_namespaces()
+        
+        return catalog
+    
+    def _evict_namespaces(self) -> None:
+        """Unload least recently used namespaces while over the memory budget."""
+        while len(self._namespaces) > 1 and (
+            len(self._namespaces) > self.max_loaded_namespaces
+            or sum(len(catalog) for catalog in self._namespaces.values()) > self.max_loaded_entries
+        ):
+            namespace, _ = self._namespaces.popitem(last=False)
+            logger.info(f"Evicted catalog '{namespace}' from memory")
+    
+    def add_publish_listener(self, listener: Callable[[ErrorCatalog], None]) -> None:
+        """
+        Call a function whenever a new catalog version is published.
+        
+        Listeners run synchronously in the same event loop step as the
+        publish (e.g. to rebuild responses derived from the catalog).
+        
+        Args:
+            listener: Called with the published catalog
+        """
+        self._publish_listeners.append(listener)
+    
+    def _is_published(self, catalog: ErrorCatalog) -> bool:
+        """Check whether a catalog version is still the one being served."""
+        return catalog is self.catalog or self._namespaces.get(catalog.name) is catalog
+    
+    def _publish(self, namespace: str, catalog: ErrorCatalog) -> None:
+        """Serve a new catalog version and drop everything derived from the old one."""
+        if namespace == DEFAULT_NAMESPACE:
+            self.catalog = catalog
+        else:
+            self._namespaces[namespace] = catalog
+        self.detection_cache.clear()
+        # Workers holding the old version are replaced (after their running batch streams)
+        self.batch_pool.retire(namespace)
+        
+        for listener in self._publish_listeners:
+            listener(catalog)
+    
+    def _check_catalog_files(self) -> None:
+        """
+        Start reloading served catalogs whose JSON changed on disk.
+        
+        Every server process (uvicorn worker) holds its own catalogs, but a
+        patch is applied by one of them; the others see the replaced file
+        here. Runs at most every reload_check_seconds and only stats the
+        files; the reload itself runs in the background while the current
+        version keeps serving.
+        """
+        if not self.reload_check_seconds:
+            return
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return
+        self._next_reload_check = now + self.reload_check_seconds
+        
+        paths = {DEFAULT_NAMESPACE: self.error_codes_path}
+        paths.update((namespace, str(self.available_namespaces[namespace])) for namespace in self._namespaces)
+        for namespace, path in paths.items():
+            if namespace in self._reload_tasks or namespace not in self._source_stamps:
+                continue
+            if _file_stamp(path) != self._source_stamps[namespace]:
+                task = asyncio.get_running_loop().create_task(self._reload_catalog(namespace, path))
+                self._reload_tasks[namespace] = task
+                task.add_done_callback(lambda _, namespace=namespace: self._reload_tasks.pop(namespace, None))
+    
+    async def _reload_catalog(self, namespace: str, path: str) -> None:
+        """Reload a catalog changed on disk (see _check_catalog_files)."""
+        async with self._patch_lock:
+            await self._reload_if_changed(namespace, path)
+    
+    async def _reload_if_changed(self, namespace: str, path: str) -> None:
+        """
+        Load and publish a catalog again if its file changed since it was loaded.
+        
+        The caller holds _patch_lock.
+        """
+        if _file_stamp(path) == self._source_stamps.get(namespace):
+            return
+        
+        current = self.catalog if namespace == DEFAULT_NAMESPACE else self._namespaces.get(namespace)
+        if current is None:
+            return  # Evicted meanwhile, loaded from the new file on next use
+        
+        try:
+            catalog = await asyncio.to_thread(self._load_catalog, namespace, path)
+            if namespace == DEFAULT_NAMESPACE:
+                await asyncio.to_thread(lambda: catalog.suggestion_trie)
+        except (OSError, json.JSONDecodeError) as e:
+            # Keep serving the current version until the file changes again
+            logger.error(f"Failed to reload catalog '{namespace}': {e}")
+            self._source_stamps[namespace] = _file_stamp(path)
+            return
+        
+        if namespace != DEFAULT_NAMESPACE and namespace not in self._namespaces:
+            return
+        
+        catalog.version = current.version + 1
+        self._publish(namespace, catalog)
+        logger.info(
+            f"Reloaded catalog '{namespace}' version {catalog.version} "
+            f"({len(catalog)} error codes, changed on disk)"
+        )
+    
+    async def apply_catalog_patch(
+        self,
+        operations: List[Dict[str, Any]],
+        charger_model: Optional[str] = None
+    ) -> ErrorCatalog:
+        """
+        Add, update and delete catalog entries without a restart.
+        
+        The next catalog version is built and written to disk in a worker
+        thread (see ErrorCatalog.patched()) while the current version keeps
+        serving; it is then published by replacing the catalog reference,
+        so every lookup sees either the old or the new version in full.
+        Patches are applied one at a time, on top of the file on disk: a
+        change made by another server process is reloaded first.
+        
+        The compiled snapshot (.bin) and semantic index (.vec) are rebuilt
+        and every file is replaced atomically, the JSON last; other server
+        processes keep their mappings of the old files and pick up the new
+        version within CATALOG_RELOAD_CHECK_SECONDS. Versions are counted
+        per process. The detection cache is cleared and batch and offload
+        worker processes restart with the new file.
+        
+        Args:
+            operations: Patch operations (see ErrorCatalog.patched())
+            charger_model: Charger model/vendor whose catalog is patched
+                (default catalog if not given or unknown)
+        
+        Returns:
+            The published catalog
+        
+        Raises:
+            CatalogPatchError: If an operation is invalid (nothing is changed)
+            OSError: If the catalog file cannot be written (nothing is changed)
+        """
+        namespace = self.catalog_namespace(charger_model)
+        
+        async with self._patch_lock:
+            if namespace == DEFAULT_NAMESPACE:
+                path = self.error_codes_path
+            else:
+                path = str(self.available_namespaces[namespace])
+            
+            await self._reload_if_changed(namespace, path)
+            current = await self.get_catalog(charger_model)
+            if namespace != DEFAULT_NAMESPACE and current is self.catalog:
+                raise CatalogPatchError(f"catalog '{namespace}' could not be loaded", status_code=503)
+            
+            catalog = await asyncio.to_thread(self._build_patched_catalog, current, operations, path)
+            self._publish(namespace, catalog)
+        
+        logger.info(
+            f"Published catalog '{namespace}' version {catalog.version} "
+            f"({len(operations)} changes, {len(catalog)} error codes)"
+        )
+        return catalog
+    
+    def _build_patched_catalog(
+        self,
+        current: ErrorCatalog,
+        operations: List[Dict[str, Any]],
+        path: str
+    ) -> ErrorCatalog:
+        """Build, persist and index the next catalog version (runs in a thread)."""
+        catalog = current.patched(operations)
+        
+        # Write next to the target and rename over it, so the file is never half-written
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=directory, suffix=".tmp", delete=False
+        ) as f:
+            json.dump(list(catalog.entries), f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        
+        try:
+            # Derived files first, so other processes reloading the new JSON find them current
+            snapshot_path = Path(path).with_suffix(SNAPSHOT_SUFFIX)
+            if snapshot_path.exists() and numpy_available():
+                catalog.write_snapshot(str(snapshot_path), source_path=f.name)
+                logger.info(f"Rebuilt catalog snapshot {snapshot_path}")
+            
+            if self.semantic_enabled:
+                catalog.load_semantic_index(
+                    str(Path(path).with_suffix(SEMANTIC_SUFFIX)),
+                    fingerprint=file_sha256(f.name)
+                )
+            
+            os.replace(f.name, path)
+        except Exception:
+            os.unlink(f.name)
+            raise
+        self._source_stamps[catalog.name] = _file_stamp(path)
+        
+        if catalog.name == DEFAULT_NAMESPACE:
+            catalog.suggestion_trie
+        
+        return catalog
+    
+    async def detect_error_code(
+        self,
+        message: str,
+        charger_model: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         ★★★ MAIN DIAGNOSTIC FUNCTION ★★★
         
         Detect error code from user message and return structured diagnostic info.
         
+        Results (including "no match") are memoized per normalized message,
+        so repeated queries skip the whole pipeline. Fuzzy and keyword
+        matching of long messages runs in the CPU offload pool; a result is
+        only memoized if the catalog it came from is still served afterwards
+        (a new version may have been published meanwhile).
+        
         Detection Strategy:
-        1. Extract error code pattern using regex (ER001, error 15, 301, etc.)
+        1. Resolve error code surface forms (ER001, error 15, E1, 301, etc.)
+           through the precomputed alias table
         2. Direct lookup in error index
         3. Fuzzy match against error titles/descriptions
         4. Keyword-based search in descriptions
         
         Args:
             message: User's input message
-            
+            charger_model: Optional charger model/vendor selecting the catalog
+        
         Returns:
             Structured error object or None:
             {
@@ -96,155 +613,275 @@ class DiagnosticEngine:
                 "solutions": ["Remove the gun...", "If physical heating..."]
             }
         """
-        if not message or not self.error_codes:
+        if not message:
             return None
         
-        # STEP 1: Try regex pattern extraction
-        error_code = extract_error_pattern(message)
-        
-        if error_code:
-            logger.info(f"Extracted error code from pattern: {error_code}")
-            result = self._lookup_by_code(error_code)
-            if result:
-                return result
+        catalog = await self.get_catalog(charger_model)
+        if not len(catalog):
+            return None
         
-        # STEP 2: Fuzzy match against error titles
         normalized_msg = normalize_text(message)
-        result = self._fuzzy_match_titles(normalized_msg)
-        if result:
-            logger.info(f"Matched error via fuzzy title matching: {result['error_code']}")
-            return result
-        
-        # STEP 3: Keyword search in descriptions
-        result = self._keyword_search(normalized_msg)
-        if result:
-            logger.info(f"Matched error via keyword search: {result['error_code']}")
-            return result
-        
-        logger.debug(f"No error code detected in message: {message[:50]}")
-        return None
+        cache_key = (catalog.name, normalized_msg)
+        
+        cached = self.detection_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+        
+        result = catalog.resolve(normalized_msg)
+        if result is None:
+            result = await self.offload.run(
+                estimate_cost_ms(normalized_msg),
+                catalog.match_text, normalized_msg,
+                worker_task=(match_text_task, (normalized_msg, charger_model)),
+                charger_model=charger_model
+            )
+        
+        if self._is_published(catalog):
+            self.detection_cache.set(cache_key, result)
+        return result
     
-    def _lookup_by_code(self, error_code: str) -> Optional[Dict[str, Any]]:
+    async def detect_all_error_codes(
+        self,
+        message: str,
+        charger_model: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Direct lookup by error code.
+        Detect every error code mentioned in a message.
         
-        Supports multiple formats:
-        - "301" → checks "301" then "ER301"
-        - "ER001" → checks "ER001" then "001"
+        Chargers often show several faults together ("ER005 and ER006 after
+        ER001"). The message is scanned once and every resolvable code is
+        returned in order of first mention. When no explicit code is present,
+        this falls back to detect_error_code() (fuzzy title and keyword
+        matching), which yields at most one diagnostic.
         
         Args:
-            error_code: Error code (e.g., "ER001" or "301")
-            
+            message: User's input message
+            charger_model: Optional charger model/vendor selecting the catalog
+        
         Returns:
-            Structured error object or None
+            Ordered, de-duplicated list of structured error objects (may be empty)
         """
-        error_code_upper = error_code.upper().strip()
+        if not message:
+            return []
         
-        # Try direct lookup first
-        if error_code_upper in self.error_index:
-            return self._format_error_response(self.error_index[error_code_upper])
+        catalog = await self.get_catalog(charger_model)
+        if not len(catalog):
+            return []
         
-        # If numeric without ER prefix, try adding ER prefix
-        if not error_code_upper.startswith("ER") and error_code_upper.isdigit():
-            er_version = f"ER{error_code_upper}"
-            if er_version in self.error_index:
-                return self._format_error_response(self.error_index[er_version])
+        normalized_msg = normalize_text(message)
+        cache_key = (catalog.name, "all", normalized_msg)
         
-        # If has ER prefix, try without it
-        if error_code_upper.startswith("ER"):
-            numeric_version = error_code_upper[2:]
-            if numeric_version in self.error_index:
-                return self._format_error_response(self.error_index[numeric_version])
+        cached = self.detection_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
         
-        return None
+        results = catalog.resolve_all(normalized_msg)
+        
+        if not results:
+            result = await self.detect_error_code(message, charger_model)
+            results = [result] if result else []
+        
+        if self._is_published(catalog):
+            self.detection_cache.set(cache_key, results)
+        return results
     
-    def _fuzzy_match_titles(self, query: str) -> Optional[Dict[str, Any]]:
+    async def semantic_match(
+        self,
+        message: str,
+        charger_model: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
         """
-        Fuzzy match against error titles.
+        Match a free-text fault description to a catalog entry by meaning.
+        
+        Connects everyday wording to catalog wording ("the breaker keeps
+        tripping" → RCCB Trip / MCB Trip) when no code, title or keyword
+        match was found. Only matches at or above SEMANTIC_MATCH_THRESHOLD
+        that lead the runner-up error code by SEMANTIC_MATCH_MARGIN are
+        returned, so ordinary chat ("I want to see my display") falls
+        through to intents and AI.
         
         Args:
-            query: Normalized user query
-            
+            message: User's input message
+            charger_model: Optional charger model/vendor selecting the catalog
+        
         Returns:
-            Best matching error object or None
+            Structured error object or None
         """
-        titles = [error.get("Tittle", "") for error in self.error_codes]
-        matched_title = fuzzy_match_title(query, titles, threshold=0.6)
+        if not message or not self.semantic_enabled:
+            return None
         
-        if matched_title:
-            # Find the error with this title
-            for error in self.error_codes:
-                if error.get("Tittle") == matched_title:
-                    return self._format_error_response(error)
+        catalog = await self.get_catalog(charger_model)
+        if catalog.semantic_index is None:
+            return None
         
-        return None
+        normalized_msg = normalize_text(message)
+        cache_key = (catalog.name, "semantic", normalized_msg)
+        
+        cached = self.detection_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+        
+        result = await self.offload.run(
+            estimate_cost_ms(normalized_msg),
+            lambda: catalog.semantic_match(
+                normalized_msg,
+                threshold=self.semantic_threshold,
+                nprobe=self.semantic_nprobe,
+                margin=self.semantic_margin
+            ),
+            worker_task=(
+                semantic_match_task,
+                (
+                    normalized_msg, charger_model,
+                    self.semantic_threshold, self.semantic_nprobe, self.semantic_margin
+                )
+            ),
+            charger_model=charger_model
+        )
+        if self._is_published(catalog):
+            self.detection_cache.set(cache_key, result)
+        return result
     
-    def _keyword_search(self, query: str) -> Optional[Dict[str, Any]]:
+    async def may_match(self, message: str, charger_model: Optional[str] = None) -> bool:
         """
-        Search error descriptions using keywords.
+        Cheaply check whether the catalog could answer a message.
+        
+        Only looks up the message terms in the keyword index (see
+        ErrorCatalog.mentions_indexed_terms); no matching is done.
         
         Args:
-            query: Normalized user query
-            
+            message: User's input message
+            charger_model: Optional charger model/vendor selecting the catalog
+        
         Returns:
-            Best matching error object or None
+            True if the message shares a term with the catalog
+        """
+        if not message:
+            return False
+        catalog = await self.get_catalog(charger_model)
+        return catalog.mentions_indexed_terms(normalize_text(message))
+    
+    async def suggest(
+        self,
+        prefix: str,
+        limit: int = 5,
+        charger_model: Optional[str] = None
+    ) -> List[Dict[str, str]]:
         """
-        keywords = extract_keywords(query)
+        Complete a partially typed error code or title (typeahead).
         
-        if not keywords:
-            return None
+        Args:
+            prefix: Text typed so far
+            limit: Maximum number of suggestions
+            charger_model: Optional charger model/vendor selecting the catalog
         
-        best_match = None
-        best_score = 0
+        Returns:
+            List of {"error_code", "title"} dicts, best first
+        """
+        catalog = await self.get_catalog(charger_model)
+        if not catalog.suggestion_trie_built:
+            # First typeahead for a vendor catalog: build off the event loop
+            await asyncio.to_thread(lambda: catalog.suggestion_trie)
+        return catalog.suggest(prefix, limit)
+    
+    def detect_batch(
+        self,
+        messages: Iterable[str],
+        charger_model: Optional[str] = None
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Detect the error code of many messages in worker processes.
         
-        for error in self.error_codes:
-            description = normalize_text(error.get("Description", ""))
-            title = normalize_text(error.get("Tittle", ""))
-            
-            # Count keyword matches
-            score = 0
-            for keyword in keywords:
-                if keyword in description or keyword in title:
-                    score += 1
-            
-            # Require at least 2 keyword matches to avoid false positives
-            if score > best_score and score >= 2:
-                best_score = score
-                best_match = error
+        Same logic as detect_error_code(), run in chunks across a process
+        pool whose workers load the catalog once. The event loop is never
+        blocked.
         
-        if best_match:
-            return self._format_error_response(best_match)
+        Args:
+            messages: Messages (any iterable, consumed lazily)
+            charger_model: Optional charger model/vendor selecting the catalog
         
-        return None
+        Returns:
+            Async iterator of results (structured error object or None),
+            in input order
+        
+        Example:
+            async for result in engine.detect_batch(ticket_texts):
+                ...
+        """
+        return self.batch_pool.detect(messages, charger_model)
     
-    def _format_error_response(self, error_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _detect(self, normalized_msg: str) -> Optional[Dict[str, Any]]:
         """
-        Format error data into standardized response structure.
+        Run the detection pipeline on the default catalog (uncached).
         
         Args:
-            error_data: Raw error data from JSON
-            
+            normalized_msg: Normalized user message
+        
+        Returns:
+            Structured error object or None
+        """
+        return self.catalog.detect(normalized_msg)
+    
+    async def rank_errors(
+        self,
+        message: str,
+        top_k: int = 5,
+        charger_model: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank catalog entries against a free-text message.
+        
+        Useful for "did you mean" suggestions when no single error is certain.
+        
+        Args:
+            message: User's input message
+            top_k: Maximum number of suggestions
+            charger_model: Optional charger model/vendor selecting the catalog
+        
         Returns:
-            Formatted error object
+            Formatted error objects with an added "score" field, best first
         """
-        return {
-            "error_code": error_data.get("Error_Code", ""),
-            "title": error_data.get("Tittle", ""),  # Note: JSON has typo "Tittle"
-            "description": error_data.get("Description", ""),
-            "solutions": error_data.get("Solution", [])
-        }
+        catalog = await self.get_catalog(charger_model)
+        return catalog.rank(message, top_k=top_k)
     
-    def get_error_by_code(self, error_code: str) -> Optional[Dict[str, Any]]:
+    def get_error_by_code(
+        self,
+        error_code: str,
+        charger_model: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         Get error information by exact error code.
         
+        Only the default catalog and namespaces that are already loaded are
+        searched; use detect_error_code() to trigger lazy loading.
+        
         Args:
             error_code: Error code (e.g., "ER001")
-            
+            charger_model: Optional charger model/vendor selecting the catalog
+        
         Returns:
             Formatted error object or None
         """
-        return self._lookup_by_code(error_code)
+        catalog = self._namespaces.get(self.namespace_for(charger_model), self.catalog)
+        return catalog.lookup(error_code)
+    
+    def get_loaded_namespaces(self) -> List[str]:
+        """
+        Get namespaced catalogs currently held in memory.
+        
+        Returns:
+            Namespace names, least recently used first
+        """
+        return list(self._namespaces)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get detection cache statistics.
+        
+        Returns:
+            Dict with cache size, hits, misses, evictions and hit rate
+        """
+        return self.detection_cache.get_stats()
     
     def is_database_loaded(self) -> bool:
         """
@@ -253,7 +890,7 @@ class DiagnosticEngine:
         Returns:
             True if database is loaded, False otherwise
         """
-        return len(self.error_codes) > 0
+        return len(self.catalog) > 0
     
     def get_total_error_count(self) -> int:
         """
@@ -262,4 +899,4 @@ class DiagnosticEngine:
         Returns:
             Count of error codes
         """
-        return len(self.error_codes)
+        return len(self.catalog)
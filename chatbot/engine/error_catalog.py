@@ -0,0 +1,797 @@
+"""
+Error Catalog
+One error code table (the default catalog or a vendor/charger-model namespace)
+together with every lookup structure derived from it.
+
+Each catalog owns its own:
+1. Code index + alias resolver (ER001, er-1, E1, 301, typos)
+2. Trigram index for fuzzy title matching
+3. BM25 keyword index over titles and descriptions
+
+so lookups only ever search one vendor's table.
+
+A catalog is built either from JSON (parsed and indexed in this process) or
+from a compiled snapshot (memory-mapped, see catalog_snapshot.py). A catalog
+is never modified once published: patched() returns a new version.
+"""
+import json
+import os
+from typing import Iterable, Optional, Dict, Any, List
+from ..core.logger import setup_logger
+from ..utils.text_utils import title_similarity, normalize_text, tokenize
+from ..utils.search_index import BM25Index, PrefixTrie, TrigramIndex
+from ..utils.code_resolver import ErrorCodeResolver
+from ..utils.vector_index import CompiledBM25Index, CompiledTrigramIndex
+from ..utils.catalog_snapshot import (
+    RecordTable,
+    SnapshotError,
+    SnapshotReader,
+    Vocabulary,
+    file_sha256,
+    pack_strings,
+    write_snapshot,
+)
+from ..utils.semantic_index import SemanticIndex
+from ..utils.synonyms import SynonymTable
+
+logger = setup_logger(__name__)
+
+# Entry fields an update operation may change
+PATCHABLE_FIELDS = ("Tittle", "Description", "Solution")
+
+
+class CatalogPatchError(ValueError):
+    """Raised when a catalog patch cannot be applied (nothing is changed)."""
+    
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ErrorCatalog:
+    """
+    Immutable-after-build error catalog with prebuilt lookup indexes.
+    """
+    
+    # Similarity needed for a fuzzy title match
+    FUZZY_TITLE_THRESHOLD = 0.6
+    
+    # Trigram candidates verified with the exact title scorer
+    FUZZY_TITLE_CANDIDATES = 8
+    
+    # Completions kept per typeahead prefix
+    MAX_SUGGESTIONS = 10
+    
+    # Semantic neighbours searched for the runner-up code (see semantic_match)
+    SEMANTIC_CANDIDATES = 5
+    
+    def __init__(
+        self,
+        name: str,
+        entries: List[Dict[str, Any]],
+        scoring_backend: str = "python",
+        synonyms: Optional[SynonymTable] = None
+    ):
+        """
+        Build a catalog and all of its indexes.
+        
+        Args:
+            name: Namespace name ("default" for error_codes_complete.json)
+            entries: Raw catalog entries (Error_Code, Tittle, Description, Solution)
+            scoring_backend: "python" or "numpy" (caller checks numpy availability)
+            synonyms: Domain synonyms compiled into the keyword index
+        """
+        self.name = name
+        self.entries = entries
+        self.scoring_backend = scoring_backend
+        self.synonyms = synonyms or SynonymTable()
+        self.snapshot_path: Optional[str] = None
+        self.semantic_index: Optional[SemanticIndex] = None
+        self._suggestion_trie: Optional[PrefixTrie] = None
+        self.version = 1
+        
+        self._index_codes(error.get("Error_Code", "").upper() for error in self.entries)
+        self.keyword_index = self._build_keyword_index()
+        self.title_index = self._build_title_index()
+    
+    def _index_codes(self, codes: Iterable[str]) -> None:
+        """
+        Build the code → position index and the alias resolver.
+        
+        Args:
+            codes: Upper-cased error code of every entry, in entry order
+        """
+        # Position of each code in self.entries for O(1) lookup
+        self.code_positions: Dict[str, int] = {}
+        self._error_index: Optional[Dict[str, Dict[str, Any]]] = None
+        self.code_resolver = ErrorCodeResolver()
+        for position, error_code in enumerate(codes):
+            if error_code:
+                self.code_positions[error_code] = position
+                self.code_resolver.add_code(error_code)
+    
+    @property
+    def error_index(self) -> Dict[str, Dict[str, Any]]:
+        """Code → raw entry mapping (built once per catalog version)."""
+        if self._error_index is None:
+            self._error_index = {code: self.entries[position] for code, position in self.code_positions.items()}
+        return self._error_index
+    
+    @property
+    def suggestion_trie(self) -> PrefixTrie:
+        """
+        Typeahead trie over codes and title words (built on first use).
+        
+        Keys are the lower-cased code, the normalized title and every title
+        suffix starting at a word ("temperature limit", "limit"), ranked in
+        that order and then by catalog position.
+        """
+        if self._suggestion_trie is None:
+            trie = PrefixTrie(top_k=self.MAX_SUGGESTIONS)
+            count = len(self.entries)
+            for position, error in enumerate(self.entries):
+                code = error.get("Error_Code", "").strip().lower()
+                if code:
+                    trie.add(code, position, rank=position)
+                
+                words = normalize_text(error.get("Tittle", "")).split(" ")
+                for start in range(len(words)):
+                    if words[start]:
+                        kind = 1 if start == 0 else 2
+                        trie.add(" ".join(words[start:]), position, rank=kind * count + position)
+            
+            trie.finalize()
+            self._suggestion_trie = trie
+        return self._suggestion_trie
+    
+    @property
+    def suggestion_trie_built(self) -> bool:
+        """Whether suggestion_trie is built (its first access can take a while)."""
+        return self._suggestion_trie is not None
+    
+    @classmethod
+    def from_file(
+        cls,
+        name: str,
+        path: str,
+        scoring_backend: str = "python",
+        synonyms: Optional[SynonymTable] = None
+    ) -> "ErrorCatalog":
+        """
+        Load a catalog from a JSON file.
+        
+        Args:
+            name: Namespace name
+            path: Path to a JSON list of catalog entries
+            scoring_backend: "python" or "numpy"
+            synonyms: Domain synonyms compiled into the keyword index
+        
+        Returns:
+            Built ErrorCatalog
+        
+        Raises:
+            FileNotFoundError: If the file does not exist
+            json.JSONDecodeError: If the file is not valid JSON
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        
+        return cls(name, entries, scoring_backend, synonyms)
+    
+    @classmethod
+    def from_snapshot(
+        cls,
+        name: str,
+        path: str,
+        source_path: Optional[str] = None,
+        synonyms: Optional[SynonymTable] = None
+    ) -> "ErrorCatalog":
+        """
+        Open a compiled catalog snapshot.
+        
+        Entries, titles and index arrays stay in the read-only mapping and are
+        decoded on access; only the code resolver is rebuilt in this process.
+        Snapshots always use the numpy scoring backend.
+        
+        Args:
+            name: Namespace name
+            path: Snapshot file written by write_snapshot()
+            source_path: JSON the snapshot was built from, checked for changes
+            synonyms: Synonym table the snapshot must have been compiled with
+        
+        Returns:
+            ErrorCatalog backed by the snapshot
+        
+        Raises:
+            SnapshotError: If the snapshot is corrupt, of another format
+                version, older than source_path or built with other synonyms
+        """
+        reader = SnapshotReader(path)
+        meta = reader.json("meta")
+        synonyms = synonyms or SynonymTable()
+        
+        if source_path and os.path.exists(source_path):
+            if meta.get("source_sha256") != file_sha256(source_path):
+                raise SnapshotError(f"{source_path} changed since the snapshot was built")
+        if meta.get("synonyms_sha256") != synonyms.fingerprint:
+            raise SnapshotError("synonym table changed since the snapshot was built")
+        
+        catalog = cls.__new__(cls)
+        catalog.name = name
+        catalog.scoring_backend = "numpy"
+        catalog.synonyms = synonyms
+        catalog.snapshot_path = path
+        catalog.semantic_index = None
+        catalog._suggestion_trie = None
+        catalog.version = 1
+        catalog.entries = reader.strings("entries", RecordTable)
+        catalog._index_codes(reader.strings("codes"))
+        
+        catalog.keyword_index = CompiledBM25Index.from_arrays(
+            Vocabulary(reader.strings("keyword.vocab")),
+            reader.array("keyword.offsets", "<i8"),
+            reader.array("keyword.doc_ids", "<i4"),
+            reader.array("keyword.weights", "<f4"),
+            meta["keyword_doc_count"]
+        )
+        catalog.title_index = CompiledTrigramIndex.from_arrays(
+            Vocabulary(reader.strings("title.vocab")),
+            reader.array("title.offsets", "<i8"),
+            reader.array("title.doc_ids", "<i4"),
+            reader.array("title.gram_counts", "<f4"),
+            reader.strings("titles"),
+            q=meta["title_q"]
+        )
+        return catalog
+    
+    def write_snapshot(self, path: str, source_path: Optional[str] = None) -> None:
+        """
+        Compile this catalog into a snapshot file (requires numpy).
+        
+        Args:
+            path: Destination file (replaced atomically)
+            source_path: JSON the catalog was loaded from, recorded for staleness checks
+        """
+        keyword_index = self.keyword_index
+        if not isinstance(keyword_index, CompiledBM25Index):
+            keyword_index = CompiledBM25Index(keyword_index)
+        
+        title_index = self.title_index
+        if not isinstance(title_index, CompiledTrigramIndex):
+            title_index = CompiledTrigramIndex(title_index)
+        
+        meta = {
+            "name": self.name,
+            "entry_count": len(self),
+            "keyword_doc_count": keyword_index.doc_count,
+            "title_q": title_index.q,
+            "source_sha256": file_sha256(source_path) if source_path else None,
+            "synonyms_sha256": self.synonyms.fingerprint,
+        }
+        
+        sections = {"meta": json.dumps(meta).encode("utf-8")}
+        string_tables = {
+            "entries": (
+                json.dumps(error, ensure_ascii=False, separators=(",", ":"))
+                for error in self.entries
+            ),
+            "codes": (error.get("Error_Code", "").upper() for error in self.entries),
+            "titles": (normalize_text(error.get("Tittle", "")) for error in self.entries),
+            "keyword.vocab": keyword_index.vocabulary,
+            "title.vocab": title_index.vocabulary,
+        }
+        for table, strings in string_tables.items():
+            for part, data in pack_strings(strings).items():
+                sections[f"{table}.{part}"] = data
+        
+        sections.update({
+            "keyword.offsets": keyword_index.offsets.astype("<i8").tobytes(),
+            "keyword.doc_ids": keyword_index.doc_ids.astype("<i4").tobytes(),
+            "keyword.weights": keyword_index.weights.astype("<f4").tobytes(),
+            "title.offsets": title_index.offsets.astype("<i8").tobytes(),
+            "title.doc_ids": title_index.doc_ids.astype("<i4").tobytes(),
+            "title.gram_counts": title_index.gram_counts.astype("<f4").tobytes(),
+        })
+        
+        write_snapshot(path, sections)
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def _build_keyword_index(self):
+        """
+        Build the BM25 inverted index over error titles and descriptions.
+        
+        Documents are identified by their position in self.entries, so
+        every catalog entry (including duplicate codes) stays searchable.
+        Synonyms are compiled in as extra postings ("plug" finds "gun").
+        """
+        index = BM25Index()
+        for position, error in enumerate(self.entries):
+            index.add_document(position, self._document_tokens(error), self.synonyms.expansions)
+        index.finalize()
+        
+        if self.scoring_backend == "numpy":
+            return CompiledBM25Index(index)
+        return index
+    
+    @staticmethod
+    def _document_tokens(error: Dict[str, Any]) -> List[str]:
+        """Keyword index terms of an entry (title and description)."""
+        return tokenize(error.get("Tittle", "")) + tokenize(error.get("Description", ""))
+    
+    def patched(self, operations: List[Dict[str, Any]]) -> "ErrorCatalog":
+        """
+        Build the next version of this catalog with add/update/delete applied.
+        
+        This catalog is left untouched, so searches running against it are
+        unaffected; the caller publishes the returned catalog in its place.
+        With the python scoring backend only the changed entries are
+        re-indexed (posting lists are shared copy-on-write, the code
+        resolver is copied); compiled indexes (numpy backend, snapshots) are
+        rebuilt from the patched entries. The semantic index and the
+        typeahead trie are not carried over.
+        
+        A deleted entry's position is taken by the last entry, so positions
+        stay contiguous. Deleting a code removes every entry listing it.
+        
+        Operations (applied in order, all or nothing):
+            {"op": "add", "entry": {"Error_Code": ..., "Tittle": ..., ...}}
+            {"op": "update", "error_code": "ER015", "entry": {"Solution": [...]}}
+            {"op": "delete", "error_code": "ER016"}
+        
+        Args:
+            operations: Patch operations
+        
+        Returns:
+            New ErrorCatalog with version incremented
+        
+        Raises:
+            CatalogPatchError: If an operation is invalid (unknown code,
+                duplicate code, unknown op or field)
+        """
+        incremental = isinstance(self.keyword_index, BM25Index) and isinstance(self.title_index, TrigramIndex)
+        
+        catalog = ErrorCatalog.__new__(ErrorCatalog)
+        catalog.name = self.name
+        catalog.scoring_backend = self.scoring_backend
+        catalog.synonyms = self.synonyms
+        catalog.snapshot_path = None
+        catalog.semantic_index = None
+        catalog._suggestion_trie = None
+        catalog.version = self.version + 1
+        catalog.entries = list(self.entries)
+        catalog.code_positions = dict(self.code_positions)
+        catalog._error_index = None
+        catalog.code_resolver = self.code_resolver.copy()
+        if incremental:
+            catalog.keyword_index = self.keyword_index.copy()
+            catalog.title_index = self.title_index.copy()
+        
+        removed_codes = False
+        for operation in operations:
+            removed_codes |= catalog._apply_operation(operation, incremental)
+        
+        if removed_codes:
+            catalog._index_codes(error.get("Error_Code", "").upper() for error in catalog.entries)
+        
+        if incremental:
+            catalog.keyword_index.finalize()
+            catalog.title_index.finalize()
+        else:
+            catalog.scoring_backend = "numpy"
+            catalog.keyword_index = catalog._build_keyword_index()
+            catalog.title_index = catalog._build_title_index()
+        
+        return catalog
+    
+    def _apply_operation(self, operation: Dict[str, Any], incremental: bool) -> bool:
+        """
+        Apply one patch operation to this (unpublished) catalog.
+        
+        Returns:
+            True if an error code was removed (the code index must be rebuilt)
+        """
+        op = operation.get("op")
+        entry = dict(operation.get("entry") or {})
+        if op not in ("add", "update", "delete"):
+            raise CatalogPatchError(f"unknown op '{op}' (expected add, update or delete)")
+        
+        if op == "add":
+            code = str(entry.get("Error_Code", "")).strip().upper()
+            if not code:
+                raise CatalogPatchError("add: entry needs an Error_Code")
+            if code in self.code_positions:
+                raise CatalogPatchError(f"add: {code} already exists", status_code=409)
+            
+            self.entries.append(entry)
+            position = len(self.entries) - 1
+            self.code_positions[code] = position
+            self.code_resolver.add_code(code)
+            if incremental:
+                self._index_position(position)
+            return False
+        
+        code = str(operation.get("error_code", "")).strip().upper()
+        position = self.code_positions.get(code)
+        if position is None:
+            raise CatalogPatchError(f"{op}: {code or 'error_code'} not found", status_code=404)
+        
+        if op == "update":
+            unknown = set(entry) - set(PATCHABLE_FIELDS)
+            if unknown:
+                raise CatalogPatchError(
+                    f"update: cannot change {', '.join(sorted(unknown))} "
+                    f"(allowed: {', '.join(PATCHABLE_FIELDS)})"
+                )
+            if incremental:
+                self._unindex_position(position)
+            self.entries[position] = {**self.entries[position], **entry}
+            if incremental:
+                self._index_position(position)
+            return False
+        
+        # delete: every entry with the code (the catalog may list a code twice),
+        # highest position first so the last entry moving into a freed
+        # position is never one still to be deleted
+        del self.code_positions[code]
+        positions = [
+            position for position, error in enumerate(self.entries)
+            if error.get("Error_Code", "").upper() == code
+        ]
+        for position in reversed(positions):
+            last = len(self.entries) - 1
+            if incremental:
+                self._unindex_position(position)
+                if position != last:
+                    self._unindex_position(last)
+            
+            moved = self.entries.pop()
+            if position != last:
+                self.entries[position] = moved
+                moved_code = moved.get("Error_Code", "").upper()
+                if self.code_positions.get(moved_code) == last:
+                    self.code_positions[moved_code] = position
+                if incremental:
+                    self._index_position(position)
+        return True
+    
+    def _index_position(self, position: int) -> None:
+        """Add the entry at a position to the keyword and title indexes."""
+        error = self.entries[position]
+        self.keyword_index.add_document(position, self._document_tokens(error), self.synonyms.expansions)
+        title = normalize_text(error.get("Tittle", ""))
+        if title:
+            self.title_index.add(position, title)
+    
+    def _unindex_position(self, position: int) -> None:
+        """Remove the entry at a position from the keyword and title indexes."""
+        error = self.entries[position]
+        self.keyword_index.remove_document(position, self._document_tokens(error), self.synonyms.expansions)
+        self.title_index.remove(position)
+    
+    def _build_title_index(self):
+        """Build the trigram index over normalized error titles."""
+        index = TrigramIndex()
+        for position, error in enumerate(self.entries):
+            title = normalize_text(error.get("Tittle", ""))
+            if title:
+                index.add(position, title)
+        
+        if self.scoring_backend == "numpy":
+            return CompiledTrigramIndex(index)
+        return index
+    
+    def load_semantic_index(self, path: str, fingerprint: str) -> None:
+        """
+        Attach the semantic index, building and persisting it if needed.
+        
+        A persisted index is memory-mapped when it was built from the same
+        catalog content (fingerprint) and vectorizer; otherwise the entries
+        are embedded once and written to path for the next start.
+        
+        Args:
+            path: Index file (<catalog>.vec)
+            fingerprint: Identifies the catalog content (source file hash)
+        """
+        if os.path.exists(path):
+            try:
+                self.semantic_index = SemanticIndex.load(path, fingerprint)
+            except (OSError, SnapshotError) as e:
+                logger.warning(f"Ignoring semantic index {path}: {e}")
+            if self.semantic_index is not None:
+                return
+        
+        self.semantic_index = SemanticIndex.build([
+            f"{error.get('Tittle', '')} {error.get('Tittle', '')} {error.get('Description', '')}"
+            for error in self.entries
+        ])
+        logger.info(f"Built semantic index for catalog '{self.name}' ({len(self)} entries)")
+        
+        try:
+            self.semantic_index.write(path, fingerprint)
+        except OSError as e:
+            logger.warning(f"Could not persist semantic index {path}: {e}")
+    
+    def detect(self, normalized_msg: str) -> Optional[Dict[str, Any]]:
+        """
+        Run the detection pipeline on a normalized message.
+        
+        Args:
+            normalized_msg: Normalized user message
+        
+        Returns:
+            Structured error object or None
+        """
+        # STEP 1: Resolve error code mentioned in the message
+        result = self.resolve(normalized_msg)
+        if result:
+            return result
+        
+        # STEPS 2-3: Fuzzy title and keyword matching
+        return self.match_text(normalized_msg)
+    
+    def resolve(self, normalized_msg: str) -> Optional[Dict[str, Any]]:
+        """
+        Resolve the first error code mentioned in a message (alias table only).
+        
+        Args:
+            normalized_msg: Normalized user message
+        
+        Returns:
+            Structured error object or None
+        """
+        error_code = self.code_resolver.resolve(normalized_msg)
+        
+        if error_code:
+            logger.info(f"Resolved error code from message: {error_code}")
+            return self.format_entry(self.entries[self.code_positions[error_code]])
+        
+        return None
+    
+    def mentions_indexed_terms(self, normalized_msg: str) -> bool:
+        """
+        Check whether a message shares any term with the catalog's titles and descriptions.
+        
+        One dictionary lookup per message term (synonyms included): messages
+        without any could not be matched by title or keyword, and rarely by
+        meaning.
+        
+        Args:
+            normalized_msg: Normalized user message
+        
+        Returns:
+            True if at least one term is in the keyword index
+        """
+        return any(term in self.keyword_index for term in tokenize(normalized_msg))
+    
+    def match_text(self, normalized_msg: str) -> Optional[Dict[str, Any]]:
+        """
+        Match a message without an error code against titles and descriptions.
+        
+        The CPU-heavy part of detect(): its cost grows with the message
+        length (see cpu_offload.estimate_cost_ms).
+        
+        Args:
+            normalized_msg: Normalized user message
+        
+        Returns:
+            Structured error object or None
+        """
+        # STEP 2: Fuzzy match against error titles
+        result = self.fuzzy_match_titles(normalized_msg)
+        if result:
+            logger.info(f"Matched error via fuzzy title matching: {result['error_code']}")
+            return result
+        
+        # STEP 3: Keyword search in descriptions
+        result = self.keyword_search(normalized_msg)
+        if result:
+            logger.info(f"Matched error via keyword search: {result['error_code']}")
+            return result
+        
+        logger.debug(f"No error code detected in message: {normalized_msg[:50]}")
+        return None
+    
+    def resolve_all(self, normalized_msg: str) -> List[Dict[str, Any]]:
+        """
+        Resolve every explicit error code mentioned in a message.
+        
+        Args:
+            normalized_msg: Normalized user message
+        
+        Returns:
+            Structured error objects in order of first mention (may be empty)
+        """
+        error_codes = self.code_resolver.resolve_all(normalized_msg)
+        
+        if error_codes:
+            logger.info(f"Resolved error codes from message: {', '.join(error_codes)}")
+        
+        return [
+            self.format_entry(self.entries[self.code_positions[error_code]])
+            for error_code in error_codes
+        ]
+    
+    def lookup(self, error_code: str) -> Optional[Dict[str, Any]]:
+        """
+        Direct lookup by error code.
+        
+        Supports every surface form known to the code resolver:
+        - "301" → "301" (or "ER301" if only that exists)
+        - "ER001", "er-1", "E1" → "ER001"
+        
+        Args:
+            error_code: Error code (e.g., "ER001" or "301")
+        
+        Returns:
+            Structured error object or None
+        """
+        canonical = self.code_resolver.lookup(error_code)
+        
+        if canonical:
+            return self.format_entry(self.entries[self.code_positions[canonical]])
+        
+        return None
+    
+    def fuzzy_match_titles(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Fuzzy match against error titles.
+        
+        Candidates come from the trigram index; only the best few are
+        verified with the exact title similarity scorer.
+        
+        Args:
+            query: Normalized user query
+        
+        Returns:
+            Best matching error object or None
+        """
+        best_position = None
+        best_score = 0.0
+        
+        candidates = self.title_index.candidates(query, limit=self.FUZZY_TITLE_CANDIDATES)
+        for position, _ in candidates:
+            score = title_similarity(
+                query,
+                self.title_index.texts[position],
+                min_score=max(self.FUZZY_TITLE_THRESHOLD, best_score)
+            )
+            
+            if score > best_score and score >= self.FUZZY_TITLE_THRESHOLD:
+                best_score = score
+                best_position = position
+        
+        if best_position is not None:
+            return self.format_entry(self.entries[best_position])
+        
+        return None
+    
+    def keyword_search(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Search error titles and descriptions using the BM25 keyword index.
+        
+        Args:
+            query: Normalized user query
+        
+        Returns:
+            Best matching error object or None
+        """
+        # Require at least 2 matching terms to avoid false positives
+        ranked = self.keyword_index.search(tokenize(query), top_k=1, min_terms=2)
+        
+        if ranked:
+            position, _ = ranked[0]
+            return self.format_entry(self.entries[position])
+        
+        return None
+    
+    def suggest(self, prefix: str, limit: int = 5) -> List[Dict[str, str]]:
+        """
+        Complete a partially typed error code or title.
+        
+        Args:
+            prefix: Text typed so far ("ER0", "gun te", "temp")
+            limit: Maximum number of suggestions (at most MAX_SUGGESTIONS)
+        
+        Returns:
+            List of {"error_code", "title"} dicts, best first
+        """
+        query = normalize_text(prefix)
+        if not query:
+            return []
+        
+        suggestions = []
+        for position in self.suggestion_trie.search(query, limit):
+            error = self.entries[position]
+            suggestions.append({
+                "error_code": error.get("Error_Code", ""),
+                "title": error.get("Tittle", ""),
+            })
+        return suggestions
+    
+    def semantic_match(
+        self,
+        query: str,
+        threshold: float,
+        nprobe: int = 8,
+        margin: float = 0.0
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Match a free-text description by meaning (semantic index).
+        
+        The best entry must reach threshold and beat the best entry with a
+        different error code by at least margin: a query that is about as
+        close to two codes names neither of them.
+        
+        Args:
+            query: Normalized user query
+            threshold: Minimum cosine similarity
+            nprobe: IVF lists searched
+            margin: Minimum similarity lead over the runner-up code
+        
+        Returns:
+            Best matching error object or None
+        """
+        if self.semantic_index is None:
+            return None
+        
+        ranked = self.semantic_index.search(query, top_k=self.SEMANTIC_CANDIDATES, nprobe=nprobe)
+        if not ranked or ranked[0][1] < threshold:
+            return None
+        
+        position, score = ranked[0]
+        code = self.entries[position].get("Error_Code", "").upper()
+        runner_up = next(
+            (other for other_position, other in ranked[1:]
+             if self.entries[other_position].get("Error_Code", "").upper() != code),
+            0.0
+        )
+        if score - runner_up < margin:
+            return None
+        
+        result = self.format_entry(self.entries[position])
+        logger.info(
+            f"Matched error via semantic index: {result['error_code']} "
+            f"({score:.3f}, runner-up {runner_up:.3f})"
+        )
+        return result
+    
+    def rank(self, message: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Rank catalog entries against a free-text message.
+        
+        Args:
+            message: User's input message
+            top_k: Maximum number of suggestions
+        
+        Returns:
+            Formatted error objects with an added "score" field, best first
+        """
+        ranked = self.keyword_index.search(tokenize(message), top_k=top_k)
+        
+        results = []
+        for position, score in ranked:
+            result = self.format_entry(self.entries[position])
+            result["score"] = round(score, 4)
+            results.append(result)
+        
+        return results
+    
+    @staticmethod
+    def format_entry(error_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Format error data into standardized response structure.
+        
+        Args:
+            error_data: Raw error data from JSON
+        
+        Returns:
+            Formatted error object
+        """
+        return {
+            "error_code": error_data.get("Error_Code", ""),
+            "title": error_data.get("Tittle", ""),  # Note: JSON has typo "Tittle"
+            "description": error_data.get("Description", ""),
+            "solutions": error_data.get("Solution", [])
+        }
@@ -3,16 +3,53 @@ Intent Engine
 AI + Rule Hybrid Intent Detection System for EV charging diagnostics.
 
 This engine combines keyword-based rules with AI capabilities:
-1. First attempts rule-based detection (fast, deterministic)
-2. Falls back to AI service if no rules match
-3. Structured for easy integration with OpenAI/LLM APIs
+1. Uses the trained intent classifier when it is confident (optional)
+2. Otherwise attempts rule-based detection (fast, deterministic)
+3. Falls back to AI service if no rules match
+4. Structured for easy integration with OpenAI/LLM APIs
+
+Keyword rules are compiled into a word-level Aho–Corasick automaton, so a
+message is scanned once for all keywords of all intents, and keywords only
+match whole words ("hi" does not match "this", "pay" does not match "display").
+
+Message words that are not keyword words are typo-corrected first ("pamyent"
+→ "payment", "instal" → "install") through a SymSpell-style deletion index
+over all keyword words, so every intent gets the same typo tolerance.
+
+The classifier (utils/intent_classifier.py, trained offline with
+train_intent_classifier.py) scores every intent; when rules match several
+intents, its scores rank them.
 """
-from typing import Optional
+import re
+from itertools import groupby
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from ..core.logger import setup_logger
+from ..utils.cache import MISSING, LRUCache
+from ..utils.catalog_snapshot import SnapshotError
+from ..utils.intent_classifier import IntentClassifier
+from ..utils.search_index import DeletionIndex, KeywordAutomaton, edit_distance
+from ..utils.synonyms import SynonymTable
 from ..utils.text_utils import normalize_text
+from ..utils.vector_index import numpy_available
 
 logger = setup_logger(__name__)
 
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def _squeeze(word: str) -> str:
+    """Collapse doubled letters ("wallet" → "walet")."""
+    return "".join(letter for letter, _ in groupby(word))
+
+
+class IntentMatch(NamedTuple):
+    """One keyword occurrence in a message."""
+    
+    intent: str
+    keyword: str
+    start: int  # Character offsets in the normalized message
+    end: int
+
 
 class IntentEngine:
     """
@@ -22,8 +59,29 @@ class IntentEngine:
     Rules are checked first for speed; AI is used for complex or ambiguous inputs.
     """
     
+    # Shortest message word eligible for typo correction (4-letter words
+    # have too many real-word neighbours: "lost" → "cost")
+    MIN_TYPO_LENGTH = 5
+    
+    # Edit distance tolerated: 1 for keyword words of up to
+    # SHORT_KEYWORD_LENGTH letters, MAX_TYPO_DISTANCE for longer ones.
+    # Keyword words of exactly SHORT_KEYWORD_LENGTH letters also tolerate 2
+    # when one edit is a doubled letter typed once or twice ("walit" →
+    # "wallet"), but not two arbitrary edits ("round" must not become "refund")
+    MAX_TYPO_DISTANCE = 2
+    SHORT_KEYWORD_LENGTH = 6
+    
+    # Distinct message words whose correction is remembered
+    TYPO_CACHE_SIZE = 4096
+    
     def __init__(self):
         """Initialize the intent engine with keyword rules."""
+        self.synonyms = SynonymTable()
+        
+        # Trained classifier (see load_classifier) and its confidence threshold
+        self.classifier: Optional[IntentClassifier] = None
+        self.classifier_threshold = 0.9
+        
         # Rule-based intent keywords for EV charging domain
         self.intent_keywords = {
             "greeting": ["hello", "hi", "hey", "good morning", "good afternoon", "greetings"],
@@ -38,15 +96,145 @@ class IntentEngine:
             "payment": ["payment", "billing", "cost", "price", "pay"],
             "usage": ["how to charge", "charge car", "charge vehicle", "start charging", "charging guide", "how to", "guide", "instructions", "manual", "how to use"],
         }
+        
+        self.automaton = KeywordAutomaton()
+        self._keyword_words: dict[str, int] = {}  # keyword word → compiled phrases using it
+        self._typo_index: Optional[DeletionIndex] = None
+        self._corrections = LRUCache(max_size=self.TYPO_CACHE_SIZE)
+        for intent, keywords in self.intent_keywords.items():
+            self._compile_keywords(intent, keywords)
+    
+    @staticmethod
+    def _inflections(word: str) -> List[str]:
+        """
+        Regular inflections of a keyword word ("fix" → "fixes", "fixed", "fixing").
+        
+        Compiled in as whole words, so "troubleshooting" still matches
+        "troubleshoot" without allowing partial-word hits.
+        """
+        if len(word) < 3 or not word.isalpha():
+            return [word]
+        if word.endswith("e"):
+            return [word, word + "s", word + "d", word[:-1] + "ing"]
+        if word.endswith(("s", "x", "z", "ch", "sh")):
+            return [word, word + "es", word + "ed", word + "ing"]
+        return [word, word + "s", word + "ed", word + "ing"]
+    
+    def _phrases(self, keyword: str) -> List[Tuple[str, ...]]:
+        """Word sequences a keyword matches (its last word may be inflected)."""
+        words = _WORD_PATTERN.findall(normalize_text(keyword))
+        if not words:
+            return []
+        return [(*words[:-1], last) for last in self._inflections(words[-1])]
+    
+    def _compile_keywords(self, intent: str, keywords: List[str]) -> None:
+        """Add an intent's keywords to the automaton."""
+        for keyword in keywords:
+            for phrase in self._phrases(keyword):
+                self.automaton.add(phrase, (intent, keyword))
+                for word in phrase:
+                    self._keyword_words[word] = self._keyword_words.get(word, 0) + 1
+        self._reset_typo_index()
+    
+    def _uncompile_keywords(self, intent: str, keywords: List[str]) -> None:
+        """Remove an intent's keywords from the automaton."""
+        for keyword in keywords:
+            for phrase in self._phrases(keyword):
+                self.automaton.remove(phrase, (intent, keyword))
+                for word in phrase:
+                    remaining = self._keyword_words.get(word, 0) - 1
+                    if remaining > 0:
+                        self._keyword_words[word] = remaining
+                    else:
+                        self._keyword_words.pop(word, None)
+        self._reset_typo_index()
+    
+    def _reset_typo_index(self) -> None:
+        """Drop the typo index and remembered corrections (keywords changed)."""
+        self._typo_index = None
+        self._corrections.clear()
+    
+    @property
+    def typo_index(self) -> DeletionIndex:
+        """
+        Deletion index over keyword words (with their inflections).
+        
+        Built on the first typo correction after the keywords change, so
+        add_intent_rule() and apply_synonyms() stay cheap.
+        """
+        if self._typo_index is None:
+            index = DeletionIndex(max_distance=self.MAX_TYPO_DISTANCE)
+            for word in self._keyword_words:
+                if len(word) >= self.MIN_TYPO_LENGTH - self.MAX_TYPO_DISTANCE and word.isalpha():
+                    index.add(word)
+            self._typo_index = index
+        return self._typo_index
+    
+    def correct_word(self, word: str) -> str:
+        """
+        Correct a misspelled keyword word ("pamyent" → "payment").
+        
+        Args:
+            word: Normalized message word
+        
+        Returns:
+            The closest keyword word within the tolerated edit distance, or
+            the word itself (keyword words, short words and words with no
+            close keyword word are returned unchanged)
+        """
+        if len(word) < self.MIN_TYPO_LENGTH or word in self._keyword_words or not word.isalpha():
+            return word
+        
+        correction = self._corrections.get(word)
+        if correction is not MISSING:
+            return correction
+        
+        candidates = [
+            (term, distance) for term, distance in self.typo_index.lookup(word)
+            if distance <= 1
+            or len(term) > self.SHORT_KEYWORD_LENGTH
+            or (len(term) == self.SHORT_KEYWORD_LENGTH and edit_distance(_squeeze(word), _squeeze(term), 1) <= 1)
+        ]
+        
+        # Closest first; among equally close words the one keeping the typed
+        # word's first and last letters (typos rarely touch a word's ends:
+        # "hellp" → "help", not "hello"), then the one used by more keywords
+        correction = word
+        if candidates:
+            correction = min(
+                candidates,
+                key=lambda item: (
+                    item[1],
+                    -(word[0] == item[0][0]) - (word[-1] == item[0][-1]),
+                    -self._keyword_words[item[0]],
+                    item[0]
+                )
+            )[0]
+        
+        self._corrections.set(word, correction)
+        return correction
     
     async def detect_intent(self, text: str) -> Optional[str]:
         """
-        Detect user intent from message text.
+        Detect user intent from message text (see resolve_intent()).
+        
+        Args:
+            text: User's message text
+            
+        Returns:
+            Detected intent identifier or None
+        """
+        return self.resolve_intent(text)
+    
+    def resolve_intent(self, text: str) -> Optional[str]:
+        """
+        Detect user intent from message text, synchronously.
         
         Process:
         1. Normalize input text
-        2. Check rule-based keywords
-        3. If no match, could delegate to AI (future enhancement)
+        2. Return the classifier's intent if its probability reaches the threshold
+        3. Check rule-based keywords (ranked by classifier score when loaded)
+        4. If no match, could delegate to AI (future enhancement)
         
         Args:
             text: User's message text
@@ -59,8 +247,16 @@ class IntentEngine:
         
         normalized_text = normalize_text(text)
         
+        # Trained classifier (confident predictions skip rules and AI)
+        scores = self.classifier.scores(normalized_text) if self.classifier is not None else {}
+        if scores:
+            intent = max(scores, key=scores.get)
+            if scores[intent] >= self.classifier_threshold:
+                logger.info(f"Intent detected via classifier: {intent} ({scores[intent]:.3f})")
+                return intent
+        
         # Rule-based detection (fast path)
-        intent = self._rule_based_detection(normalized_text)
+        intent = self._rule_based_detection(normalized_text, scores)
         
         if intent:
             logger.info(f"Intent detected via rules: {intent}")
@@ -69,34 +265,168 @@ class IntentEngine:
         logger.debug(f"No intent detected for: {text[:50]}")
         return None
     
-    def _rule_based_detection(self, normalized_text: str) -> Optional[str]:
+    def detect_intents(self, text: str) -> List[IntentMatch]:
+        """
+        Find every keyword occurrence of every intent in a message.
+        
+        Message words are typo-corrected (see correct_word()) before matching;
+        offsets still refer to the words as typed.
+        
+        Args:
+            text: User's message text
+            
+        Returns:
+            IntentMatch per occurrence, in order of position in the
+            normalized message
+        """
+        normalized_text = normalize_text(text)
+        found = list(_WORD_PATTERN.finditer(normalized_text))
+        spans = [match.span() for match in found]
+        words = [self.correct_word(match.group()) for match in found]
+        
+        matches = [
+            IntentMatch(intent, keyword, spans[first][0], spans[last - 1][1])
+            for first, last, (intent, keyword) in self.automaton.search(words)
+        ]
+        matches.sort(key=lambda match: (match.start, -match.end))
+        return matches
+    
+    def rank_intents(self, text: str) -> List[Tuple[str, float]]:
+        """
+        Score every intent with the trained classifier.
+        
+        Args:
+            text: User's message text
+        
+        Returns:
+            (intent, probability) pairs, most probable first (empty without
+            a classifier or when none of the message's words were seen in
+            training)
+        """
+        if self.classifier is None or not text:
+            return []
+        scores = self.classifier.scores(normalize_text(text))
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    
+    def _rule_based_detection(
+        self,
+        normalized_text: str,
+        scores: Optional[Dict[str, float]] = None
+    ) -> Optional[str]:
         """
         Keyword-based intent detection.
         
+        Among the matched intents the one the classifier scores highest wins;
+        without scores, the longest matched keyword wins ("payment failed" →
+        wallet over "payment" → payment), then the earliest, then the intent
+        listed first.
+        
         Args:
             normalized_text: Normalized user input
-
+            scores: Classifier probability per intent, if available
+        
         Returns:
             Matched intent or None
         """
-        for intent, keywords in self.intent_keywords.items():
-            for keyword in keywords:
-                if keyword in normalized_text:
-                    return intent
+        matches = self.detect_intents(normalized_text)
+        if not matches:
+            return None
         
-        return None
+        scores = scores or {}
+        order = {intent: rank for rank, intent in enumerate(self.intent_keywords)}
+        best = min(
+            matches,
+            key=lambda match: (
+                -scores.get(match.intent, 0.0),
+                match.start - match.end,
+                match.start,
+                order.get(match.intent, len(order))
+            )
+        )
+        return best.intent
+    
+    def apply_synonyms(self, synonyms: SynonymTable) -> None:
+        """
+        Compile domain synonyms into the keyword rules.
+        
+        Every single-word keyword gets its synonyms added to the same intent,
+        so matching stays a plain keyword scan. Rules added later with
+        add_intent_rule() are expanded as well.
+        
+        Args:
+            synonyms: Synonym table (see DiagnosticEngine.synonyms)
+        """
+        self.synonyms = synonyms
+        for intent, keywords in list(self.intent_keywords.items()):
+            expanded = self._expand_keywords(keywords)
+            self._compile_keywords(intent, expanded[len(keywords):])
+            self.intent_keywords[intent] = expanded
+        logger.info(f"Applied {len(synonyms)} synonym terms to intent rules")
+    
+    def _expand_keywords(self, keywords: list[str]) -> list[str]:
+        """Keywords followed by the synonyms of each single-word keyword."""
+        expanded = list(keywords)
+        for keyword in keywords:
+            for synonym in self.synonyms.get(keyword):
+                if synonym not in expanded:
+                    expanded.append(synonym)
+        return expanded
     
     def add_intent_rule(self, intent: str, keywords: list[str]) -> None:
         """
         Add or update intent keywords dynamically.
         
+        Only this intent's keywords are removed from and added to the
+        automaton; the other intents' keywords are left in place.
+        
         Args:
             intent: Intent identifier
-            keywords: List of keywords for this intent
+            keywords: List of keywords for this intent (synonyms are added)
         """
-        self.intent_keywords[intent] = keywords
+        self._uncompile_keywords(intent, self.intent_keywords.get(intent, []))
+        self.intent_keywords[intent] = self._expand_keywords(keywords)
+        self._compile_keywords(intent, self.intent_keywords[intent])
         logger.info(f"Added/updated intent rule: {intent}")
     
+    def load_classifier(self, path: str, threshold: float = 0.9) -> bool:
+        """
+        Load a trained intent classifier (train_intent_classifier.py).
+        
+        Without numpy, or if the model file is missing or invalid, intent
+        detection keeps using the keyword rules only.
+        
+        Args:
+            path: Model file
+            threshold: Probability at which a prediction is used directly
+        
+        Returns:
+            True if the classifier was loaded
+        """
+        if not numpy_available():
+            logger.warning("numpy is not installed, intent classifier disabled")
+            return False
+        
+        try:
+            classifier = IntentClassifier.load(path)
+        except FileNotFoundError:
+            logger.info(f"No intent classifier at {path}, using keyword rules only")
+            return False
+        except (SnapshotError, KeyError, ValueError) as e:
+            logger.error(f"Ignoring intent classifier {path}: {e}")
+            return False
+        
+        unknown = set(classifier.intents) - set(self.intent_keywords)
+        if unknown:
+            logger.warning(f"Intent classifier predicts intents without rules: {', '.join(sorted(unknown))}")
+        
+        self.classifier = classifier
+        self.classifier_threshold = threshold
+        logger.info(
+            f"Loaded intent classifier from {path} "
+            f"({len(classifier.intents)} intents, {classifier.samples} training messages)"
+        )
+        return True
+    
     def get_all_intents(self) -> list[str]:
         """
         Get list of all registered intents.
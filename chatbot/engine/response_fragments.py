@@ -0,0 +1,144 @@
+"""
+Response Fragment Cache
+Pre-encoded ChatResponse bodies for flow nodes and diagnostics.
+
+Flow node and troubleshooting step fragments are encoded when the cache is
+loaded (every node in chatbot_flows.json, every step of every tree). Diagnostic fragments are encoded for every code of the
+default catalog at load time when it fits in the cache, and otherwise on
+first use; they are keyed on the catalog namespace and the detected codes.
+Publishing a catalog version only drops that namespace's diagnostic
+fragments, which are encoded again on first use.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from ..core.logger import setup_logger
+from ..models.response_models import ChatResponse, ResponseFragment
+from ..utils.cache import LRUCache, MISSING
+from .troubleshooting import TroubleshootingStep
+
+logger = setup_logger(__name__)
+
+
+class ResponseFragmentCache:
+    """
+    Store of ResponseFragments for flow nodes and diagnostic results.
+    """
+    
+    def __init__(self, max_diagnostics: int = 4096):
+        """
+        Initialize an empty cache.
+        
+        Args:
+            max_diagnostics: Diagnostic fragments kept (least recently used evicted)
+        """
+        self.flows: Dict[str, ResponseFragment] = {}
+        self.steps: Dict[Tuple[str, str], ResponseFragment] = {}
+        self.diagnostics = LRUCache(max_size=max_diagnostics)
+    
+    def load_flows(
+        self,
+        node_ids: List[str],
+        build: Callable[[str], ChatResponse]
+    ) -> None:
+        """
+        Encode a fragment for every flow node.
+        
+        Args:
+            node_ids: Flow node identifiers
+            build: Builds the ChatResponse for a node id
+        """
+        self.flows = {node_id: ResponseFragment.encode(build(node_id)) for node_id in node_ids}
+    
+    def flow(self, node_id: str) -> Optional[ResponseFragment]:
+        """
+        Get the fragment for a flow node.
+        
+        Args:
+            node_id: Flow node ID
+        
+        Returns:
+            ResponseFragment or None if the node was not loaded
+        """
+        return self.flows.get(node_id)
+    
+    def load_steps(
+        self,
+        steps: Iterable[TroubleshootingStep],
+        build: Callable[[TroubleshootingStep], ChatResponse]
+    ) -> None:
+        """
+        Encode a fragment for every troubleshooting step.
+        
+        Args:
+            steps: Steps of every troubleshooting tree
+            build: Builds the ChatResponse for a step
+        """
+        self.steps = {(step.code, step.step): ResponseFragment.encode(build(step)) for step in steps}
+    
+    def step(self, code: str, step: str) -> Optional[ResponseFragment]:
+        """
+        Get the fragment for a troubleshooting step.
+        
+        Args:
+            code: Error code of the tree
+            step: Step id
+        
+        Returns:
+            ResponseFragment or None if the step was not loaded
+        """
+        return self.steps.get((code, step))
+    
+    @staticmethod
+    def diagnostic_key(namespace: str, diagnostics: List[Dict[str, Any]]) -> Tuple[str, ...]:
+        """Cache key for a diagnostic result: namespace plus codes in order."""
+        return (namespace,) + tuple(item["error_code"] for item in diagnostics)
+    
+    def diagnostic(
+        self,
+        namespace: str,
+        diagnostics: List[Dict[str, Any]],
+        build: Callable[[List[Dict[str, Any]]], ChatResponse]
+    ) -> ResponseFragment:
+        """
+        Get (or encode and remember) the fragment for a diagnostic result.
+        
+        Args:
+            namespace: Catalog namespace the diagnostics came from
+            diagnostics: Detected error objects, in order of mention
+            build: Builds the ChatResponse for the diagnostics
+        
+        Returns:
+            ResponseFragment
+        """
+        key = self.diagnostic_key(namespace, diagnostics)
+        
+        fragment = self.diagnostics.get(key)
+        if fragment is MISSING:
+            fragment = ResponseFragment.encode(build(diagnostics))
+            self.diagnostics.set(key, fragment)
+        
+        return fragment
+    
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """
+        Drop diagnostic fragments (e.g. after a catalog changed).
+        
+        Args:
+            namespace: Catalog namespace whose fragments are dropped (None for all)
+        """
+        if namespace is None:
+            self.diagnostics.clear()
+        else:
+            self.diagnostics.discard_where(lambda key: key[0] == namespace)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dict with flow/step fragment counts and diagnostic cache statistics
+        """
+        return {
+            "flows": len(self.flows),
+            "steps": len(self.steps),
+            "diagnostics": self.diagnostics.get_stats(),
+        }
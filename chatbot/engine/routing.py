@@ -0,0 +1,253 @@
+"""
+Routing Pipeline
+Ordered, configurable stages that decide how a chat turn is answered.
+
+Each stage looks at the turn (RouteContext) and either answers it with a
+RouteResult (the response plus the session changes it implies) or passes
+it on. Stages run in the configured order (ROUTING_STAGES) until one
+answers. Every stage run is timed and every answer is attributed to its
+stage, so per-stage latency and hit rates show where turn time goes:
+    
+    {"order": ["troubleshooting", "option", "diagnostic", ...],
+     "stages": {"diagnostic": {"cost_class": "index", "runs": 812,
+                               "answered": 301, "hit_rate": 0.3707,
+                               "mean_ms": 0.184}, ...}}
+
+The fallback stage (AI) always answers and always runs last.
+
+Each turn carries a Deadline. Optional stages (vector search and slower,
+other than the fallback) are skipped when the time left after the reserve
+kept for committing the turn is less than their mean run time; skipped
+stages are recorded in RouteContext.degraded and counted per stage.
+"""
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from ..core.logger import setup_logger
+from ..utils.cache import MISSING
+from ..utils.deadline import Deadline
+
+logger = setup_logger(__name__)
+
+
+class CostClass(IntEnum):
+    """Rough cost of running a stage, cheapest first."""
+    
+    LOOKUP = 0  # Table lookups (button labels, actions, tree transitions)
+    INDEX = 1  # In-memory index scans (error codes, keywords)
+    VECTOR = 2  # Vector search over a catalog
+    REMOTE = 3  # Network call
+
+
+class RouteContext:
+    """One chat turn as seen by the routing stages."""
+    
+    __slots__ = (
+        "user_id", "session", "session_id", "current_node",
+        "message", "action", "charger_model", "decisions",
+        "deadline", "degraded", "ai_prefetch", "intent"
+    )
+    
+    def __init__(
+        self,
+        user_id: str,
+        session: dict,
+        message: Optional[str],
+        action: Optional[str],
+        charger_model: Optional[str] = None,
+        decisions: Optional[dict] = None,
+        deadline: Optional[Deadline] = None
+    ):
+        """
+        Args:
+            user_id: User identifier
+            session: Session document (before this turn's update)
+            message: User's text message
+            action: Explicit action/command
+            charger_model: Charger vendor/model selecting the error catalog
+            decisions: Shadow evaluation decisions dict (None when not sampled)
+            deadline: Time budget of the request (None for no deadline)
+        """
+        self.user_id = user_id
+        self.session = session
+        self.session_id: str = session["session_id"]
+        self.current_node: str = session.get("current_node", "start")
+        self.message = message
+        self.action = action
+        self.charger_model = charger_model
+        self.decisions = decisions
+        self.deadline = deadline or Deadline(None)
+        self.degraded: List[str] = []  # What was skipped or substituted for the deadline
+        self.ai_prefetch: Optional[Any] = None  # Speculative AI call (ConversationManager), if started
+        self.intent: Any = MISSING  # Detected intent (or None), once resolved for this turn
+
+
+class RouteResult(NamedTuple):
+    """A stage's answer to a turn."""
+    
+    response: Any
+    node_id: Optional[str] = None  # Node to move to (None keeps the current node)
+    session_updates: Optional[Dict[str, Any]] = None  # Extra session fields to set
+
+
+class RoutingStage:
+    """
+    A named routing step.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        cost_class: CostClass,
+        handler: Callable[[RouteContext], Awaitable[Optional[RouteResult]]]
+    ):
+        """
+        Args:
+            name: Stage name used in ROUTING_STAGES and statistics
+            cost_class: Rough cost of running the stage
+            handler: Coroutine returning a RouteResult, or None to pass
+        """
+        self.name = name
+        self.cost_class = cost_class
+        self.handler = handler
+
+
+class RoutingPipeline:
+    """
+    Runs routing stages in order until one answers, timing each run.
+    """
+    
+    # Stages at least this costly may be skipped for the deadline
+    OPTIONAL_COST_CLASS = CostClass.VECTOR
+    
+    def __init__(
+        self,
+        stages: Iterable[RoutingStage],
+        order: Iterable[str],
+        fallback: str,
+        reserve_ms: float = 0.0
+    ):
+        """
+        Select and order the registered stages.
+        
+        Unknown stage names are logged and ignored. The fallback stage is
+        appended when the order leaves it out, so every turn is answered.
+        
+        Args:
+            stages: Every registered stage
+            order: Names of the enabled stages, in the order they run
+            fallback: Name of the stage that always answers
+            reserve_ms: Deadline budget kept for work after routing
+        """
+        registry = {stage.name: stage for stage in stages}
+        order = list(dict.fromkeys(order))
+        
+        for name in order:
+            if name not in registry:
+                logger.warning(f"Ignoring unknown routing stage '{name}' (known: {', '.join(registry)})")
+        names = [name for name in order if name in registry]
+        
+        if fallback not in names:
+            names.append(fallback)
+        elif names[-1] != fallback:
+            logger.warning(
+                f"Routing stages after '{fallback}' never run: {', '.join(names[names.index(fallback) + 1:])}"
+            )
+            names = names[:names.index(fallback) + 1]
+        
+        self.stages: Tuple[RoutingStage, ...] = tuple(registry[name] for name in names)
+        self.fallback = fallback
+        self.reserve_ms = reserve_ms
+        self._stats: Dict[str, Dict[str, float]] = {
+            stage.name: {"runs": 0, "answered": 0, "skipped": 0, "time_ms_total": 0.0}
+            for stage in self.stages
+        }
+        logger.info(f"Routing stages: {' → '.join(names)}")
+    
+    async def route(self, context: RouteContext) -> Tuple[RoutingStage, RouteResult]:
+        """
+        Answer a turn.
+        
+        Args:
+            context: The turn
+        
+        Returns:
+            (stage that answered, its RouteResult)
+        
+        Raises:
+            RuntimeError: If no stage answered (the fallback stage passed)
+        """
+        for stage in self.stages:
+            result = await self._run(stage, context)
+            if result is not None:
+                return stage, result
+        
+        raise RuntimeError("No routing stage answered the turn")
+    
+    async def run_stage(self, name: str, context: RouteContext) -> Optional[RouteResult]:
+        """
+        Run one enabled stage ahead of its turn (from within another stage).
+        
+        The run is timed, counted and skipped for the deadline like any other.
+        
+        Args:
+            name: Stage name
+            context: The turn
+        
+        Returns:
+            The stage's RouteResult, or None if it is disabled, skipped or passed
+        """
+        stage = next((stage for stage in self.stages if stage.name == name), None)
+        if stage is None:
+            return None
+        return await self._run(stage, context)
+    
+    async def _run(self, stage: RoutingStage, context: RouteContext) -> Optional[RouteResult]:
+        """Run a stage unless the deadline skips it, recording its statistics."""
+        stats = self._stats[stage.name]
+        if self._skip(stage, context.deadline):
+            stats["skipped"] += 1
+            context.degraded.append(stage.name)
+            return None
+        
+        started = time.perf_counter()
+        try:
+            result = await stage.handler(context)
+        finally:
+            stats["runs"] += 1
+            stats["time_ms_total"] += (time.perf_counter() - started) * 1000
+        
+        if result is not None:
+            stats["answered"] += 1
+        return result
+    
+    def _skip(self, stage: RoutingStage, deadline: Deadline) -> bool:
+        """Check whether an optional stage would not fit in the time left."""
+        if stage.cost_class < self.OPTIONAL_COST_CLASS or stage.name == self.fallback:
+            return False
+        
+        stats = self._stats[stage.name]
+        mean_ms = stats["time_ms_total"] / stats["runs"] if stats["runs"] else 0.0
+        return deadline.remaining_ms() - self.reserve_ms <= mean_ms
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get per-stage routing statistics.
+        
+        Returns:
+            Dict with the stage order and, per stage, its cost class, runs,
+            answered turns, hit rate, mean run time and deadline skips
+        """
+        stages = {}
+        for stage in self.stages:
+            stats = self._stats[stage.name]
+            runs = stats["runs"]
+            stages[stage.name] = {
+                "cost_class": stage.cost_class.name.lower(),
+                "runs": runs,
+                "answered": stats["answered"],
+                "hit_rate": round(stats["answered"] / runs, 4) if runs else 0.0,
+                "mean_ms": round(stats["time_ms_total"] / runs, 3) if runs else 0.0,
+                "skipped": stats["skipped"],
+            }
+        return {"order": [stage.name for stage in self.stages], "stages": stages}
@@ -0,0 +1,348 @@
+"""
+Shadow Evaluation
+Runs candidate matchers on a sample of live chat traffic, off the request path.
+
+A candidate is an alternative DiagnosticEngine or IntentEngine configuration
+(see CANDIDATES). For a sampled /v1/chat turn the production decisions
+(detected error codes, detected intent) are recorded while the message is
+routed; after the response has been sent, the message is evaluated by every
+candidate in a separate worker process and each candidate decision is
+compared with the production one. Disagreements are appended as JSON lines
+to a size-rotated file:
+    
+    {"timestamp": "...", "candidate": "diagnostic-numpy", "kind": "diagnostic",
+     "message": "gun temp high", "charger_model": null,
+     "production": ["ER001"], "candidate_decision": [],
+     "production_latency_ms": 0.21, "candidate_latency_ms": 0.35}
+
+Shadow work never runs on the event loop and is shed (counted, not queued)
+when more evaluations are pending than the configured limit.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from ..core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Messages are truncated to this many characters in the disagreement log
+MAX_LOGGED_MESSAGE_LENGTH = 500
+
+# Per-process state, set by _init_worker() in each worker
+_worker_engines: Dict[str, Any] = {}
+_worker_intent_engine = None
+_worker_classifier_engine = None
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def _detected_codes(backend: str, message: str, charger_model: Optional[str]) -> List[str]:
+    results = await _worker_engines[backend].detect_all_error_codes(message, charger_model)
+    return [result["error_code"] for result in results]
+
+
+async def _semantic_codes(message: str, charger_model: Optional[str]) -> List[str]:
+    result = await _worker_engines["python"].semantic_match(message, charger_model)
+    return [result["error_code"]] if result else []
+
+
+async def _keyword_intent(message: str, charger_model: Optional[str]) -> Optional[str]:
+    return await _worker_intent_engine.detect_intent(message)
+
+
+async def _classifier_intent(message: str, charger_model: Optional[str]) -> Optional[str]:
+    ranked = _worker_classifier_engine.rank_intents(message)
+    if ranked and ranked[0][1] >= _worker_classifier_engine.classifier_threshold:
+        return ranked[0][0]
+    return None
+
+
+# Candidate name → (production decision it shadows, scoring backend it needs, matcher)
+CANDIDATES: Dict[str, Tuple[str, str, Callable[[str, Optional[str]], Awaitable[Any]]]] = {
+    "diagnostic-python": (
+        "diagnostic", "python",
+        lambda message, model: _detected_codes("python", message, model)
+    ),
+    "diagnostic-numpy": (
+        "diagnostic", "numpy",
+        lambda message, model: _detected_codes("numpy", message, model)
+    ),
+    "diagnostic-semantic": ("diagnostic", "python", _semantic_codes),
+    "intent-keyword": ("intent", "python", _keyword_intent),
+    "intent-classifier": ("intent", "python", _classifier_intent),
+}
+
+
+def _init_worker(error_codes_path: str, catalogs_dir: str, candidates: Tuple[str, ...]) -> None:
+    """Load one engine per scoring backend the candidates need."""
+    global _worker_intent_engine, _worker_classifier_engine, _worker_loop
+    
+    # Imported here: the conversation manager imports this module
+    from ..core.config import get_settings
+    from .diagnostic_engine import DiagnosticEngine
+    from .intent_engine import IntentEngine
+    
+    _worker_loop = asyncio.new_event_loop()
+    for backend in sorted({CANDIDATES[name][1] for name in candidates}):
+        engine = DiagnosticEngine(
+            error_codes_path=error_codes_path,
+            scoring_backend=backend,
+            catalogs_dir=catalogs_dir,
+            offload_mode="inline",
+            reload_check_seconds=0
+        )
+        _worker_loop.run_until_complete(engine.load_error_codes())
+        _worker_engines[backend] = engine
+    
+    _worker_intent_engine = IntentEngine()
+    _worker_intent_engine.apply_synonyms(next(iter(_worker_engines.values())).synonyms)
+    
+    if "intent-classifier" in candidates:
+        settings = get_settings()
+        _worker_classifier_engine = IntentEngine()
+        _worker_classifier_engine.load_classifier(
+            settings.INTENT_CLASSIFIER_PATH,
+            threshold=settings.INTENT_CLASSIFIER_THRESHOLD
+        )
+
+
+def _evaluate(
+    message: str,
+    charger_model: Optional[str],
+    candidates: Tuple[str, ...]
+) -> Dict[str, Dict[str, Any]]:
+    """Worker task: run each candidate on one message, timing it."""
+    results = {}
+    for name in candidates:
+        matcher = CANDIDATES[name][2]
+        started = time.perf_counter()
+        try:
+            decision = _worker_loop.run_until_complete(matcher(message, charger_model))
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        results[name] = {
+            "decision": decision,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+    return results
+
+
+class ShadowEvaluator:
+    """
+    Samples chat turns and compares candidate matchers with production.
+    """
+    
+    def __init__(
+        self,
+        candidates: Iterable[str],
+        error_codes_path: str,
+        catalogs_dir: str,
+        sample_rate: float = 0.05,
+        max_pending: int = 32,
+        max_workers: int = 1,
+        log_path: str = "logs/shadow_disagreements.jsonl",
+        log_max_bytes: int = 10 * 1024 * 1024,
+        log_backup_count: int = 5
+    ):
+        """
+        Configure shadow evaluation (the worker process starts on first use).
+        
+        Unknown candidate names are logged and ignored.
+        
+        Args:
+            candidates: Candidate names (keys of CANDIDATES)
+            error_codes_path: Catalog JSON the worker loads
+            catalogs_dir: Directory of namespaced catalogs
+            sample_rate: Fraction of chat turns evaluated (0 to 1)
+            max_pending: Evaluations in flight before new ones are shed
+            max_workers: Worker processes
+            log_path: Disagreement log (JSON lines)
+            log_max_bytes: Size at which the log is rotated
+            log_backup_count: Rotated logs kept
+        """
+        self.candidates: Tuple[str, ...] = tuple(name for name in candidates if name in CANDIDATES)
+        for name in set(candidates) - set(self.candidates):
+            logger.warning(f"Ignoring unknown shadow candidate '{name}' (known: {', '.join(CANDIDATES)})")
+        
+        self.initargs = (error_codes_path, catalogs_dir, self.candidates)
+        self.sample_rate = sample_rate
+        self.max_pending = max(1, max_pending)
+        self.max_workers = max(1, max_workers)
+        self.log_path = log_path
+        self.log_max_bytes = log_max_bytes
+        self.log_backup_count = log_backup_count
+        
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._disagreement_log: Optional[logging.Logger] = None
+        self._pending = 0
+        self._stats: Dict[str, Any] = {"sampled": 0, "shed": 0, "errors": 0}
+        self._candidate_stats: Dict[str, Dict[str, float]] = {
+            name: {"evaluated": 0, "disagreements": 0, "latency_ms_total": 0.0}
+            for name in self.candidates
+        }
+    
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """The worker pool, created on first use."""
+        if self._executor is None:
+            # spawn: never fork a process that has an event loop and threads running
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=self.initargs
+            )
+            logger.info(f"Started shadow evaluation for: {', '.join(self.candidates)}")
+        return self._executor
+    
+    @property
+    def disagreement_log(self) -> logging.Logger:
+        """JSON lines logger writing to the rotating disagreement file."""
+        if self._disagreement_log is None:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            handler = RotatingFileHandler(
+                self.log_path,
+                maxBytes=self.log_max_bytes,
+                backupCount=self.log_backup_count,
+                encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            
+            disagreement_log = logging.getLogger(f"{__name__}.disagreements")
+            disagreement_log.handlers = [handler]
+            disagreement_log.setLevel(logging.INFO)
+            disagreement_log.propagate = False
+            self._disagreement_log = disagreement_log
+        return self._disagreement_log
+    
+    def sample(self) -> bool:
+        """
+        Decide whether to shadow the current chat turn.
+        
+        Returns:
+            True if the turn should record production decisions for evaluate()
+        """
+        if not self.candidates or random.random() >= self.sample_rate:
+            return False
+        if self._pending >= self.max_pending:
+            self._stats["shed"] += 1
+            return False
+        self._stats["sampled"] += 1
+        return True
+    
+    async def evaluate(
+        self,
+        message: str,
+        charger_model: Optional[str],
+        decisions: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """
+        Run the candidates on a message and log where they disagree.
+        
+        Meant to run as a background task after the response is sent; never
+        raises. Candidates whose decision kind production did not make for
+        this turn (e.g. intent, when an error code was found first) are skipped.
+        
+        Args:
+            message: User message
+            charger_model: Charger model of the turn
+            decisions: Production decisions by kind, {"decision", "latency_ms"}
+        """
+        candidates = tuple(name for name in self.candidates if CANDIDATES[name][0] in decisions)
+        if not candidates:
+            return
+        if self._pending >= self.max_pending:
+            self._stats["shed"] += 1
+            return
+        
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(
+                self.executor, _evaluate, message, charger_model, candidates
+            )
+        except BrokenProcessPool:
+            logger.error("Shadow evaluation worker terminated abruptly, restarting pool")
+            self._stats["errors"] += 1
+            self.shutdown()
+            return
+        except Exception as e:
+            logger.error(f"Shadow evaluation failed: {e}")
+            self._stats["errors"] += 1
+            return
+        finally:
+            self._pending -= 1
+        
+        for name, result in results.items():
+            self._record(name, message, charger_model, decisions[CANDIDATES[name][0]], result)
+    
+    def _record(
+        self,
+        name: str,
+        message: str,
+        charger_model: Optional[str],
+        production: Dict[str, Any],
+        result: Dict[str, Any]
+    ) -> None:
+        """Update a candidate's statistics and log a disagreement."""
+        if "error" in result:
+            logger.warning(f"Shadow candidate {name} failed: {result['error']}")
+            self._stats["errors"] += 1
+            return
+        
+        stats = self._candidate_stats[name]
+        stats["evaluated"] += 1
+        stats["latency_ms_total"] += result["latency_ms"]
+        
+        if result["decision"] == production["decision"]:
+            return
+        
+        stats["disagreements"] += 1
+        self.disagreement_log.info(json.dumps({
+            "timestamp": datetime.utcnow().isoformat(),
+            "candidate": name,
+            "kind": CANDIDATES[name][0],
+            "message": message[:MAX_LOGGED_MESSAGE_LENGTH],
+            "charger_model": charger_model,
+            "production": production["decision"],
+            "candidate_decision": result["decision"],
+            "production_latency_ms": production["latency_ms"],
+            "candidate_latency_ms": result["latency_ms"],
+        }, ensure_ascii=False))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get shadow evaluation statistics.
+        
+        Returns:
+            Dict with sampled/shed/error counts, pending evaluations and,
+            per candidate, evaluations, disagreement rate and mean latency
+        """
+        candidates = {}
+        for name, stats in self._candidate_stats.items():
+            evaluated = stats["evaluated"]
+            candidates[name] = {
+                "evaluated": evaluated,
+                "disagreements": stats["disagreements"],
+                "disagreement_rate": round(stats["disagreements"] / evaluated, 4) if evaluated else 0.0,
+                "mean_latency_ms": round(stats["latency_ms_total"] / evaluated, 3) if evaluated else 0.0,
+            }
+        return {**self._stats, "pending": self._pending, "candidates": candidates}
+    
+    def shutdown(self) -> None:
+        """Stop the worker processes (the next evaluation restarts them)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
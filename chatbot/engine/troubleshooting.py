@@ -0,0 +1,216 @@
+"""
+Troubleshooting Trees
+Step-by-step decision trees for individual error codes.
+
+Trees are defined in troubleshooting_trees.json next to the catalog:
+    
+    {
+      "ER018": {
+        "start": "release_button",
+        "steps": {
+          "release_button": {
+            "text": "Release the emergency button. Did the error clear?",
+            "options": {
+              "✅ Yes, error cleared": "flow:solution_resolved",
+              "❌ No, still showing": "check_wiring"
+            }
+          },
+          ...
+        }
+      }
+    }
+
+Each option leads to another step of the same tree, or leaves the tree
+for a flow node ("flow:<node_id>"). At load time every tree is validated and
+compiled into one immutable transition table keyed by (code, step, reply),
+so a session only stores (code, step) and each answer is a single lookup.
+"""
+import json
+import re
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple
+from ..core.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# File name looked up next to the default catalog JSON
+TROUBLESHOOTING_FILENAME = "troubleshooting_trees.json"
+
+# Option target prefix that leaves the tree for a flow node
+FLOW_TARGET_PREFIX = "flow:"
+
+_LEADING_SYMBOLS = re.compile(r'^[^\w]+')
+
+
+class TroubleshootingStep(NamedTuple):
+    """One question of a tree."""
+    
+    code: str
+    step: str
+    text: str
+    options: Tuple[str, ...]
+
+
+class Transition(NamedTuple):
+    """Where an answer leads: the next step, or a flow node outside the tree."""
+    
+    step: Optional[str] = None
+    flow_node: Optional[str] = None
+
+
+def reply_keys(text: str) -> Tuple[str, ...]:
+    """
+    Lookup keys for a button label or typed reply.
+    
+    "❌ No, still showing" and "no, still showing" produce the same key, the
+    same way option buttons are matched with or without their emoji.
+    
+    Args:
+        text: Option label or user reply
+    
+    Returns:
+        Normalized label, plus the label without leading symbols if different
+    """
+    normalized = " ".join(text.lower().split())
+    stripped = _LEADING_SYMBOLS.sub("", normalized)
+    return (normalized, stripped) if stripped and stripped != normalized else (normalized,)
+
+
+class TroubleshootingTable:
+    """
+    Compiled, read-only transition table of all troubleshooting trees.
+    """
+    
+    def __init__(self, trees: Optional[Mapping[str, Any]] = None):
+        """
+        Validate and compile trees.
+        
+        Invalid trees are logged and skipped; the others are still loaded.
+        
+        Args:
+            trees: Error code → {"start": step, "steps": {step: {...}}}
+        """
+        starts: Dict[str, str] = {}
+        steps: Dict[Tuple[str, str], TroubleshootingStep] = {}
+        transitions: Dict[Tuple[str, str, str], Transition] = {}
+        
+        for code, tree in (trees or {}).items():
+            try:
+                tree_steps, tree_transitions = self._compile_tree(code.upper(), tree)
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.error(f"Skipping troubleshooting tree for {code}: {e}")
+                continue
+            
+            starts[code.upper()] = tree["start"]
+            steps.update(tree_steps)
+            transitions.update(tree_transitions)
+        
+        self._starts = MappingProxyType(starts)
+        self._steps = MappingProxyType(steps)
+        self._transitions = MappingProxyType(transitions)
+    
+    @staticmethod
+    def _compile_tree(code: str, tree: Mapping[str, Any]) -> Tuple[dict, dict]:
+        """
+        Compile one tree into its steps and transitions.
+        
+        Raises:
+            ValueError: If the start step or an option target does not exist
+        """
+        definitions = tree["steps"]
+        if tree.get("start") not in definitions:
+            raise ValueError(f"start step '{tree.get('start')}' is not defined")
+        
+        steps = {}
+        transitions = {}
+        for step_id, definition in definitions.items():
+            options = definition.get("options") or {}
+            steps[(code, step_id)] = TroubleshootingStep(
+                code=code,
+                step=step_id,
+                text=definition["text"],
+                options=tuple(options)
+            )
+            
+            for label, target in options.items():
+                if target.startswith(FLOW_TARGET_PREFIX):
+                    transition = Transition(flow_node=target[len(FLOW_TARGET_PREFIX):])
+                elif target in definitions:
+                    transition = Transition(step=target)
+                else:
+                    raise ValueError(f"option '{label}' of step '{step_id}' leads to unknown step '{target}'")
+                
+                for key in reply_keys(label):
+                    transitions[(code, step_id, key)] = transition
+        
+        return steps, transitions
+    
+    @classmethod
+    def from_file(cls, path: str) -> "TroubleshootingTable":
+        """
+        Load trees from a JSON file.
+        
+        Args:
+            path: troubleshooting_trees.json
+        
+        Returns:
+            TroubleshootingTable (empty if the file is missing or invalid)
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                trees = json.load(f)
+        except FileNotFoundError:
+            logger.info(f"No troubleshooting trees at {path}")
+            return cls()
+        except json.JSONDecodeError as e:
+            logger.error(f"Invalid JSON in troubleshooting trees {path}: {e}")
+            return cls()
+        
+        table = cls(trees)
+        logger.info(f"Loaded {len(table)} troubleshooting trees from {path}")
+        return table
+    
+    def __len__(self) -> int:
+        return len(self._starts)
+    
+    def __contains__(self, code: str) -> bool:
+        return code in self._starts
+    
+    def start(self, code: str) -> Optional[TroubleshootingStep]:
+        """
+        Get the first step of a code's tree.
+        
+        Args:
+            code: Canonical error code
+        
+        Returns:
+            TroubleshootingStep or None if the code has no tree
+        """
+        start = self._starts.get(code)
+        return self._steps[(code, start)] if start is not None else None
+    
+    def step(self, code: str, step: str) -> Optional[TroubleshootingStep]:
+        """Get a step by (code, step id)."""
+        return self._steps.get((code, step))
+    
+    def steps(self) -> Tuple[TroubleshootingStep, ...]:
+        """Get every step of every tree."""
+        return tuple(self._steps.values())
+    
+    def transition(self, code: str, step: str, reply: str) -> Optional[Transition]:
+        """
+        Follow the answer to a step.
+        
+        Args:
+            code: Error code of the active tree
+            step: Current step id
+            reply: User's reply (option label, with or without its emoji)
+        
+        Returns:
+            Transition, or None if the reply is not one of the step's options
+        """
+        for key in reply_keys(reply):
+            transition = self._transitions.get((code, step, key))
+            if transition is not None:
+                return transition
+        return None
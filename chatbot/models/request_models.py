@@ -2,8 +2,9 @@
 Request Models
 Pydantic models for API request validation.
 """
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional, Literal
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Annotated, Optional, Literal
+from ..core.config import get_settings
 
 
 class ChatRequest(BaseModel):
@@ -132,6 +133,12 @@ class ChatRequest(BaseModel):
         description="Client platform identifier"
     )
     
+    charger_model: Optional[str] = Field(
+        None,
+        description="Charger vendor/model selecting an error catalog (e.g., 'acme_dc_60kw')",
+        max_length=100
+    )
+    
     @field_validator("user_id")
     @classmethod
     def validate_user_id(cls, v: str) -> str:
@@ -162,6 +169,12 @@ class ChatRequest(BaseModel):
                     "message": "gun temperature high",
                     "platform": "android"
                 },
+                {
+                    "user_id": "web_user_12345",
+                    "message": "E42 on the display",
+                    "platform": "web",
+                    "charger_model": "acme_dc_60kw"
+                },
                 {
                     "user_id": "ios_user_abc",
                     "action": "start",
@@ -170,3 +183,129 @@ class ChatRequest(BaseModel):
             ]
         }
     }
+
+
+class BatchDiagnoseRequest(BaseModel):
+    """
+    Batch diagnosis request (POST /v1/diagnose/batch).
+    
+    Classifies many texts (ticket bodies, station log lines) with the same
+    logic as chat error detection. The response is streamed as NDJSON, one
+    line per message in input order:
+    
+        {"index": 0, "result": {"error_code": "ER001", "title": "...", ...}}
+        {"index": 1, "result": null}
+    """
+    
+    messages: list[Annotated[str, Field(max_length=2000)]] = Field(
+        ...,
+        description="Texts to classify",
+        min_length=1
+    )
+    
+    charger_model: Optional[str] = Field(
+        None,
+        description="Charger vendor/model selecting an error catalog",
+        max_length=100
+    )
+    
+    @field_validator("messages")
+    @classmethod
+    def validate_messages(cls, v: list[str]) -> list[str]:
+        """Enforce the configured batch size limit."""
+        limit = get_settings().BATCH_MAX_MESSAGES
+        if len(v) > limit:
+            raise ValueError(f"at most {limit} messages per batch")
+        return v
+    
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "messages": [
+                        "Station 14 stopped with ER001 during session",
+                        "customer says rfid card not detected",
+                        "all good, charged fine"
+                    ]
+                }
+            ]
+        }
+    }
+
+
+class CatalogEntryFields(BaseModel):
+    """Catalog entry fields, in the error_codes_complete.json schema."""
+    
+    Error_Code: Optional[str] = Field(None, min_length=1, max_length=50, examples=["ER200"])
+    Tittle: Optional[str] = Field(None, min_length=1, max_length=200, examples=["Coolant Pump Failure"])
+    Description: Optional[str] = Field(None, max_length=2000)
+    Solution: Optional[list[Annotated[str, Field(max_length=2000)]]] = None
+
+
+class CatalogPatchOperation(BaseModel):
+    """
+    One catalog change.
+    
+    - add: entry with at least Error_Code and Tittle
+    - update: error_code plus the entry fields to replace (not Error_Code)
+    - delete: error_code
+    """
+    
+    op: Literal["add", "update", "delete"]
+    error_code: Optional[str] = Field(
+        None,
+        description="Code to update or delete",
+        max_length=50
+    )
+    entry: Optional[CatalogEntryFields] = None
+    
+    @model_validator(mode="after")
+    def validate_operation(self) -> "CatalogPatchOperation":
+        """Check that each op has the fields it needs."""
+        if self.op == "add":
+            if self.entry is None or not self.entry.Error_Code or not self.entry.Tittle:
+                raise ValueError("add needs an entry with Error_Code and Tittle")
+        elif not self.error_code:
+            raise ValueError(f"{self.op} needs error_code")
+        elif self.op == "update" and self.entry is None:
+            raise ValueError("update needs entry fields to change")
+        return self
+
+
+class CatalogPatchRequest(BaseModel):
+    """
+    Catalog patch request (PATCH /v1/admin/catalog).
+    
+    Operations are applied in order and published together as one new
+    catalog version; if any operation fails, nothing is changed.
+    """
+    
+    operations: list[CatalogPatchOperation] = Field(..., min_length=1, max_length=1000)
+    
+    charger_model: Optional[str] = Field(
+        None,
+        description="Charger vendor/model whose catalog is patched (default catalog if omitted)",
+        max_length=100
+    )
+    
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "operations": [
+                        {
+                            "op": "add",
+                            "entry": {
+                                "Error_Code": "ER200",
+                                "Tittle": "Coolant Pump Failure",
+                                "Description": "The liquid cooling pump of the gun stopped",
+                                "Solution": ["Check the coolant pump fuse and wiring."]
+                            }
+                        },
+                        {"op": "update", "error_code": "ER015", "entry": {"Solution": ["Check the internet connection."]}},
+                        {"op": "delete", "error_code": "ER016"}
+                    ]
+                }
+            ]
+        }
+    }
@@ -2,8 +2,18 @@
 Response Models
 Standardized response format with diagnostic support.
 """
+import json
 from pydantic import BaseModel, Field
-from typing import Optional, Literal
+from typing import Optional, Literal, Any
+
+
+class DiagnosticInfo(BaseModel):
+    """Diagnostic details for a single detected error code."""
+    
+    error_code: str = Field(..., examples=["ER001"])
+    title: str = Field(..., examples=["Gun Temperature Limit"])
+    description: str = Field(..., examples=["The gun temperature exceeded the 90°C threshold"])
+    solutions: list[str] = Field(default_factory=list)
 
 
 class ChatResponse(BaseModel):
@@ -16,7 +26,11 @@ class ChatResponse(BaseModel):
     
     Type: "diagnostic" - Error code detected and diagnosed
     ────────────────────────────────────────────────────────────────
-    Fields populated: text, error_code, description, solutions
+    Fields populated: text, error_code, description, solutions, diagnostics
+    
+    error_code/description/solutions describe the first detected code;
+    diagnostics lists every code mentioned in the message (in order), so
+    "ER005 and ER006 after ER001" returns all three in one response.
     
     Example:
     {
@@ -183,6 +197,11 @@ class ChatResponse(BaseModel):
         description="List of solution steps for the error"
     )
     
+    diagnostics: Optional[list[DiagnosticInfo]] = Field(
+        None,
+        description="Every detected error code, in order of mention"
+    )
+    
     # Flow-specific fields (populated when type="flow")
     options: Optional[list[str]] = Field(
         None,
@@ -205,6 +224,15 @@ class ChatResponse(BaseModel):
         description="Session identifier for conversation continuity"
     )
     
+    degraded: Optional[list[str]] = Field(
+        None,
+        description=(
+            "What was skipped or substituted to answer within the request deadline "
+            "(routing stage names, 'ai', 'session_write'); null for a complete turn"
+        ),
+        examples=[["semantic", "ai"]]
+    )
+    
     model_config = {
         "json_schema_extra": {
             "examples": [
@@ -238,6 +266,121 @@ class ChatResponse(BaseModel):
     }
 
 
+class ResponseFragment:
+    """
+    A ChatResponse body serialized once, with a hole where session_id goes.
+    
+    Flow node and diagnostic responses are identical for every user except
+    session_id, so they are encoded ahead of time and only the session id is
+    spliced in per request (no model construction, validation or encoding).
+    """
+    
+    __slots__ = ("type", "text", "prefix", "suffix")
+    
+    # Never produced by user content: control characters are escaped in JSON
+    _SESSION_PLACEHOLDER = "\x00session_id\x00"
+    
+    def __init__(self, type: str, text: str, prefix: bytes, suffix: bytes):
+        """
+        Args:
+            type: Response type ("flow" or "diagnostic")
+            text: Response text (saved to conversation history)
+            prefix: Encoded body up to the session_id value
+            suffix: Encoded body after the session_id value
+        """
+        self.type = type
+        self.text = text
+        self.prefix = prefix
+        self.suffix = suffix
+    
+    @classmethod
+    def encode(cls, response: ChatResponse) -> "ResponseFragment":
+        """
+        Pre-encode a response (its session_id is ignored).
+        
+        Args:
+            response: Fully populated ChatResponse
+        
+        Returns:
+            ResponseFragment producing the same JSON as the response model
+        """
+        body = response.model_copy(
+            update={"session_id": cls._SESSION_PLACEHOLDER}
+        ).model_dump_json().encode("utf-8")
+        
+        prefix, suffix = body.split(json.dumps(cls._SESSION_PLACEHOLDER).encode("utf-8"))
+        return cls(response.type, response.text, prefix, suffix)
+    
+    def bind(self, session_id: str) -> "PreEncodedResponse":
+        """
+        Attach a session id.
+        
+        Args:
+            session_id: Session identifier
+        
+        Returns:
+            PreEncodedResponse ready to send
+        """
+        return PreEncodedResponse(self, session_id)
+
+
+class PreEncodedResponse:
+    """
+    A ResponseFragment bound to a session, returned by ConversationManager
+    in place of a ChatResponse. Routes send body() as a raw JSON response.
+    """
+    
+    __slots__ = ("fragment", "session_id")
+    
+    def __init__(self, fragment: ResponseFragment, session_id: str):
+        self.fragment = fragment
+        self.session_id = session_id
+    
+    @property
+    def type(self) -> str:
+        return self.fragment.type
+    
+    @property
+    def text(self) -> str:
+        return self.fragment.text
+    
+    def body(self) -> bytes:
+        """
+        Get the JSON body.
+        
+        Returns:
+            UTF-8 encoded ChatResponse JSON
+        """
+        return b"".join((
+            self.fragment.prefix,
+            json.dumps(self.session_id).encode("utf-8"),
+            self.fragment.suffix
+        ))
+
+
+class ErrorSuggestion(BaseModel):
+    """One typeahead completion."""
+    
+    error_code: str = Field(..., examples=["ER001"])
+    title: str = Field(..., examples=["Gun Temperature Limit"])
+
+
+class SuggestResponse(BaseModel):
+    """Error code / title typeahead response (GET /v1/errors/suggest)."""
+    
+    query: str = Field(..., examples=["gun te"])
+    suggestions: list[ErrorSuggestion] = Field(default_factory=list)
+
+
+class CatalogPatchResponse(BaseModel):
+    """Catalog patch result (PATCH /v1/admin/catalog)."""
+    
+    namespace: str = Field(..., examples=["default"])
+    version: int = Field(..., description="Catalog version now being served", examples=[2])
+    error_codes_count: int = Field(..., examples=[151])
+    applied: int = Field(..., description="Operations applied", examples=[3])
+
+
 class HealthResponse(BaseModel):
     """Health check response model."""
     
@@ -246,3 +389,55 @@ class HealthResponse(BaseModel):
     timestamp: str = Field(..., examples=["2026-02-19T10:30:00Z"])
     diagnostics_loaded: bool = Field(..., examples=[True])
     error_codes_count: int = Field(..., examples=[150])
+    diagnostic_cache: Optional[dict[str, Any]] = Field(
+        None,
+        description="Diagnostic detection cache statistics",
+        examples=[{"size": 120, "hits": 980, "misses": 140, "hit_rate": 0.875}]
+    )
+    routing: Optional[dict[str, Any]] = Field(
+        None,
+        description="Routing stage order and per-stage run time and hit rate",
+        examples=[{
+            "order": ["troubleshooting", "option", "diagnostic", "ai"],
+            "stages": {"diagnostic": {
+                "cost_class": "index", "runs": 812, "answered": 301,
+                "hit_rate": 0.3707, "mean_ms": 0.184, "skipped": 0
+            }}
+        }]
+    )
+    deadline: Optional[dict[str, Any]] = Field(
+        None,
+        description="Request deadline budget and degraded turn counts",
+        examples=[{
+            "default_ms": 5000, "reserve_ms": 200, "degraded": 12,
+            "deferred_writes": 3, "exceeded": 1, "pending_writes": 0
+        }]
+    )
+    ai_prefetch: Optional[dict[str, Any]] = Field(
+        None,
+        description="Speculative AI calls started alongside the rule stages, used and wasted",
+        examples=[{
+            "enabled": True, "max_inflight": 8, "inflight": 0, "started": 420,
+            "used": 371, "wasted": 49, "capped": 0, "waste_rate": 0.1167,
+            "mean_wasted_ms": 1.9, "mean_overlap_ms": 0.74
+        }]
+    )
+    cpu_offload: Optional[dict[str, Any]] = Field(
+        None,
+        description="Matching calls run inline vs. offloaded to the worker pool",
+        examples=[{
+            "mode": "thread", "min_cost_ms": 1.0, "inline": 5120,
+            "offloaded": 37, "errors": 0, "mean_offloaded_ms": 2.41
+        }]
+    )
+    shadow_evaluation: Optional[dict[str, Any]] = Field(
+        None,
+        description="Shadow evaluation statistics (when SHADOW_ENABLED)",
+        examples=[{
+            "sampled": 412, "shed": 0, "errors": 0, "pending": 1,
+            "candidates": {"diagnostic-numpy": {
+                "evaluated": 198, "disagreements": 2,
+                "disagreement_rate": 0.0101, "mean_latency_ms": 0.41
+            }}
+        }]
+    )
@@ -4,7 +4,7 @@ MongoDB-based session management for conversation continuity.
 """
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from ..core.logger import setup_logger
 from ..core.config import get_settings
 from ..utils.text_utils import generate_session_id
@@ -196,6 +196,61 @@ class SessionService:
         
         logger.debug(f"Added {role} message to session: {session_id}")
     
+    async def commit_turn(
+        self,
+        user_id: str,
+        session_id: str,
+        current_node: Optional[str] = None,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        **extra_data
+    ) -> None:
+        """
+        Write all of a chat turn's session changes in one round trip.
+        
+        Combines update_session() and one add_message_to_history() per
+        message into a single update_one ($set plus $push with $each).
+        
+        Args:
+            user_id: User identifier
+            session_id: Session identifier
+            current_node: Current conversation node
+            messages: History entries to append, in order: {"role", "content"}
+                and optionally "timestamp" (defaults to now)
+            **extra_data: Additional fields to set (not conversation_history)
+        """
+        now = datetime.utcnow()
+        update_data = {"updated_at": now}
+        
+        if current_node:
+            update_data["current_node"] = current_node
+        
+        update_data.update(extra_data)
+        update: Dict[str, Any] = {"$set": update_data}
+        
+        if messages:
+            update["$push"] = {
+                "conversation_history": {
+                    "$each": [
+                        {
+                            "role": message["role"],
+                            "content": message["content"],
+                            "timestamp": message.get("timestamp") or now
+                        }
+                        for message in messages
+                    ]
+                }
+            }
+        
+        await self.collection.update_one(
+            {"user_id": user_id, "session_id": session_id},
+            update
+        )
+        
+        logger.debug(
+            f"Committed turn ({len(messages or [])} messages) to session: {session_id}",
+            extra={"session_id": session_id}
+        )
+    
     async def get_session_by_id(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve session by session ID.
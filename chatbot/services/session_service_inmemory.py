@@ -3,7 +3,7 @@ In-Memory Session Service
 Simple session management without MongoDB for quick testing/demo.
 """
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from ..core.logger import setup_logger
 from ..core.config import get_settings
 from ..utils.text_utils import generate_session_id
@@ -83,6 +83,7 @@ class InMemorySessionService:
             "session_id": generate_session_id(),
             "current_node": "start",
             "platform": platform,
+            "conversation_history": [],
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
@@ -121,6 +122,72 @@ class InMemorySessionService:
                 extra={"session_id": session_id}
             )
     
+    async def add_message_to_history(
+        self,
+        user_id: str,
+        session_id: str,
+        role: str,
+        content: str
+    ) -> None:
+        """
+        Add a message to conversation history.
+        
+        Args:
+            user_id: User identifier
+            session_id: Session identifier
+            role: Message role (user/assistant)
+            content: Message content
+        """
+        await self.commit_turn(
+            user_id=user_id,
+            session_id=session_id,
+            messages=[{"role": role, "content": content}]
+        )
+    
+    async def commit_turn(
+        self,
+        user_id: str,
+        session_id: str,
+        current_node: Optional[str] = None,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        **extra_data
+    ) -> None:
+        """
+        Apply all of a chat turn's session changes at once.
+        
+        Args:
+            user_id: User identifier
+            session_id: Session identifier
+            current_node: Current conversation node
+            messages: History entries to append, in order: {"role", "content"}
+                and optionally "timestamp" (defaults to now)
+            **extra_data: Additional fields to update
+        """
+        session = self.sessions.get(user_id)
+        if not session or session.get("session_id") != session_id:
+            return
+        
+        now = datetime.utcnow()
+        session["updated_at"] = now
+        
+        if current_node:
+            session["current_node"] = current_node
+        
+        session.update(extra_data)
+        
+        history = session.setdefault("conversation_history", [])
+        for message in messages or []:
+            history.append({
+                "role": message["role"],
+                "content": message["content"],
+                "timestamp": message.get("timestamp") or now
+            })
+        
+        logger.debug(
+            f"Committed turn ({len(messages or [])} messages) to session: {session_id}",
+            extra={"session_id": session_id}
+        )
+    
     async def get_session_by_id(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve session by session ID.
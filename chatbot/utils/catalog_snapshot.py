@@ -0,0 +1,243 @@
+"""
+Catalog Snapshot Format
+Versioned binary container for compiled error catalogs.
+
+A snapshot is written once by build_catalog_snapshot.py and memory-mapped
+read-only by every worker, so the catalog and its search arrays live in the
+shared page cache instead of being parsed into each process.
+
+Layout (little-endian):
+    
+    header   magic "EVCS", format version (u16), reserved (u16), section count (u32)
+    toc      per section: name (32 bytes, NUL padded), offset (u64), length (u64)
+    sections raw bytes, each starting on an 8-byte boundary
+
+Sections are either flat numeric arrays (read with np.frombuffer, no copy)
+or string tables: a "<name>.offsets" u64 array plus a "<name>.data" UTF-8
+blob, decoded one item at a time on access.
+
+NumPy is required to read and write snapshots (see vector_index.numpy_available).
+"""
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+MAGIC = b"EVCS"
+FORMAT_VERSION = 1
+
+# File name suffix used next to the source JSON (error_codes_complete.bin)
+SNAPSHOT_SUFFIX = ".bin"
+
+_HEADER = struct.Struct("<4sHHI")
+_TOC_ENTRY = struct.Struct("<32sQQ")
+_ALIGNMENT = 8
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot is missing sections, corrupt or of another version."""
+
+
+def pack_strings(strings: Iterable[str]) -> Dict[str, bytes]:
+    """
+    Encode strings as a string table.
+    
+    Args:
+        strings: Strings in table order
+    
+    Returns:
+        {"offsets": u64 array bytes, "data": UTF-8 blob}
+    """
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    return {"offsets": offsets.tobytes(), "data": b"".join(encoded)}
+
+
+def file_sha256(path: str) -> str:
+    """
+    Hash a file in chunks (used to detect snapshots built from an older source).
+    
+    Args:
+        path: File to hash
+    
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_snapshot(path: str, sections: Dict[str, bytes]) -> None:
+    """
+    Write sections into a snapshot file atomically.
+    
+    The file is written next to its destination and moved into place with
+    os.replace, so running workers never map a half-written snapshot.
+    
+    Args:
+        path: Destination file
+        sections: Section name (at most 32 ASCII bytes) → raw bytes
+    """
+    names = list(sections)
+    data_start = _HEADER.size + _TOC_ENTRY.size * len(names)
+    
+    toc = []
+    offset = data_start
+    for name in names:
+        offset += -offset % _ALIGNMENT
+        toc.append(_TOC_ENTRY.pack(name.encode("ascii"), offset, len(sections[name])))
+        offset += len(sections[name])
+    
+    # Per-process temporary name: several server processes may rebuild the same file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(names)))
+        f.write(b"".join(toc))
+        for name in names:
+            f.write(b"\0" * (-f.tell() % _ALIGNMENT))
+            f.write(sections[name])
+        f.flush()
+        os.fsync(f.fileno())
+    
+    os.replace(tmp_path, path)
+
+
+class StringTable:
+    """Read-only sequence of strings decoded lazily from a string table."""
+    
+    def __init__(self, offsets, data: memoryview):
+        """
+        Args:
+            offsets: u64 array with len(table) + 1 boundaries
+            data: UTF-8 blob
+        """
+        self.offsets = offsets
+        self.data = data
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def _raw(self, index: int) -> memoryview:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.data[int(self.offsets[index]):int(self.offsets[index + 1])]
+    
+    def __getitem__(self, index: int) -> str:
+        return str(self._raw(index), "utf-8")
+    
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+class RecordTable(StringTable):
+    """String table whose items are JSON documents (one catalog entry each)."""
+    
+    def __getitem__(self, index: int) -> Any:
+        return json.loads(bytes(self._raw(index)))
+
+
+class Vocabulary:
+    """
+    Sorted string table used as a read-only term → row mapping.
+    
+    Lookups bisect the mapped table, so no per-process dict is built.
+    """
+    
+    def __init__(self, table: StringTable):
+        self.table = table
+    
+    def __len__(self) -> int:
+        return len(self.table)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.table)
+    
+    def get(self, term: str, default: Optional[int] = None) -> Optional[int]:
+        """
+        Get the row of a term.
+        
+        Args:
+            term: Term to look up
+            default: Returned when the term is absent
+        
+        Returns:
+            Row number or default
+        """
+        row = bisect.bisect_left(self.table, term)
+        if row < len(self.table) and self.table[row] == term:
+            return row
+        return default
+    
+    def __contains__(self, term: str) -> bool:
+        return self.get(term) is not None
+
+
+class SnapshotReader:
+    """Memory-mapped, read-only view of a snapshot file."""
+    
+    def __init__(self, path: str):
+        """
+        Map a snapshot and read its table of contents.
+        
+        Args:
+            path: Snapshot file
+        
+        Raises:
+            SnapshotError: If the file is not a snapshot of FORMAT_VERSION
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise SnapshotError("file too small")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        
+        magic, version, _, count = _HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise SnapshotError("not a catalog snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"format version {version}, expected {FORMAT_VERSION}")
+        
+        if _HEADER.size + count * _TOC_ENTRY.size > len(self._buffer):
+            raise SnapshotError("truncated table of contents")
+        
+        self.sections: Dict[str, tuple] = {}
+        for i in range(count):
+            raw_name, offset, length = _TOC_ENTRY.unpack_from(
+                self._buffer, _HEADER.size + i * _TOC_ENTRY.size
+            )
+            if offset + length > len(self._buffer):
+                raise SnapshotError("truncated file")
+            self.sections[raw_name.rstrip(b"\0").decode("ascii")] = (offset, length)
+    
+    def section(self, name: str) -> memoryview:
+        """Get a section's bytes without copying."""
+        if name not in self.sections:
+            raise SnapshotError(f"missing section '{name}'")
+        offset, length = self.sections[name]
+        return self._buffer[offset:offset + length]
+    
+    def array(self, name: str, dtype: str) -> "np.ndarray":
+        """Get a numeric section as a read-only array backed by the mapping."""
+        return np.frombuffer(self.section(name), dtype=dtype)
+    
+    def strings(self, name: str, table_class=StringTable) -> StringTable:
+        """Get a string table section pair ("<name>.offsets", "<name>.data")."""
+        return table_class(self.array(f"{name}.offsets", "<u8"), self.section(f"{name}.data"))
+    
+    def json(self, name: str) -> Any:
+        """Decode a small JSON section (metadata)."""
+        return json.loads(bytes(self.section(name)))
@@ -0,0 +1,212 @@
+"""
+Error Code Resolver
+Maps every accepted surface form of an error code to its canonical catalog code.
+
+The alias table is built once at catalog load time, so resolving a code found
+in a message is a single hash lookup. Codes that are not in the alias table
+(OCR-style typos such as "EF001" or "EER001") are corrected through a small
+deletion-neighbourhood index over the catalog's code tokens.
+"""
+import re
+from typing import Dict, List, Optional
+from .search_index import DeletionIndex
+from .text_utils import CodeToken, ER_PREFIXES, scan_error_codes
+
+_CATALOG_CODE = re.compile(r'^([A-Za-z]*)[-_ ]?(\d+)$')
+
+
+def alias_key(prefix: str, digits: str) -> str:
+    """
+    Build the alias table key for a prefix and digit string.
+    
+    Leading zeros are dropped so zero-padded and unpadded forms share a key:
+    ("ER", "001"), ("ER", "1") and ("ER", "0001") all become "ER1".
+    
+    Args:
+        prefix: Normalized prefix ("ER", "" for bare numbers)
+        digits: ASCII digit string
+    
+    Returns:
+        Alias key string
+    """
+    return f"{prefix}{int(digits)}"
+
+
+class ErrorCodeResolver:
+    """
+    Canonical error code resolver with a precomputed alias table.
+    
+    Accepted forms for catalog code "ER001" include ER001, er-001, ER 001,
+    ERR001, E1, "error code 1", "001" and Devanagari digits; bare catalog codes
+    such as "301" also answer to "ER301" and "error 301".
+    """
+    
+    # Edit distance tolerated for code tokens that miss the alias table
+    MAX_TYPO_DISTANCE = 1
+    
+    # Shortest code token eligible for typo correction ("ER01" is too ambiguous)
+    MIN_TYPO_LENGTH = 5
+    
+    def __init__(self):
+        """Initialize an empty resolver."""
+        self.aliases: Dict[str, str] = {}  # alias key → canonical code
+        self._typo_targets: Dict[str, str] = {}  # code token → canonical code
+        self._typo_index: Optional[DeletionIndex] = None
+    
+    def __len__(self) -> int:
+        return len(set(self.aliases.values()))
+    
+    def copy(self) -> "ErrorCodeResolver":
+        """
+        Copy the resolver for adding codes, leaving this one untouched.
+        
+        Returns:
+            ErrorCodeResolver with the same codes (typo index rebuilt on use)
+        """
+        resolver = ErrorCodeResolver()
+        resolver.aliases = dict(self.aliases)
+        resolver._typo_targets = dict(self._typo_targets)
+        return resolver
+    
+    @property
+    def typo_index(self) -> DeletionIndex:
+        """
+        Deletion index over code tokens.
+        
+        Built on the first typo correction rather than at load time; most
+        messages resolve through the alias table and never need it.
+        """
+        if self._typo_index is None:
+            index = DeletionIndex(max_distance=self.MAX_TYPO_DISTANCE)
+            for token in self._typo_targets:
+                index.add(token)
+            self._typo_index = index
+        return self._typo_index
+    
+    @staticmethod
+    def _split_code(code: str) -> Optional[tuple]:
+        """Split a catalog code into (normalized prefix, digits), or None."""
+        match = _CATALOG_CODE.match(code.strip())
+        if not match:
+            return None
+        letters, digits = match.groups()
+        prefix = "ER" if letters.lower() in ER_PREFIXES else letters.upper()
+        return prefix, digits
+    
+    def add_code(self, code: str) -> None:
+        """
+        Register a catalog code and its aliases.
+        
+        Args:
+            code: Canonical error code as it appears in the catalog
+        """
+        canonical = code.strip().upper()
+        if not canonical:
+            return
+        
+        # The canonical spelling always resolves to itself
+        self.aliases[canonical] = canonical
+        
+        parts = self._split_code(canonical)
+        if not parts:
+            return
+        
+        prefix, digits = parts
+        self.aliases[alias_key(prefix, digits)] = canonical
+        
+        if prefix == "ER":
+            # "001" typed on its own means ER001 unless a bare 001 exists
+            self.aliases.setdefault(alias_key("", digits), canonical)
+        elif prefix == "":
+            # "ER301" / "error 301" means 301 unless an ER301 exists
+            self.aliases.setdefault(alias_key("ER", digits), canonical)
+        
+        if prefix:
+            for token in {canonical, f"{prefix}{digits}"}:
+                self._typo_targets[token] = canonical
+                if self._typo_index is not None:
+                    self._typo_index.add(token)
+    
+    def lookup(self, code: str) -> Optional[str]:
+        """
+        Resolve a single code string (e.g. "ER001", "301", "er-1").
+        
+        Args:
+            code: Error code as typed
+        
+        Returns:
+            Canonical catalog code or None
+        """
+        if not code:
+            return None
+        
+        direct = self.aliases.get(code.strip().upper())
+        if direct:
+            return direct
+        
+        for token in scan_error_codes(code):
+            return self._resolve_token(token)
+        
+        return None
+    
+    def resolve(self, message: str) -> Optional[str]:
+        """
+        Resolve the first error code mentioned in a message.
+        
+        Args:
+            message: User's input message
+        
+        Returns:
+            Canonical catalog code or None
+        """
+        for token in scan_error_codes(message):
+            canonical = self._resolve_token(token)
+            if canonical:
+                return canonical
+        
+        return None
+    
+    def resolve_all(self, message: str) -> List[str]:
+        """
+        Resolve every error code mentioned in a message.
+        
+        Args:
+            message: User's input message (e.g. "ER005 and ER006 after ER001")
+        
+        Returns:
+            Canonical catalog codes in order of first mention, without duplicates
+        """
+        codes: Dict[str, None] = {}
+        for token in scan_error_codes(message):
+            canonical = self._resolve_token(token)
+            if canonical:
+                codes.setdefault(canonical)
+        
+        return list(codes)
+    
+    def _resolve_token(self, token: CodeToken) -> Optional[str]:
+        """Resolve a scanned token through the alias table, then typo index."""
+        canonical = self.aliases.get(alias_key(token.prefix, token.digits))
+        if canonical or not token.prefix:
+            return canonical
+        
+        return self._correct_typo(token.surface)
+    
+    def _correct_typo(self, surface: str) -> Optional[str]:
+        """Correct a near-miss code token, refusing ambiguous corrections."""
+        if len(surface) < self.MIN_TYPO_LENGTH:
+            return None
+        
+        matches = self.typo_index.lookup(surface)
+        if not matches:
+            return None
+        
+        best_distance = matches[0][1]
+        targets = {
+            self._typo_targets[term] for term, distance in matches
+            if distance == best_distance
+        }
+        if len(targets) != 1:
+            return None
+        
+        return targets.pop()
@@ -0,0 +1,75 @@
+"""
+Request Deadlines
+A time budget carried through a request, checked before each slow call.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Optional
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request's time budget ran out before a required call finished."""
+
+
+class Deadline:
+    """
+    Point in time by which a request must be answered.
+    
+    Created once per request from its budget; every slow call awaits through
+    wait(), which gives it whatever time is left instead of a fixed timeout.
+    """
+    
+    __slots__ = ("budget_ms", "expires_at")
+    
+    def __init__(self, budget_ms: Optional[float]):
+        """
+        Start the clock.
+        
+        Args:
+            budget_ms: Time budget in milliseconds (None for no deadline)
+        """
+        self.budget_ms = budget_ms
+        self.expires_at = None if budget_ms is None else time.monotonic() + budget_ms / 1000
+    
+    def remaining_ms(self) -> float:
+        """Milliseconds left (infinite without a deadline, negative when overrun)."""
+        if self.expires_at is None:
+            return float("inf")
+        return (self.expires_at - time.monotonic()) * 1000
+    
+    def expired(self) -> bool:
+        """Check whether the budget is spent."""
+        return self.remaining_ms() <= 0
+    
+    async def wait(self, awaitable: Awaitable[Any], reserve_ms: float = 0.0) -> Any:
+        """
+        Await a call within the remaining budget.
+        
+        The call is cancelled when it does not finish in time; wrap it in
+        asyncio.shield() to let it continue in the background instead.
+        
+        Args:
+            awaitable: Coroutine or future
+            reserve_ms: Budget to keep for work after this call
+        
+        Returns:
+            Result of the call
+        
+        Raises:
+            DeadlineExceeded: If less than reserve_ms was left, or the call
+                did not finish before only reserve_ms was left
+        """
+        timeout_ms = self.remaining_ms() - reserve_ms
+        if timeout_ms == float("inf"):
+            return await awaitable
+        if timeout_ms <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            elif asyncio.isfuture(awaitable):
+                awaitable.cancel()
+            raise DeadlineExceeded(f"{self.budget_ms:.0f} ms budget spent")
+        
+        try:
+            return await asyncio.wait_for(awaitable, timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"{self.budget_ms:.0f} ms budget spent") from None
@@ -0,0 +1,219 @@
+"""
+Intent Classifier (CPU-only, no network)
+Multinomial naive Bayes over hashed word n-grams, trained offline.
+
+Messages are turned into a set of hashed features (words and word bigrams,
+crc32 into a fixed number of buckets), so no vocabulary is stored and the
+model size only depends on the bucket count and the number of intents.
+Training (train_intent_classifier.py) counts features per intent over
+labeled chat messages; at query time the few feature rows of a message are
+gathered from the weight matrix and summed, giving a probability per intent
+in microseconds.
+
+Buckets never seen during training carry no weight, so a message made only
+of unknown words gets no prediction instead of the class prior.
+
+The model is persisted in the catalog snapshot container format
+(catalog_snapshot.py) and memory-mapped on load. NumPy is required.
+"""
+import json
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+from .catalog_snapshot import SnapshotError, SnapshotReader, write_snapshot
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+class IntentClassifier:
+    """
+    Hashed n-gram naive Bayes model: message → probability per intent.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, intents: List[str], log_prior, weights, known, dim: int, samples: int = 0):
+        """
+        Wrap trained or memory-mapped arrays (use train() or load()).
+        
+        Args:
+            intents: Intent per class column
+            log_prior: float32 array (classes,)
+            weights: float32 array (dim, classes) of feature log-likelihoods
+            known: uint8 array (dim,), 1 for buckets seen in training
+            dim: Hash space size
+            samples: Training messages (informational)
+        """
+        self.intents = intents
+        self.log_prior = log_prior
+        self.weights = weights
+        self.known = known
+        self.dim = dim
+        self.samples = samples
+    
+    @property
+    def signature(self) -> str:
+        """Identifies the feature extraction (a persisted model must match)."""
+        return f"nb-hash-v{self.VERSION}-{self.dim}"
+    
+    @staticmethod
+    def features(text: str, dim: int) -> List[int]:
+        """
+        Hash a message into its distinct feature buckets.
+        
+        Args:
+            text: Normalized message (see text_utils.normalize_text)
+            dim: Hash space size
+        
+        Returns:
+            Bucket ids of the message's words and word bigrams
+        """
+        words = _WORD_PATTERN.findall(text)
+        grams = [f"w:{word}" for word in words]
+        grams.extend(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+        return list({zlib.crc32(gram.encode("utf-8")) % dim for gram in grams})
+    
+    @classmethod
+    def train(
+        cls,
+        samples: Iterable[Tuple[str, str]],
+        dim: int = 1 << 15,
+        alpha: float = 0.1
+    ) -> "IntentClassifier":
+        """
+        Fit the model on labeled messages.
+        
+        Args:
+            samples: (normalized message, intent) pairs
+            dim: Hash space size
+            alpha: Additive (Lidstone) smoothing
+        
+        Returns:
+            Trained IntentClassifier
+        
+        Raises:
+            ValueError: If there are no samples or fewer than two intents
+        """
+        rows: List[List[int]] = []
+        labels: List[str] = []
+        for text, intent in samples:
+            rows.append(cls.features(text, dim))
+            labels.append(intent)
+        
+        intents = sorted(set(labels))
+        if len(intents) < 2:
+            raise ValueError(f"need samples of at least two intents, got {len(intents)}")
+        column = {intent: i for i, intent in enumerate(intents)}
+        
+        counts = np.zeros((dim, len(intents)), dtype=np.float64)
+        class_sizes = np.zeros(len(intents), dtype=np.float64)
+        for buckets, intent in zip(rows, labels):
+            counts[buckets, column[intent]] += 1
+            class_sizes[column[intent]] += 1
+        
+        known = (counts.sum(axis=1) > 0).astype(np.uint8)
+        totals = counts.sum(axis=0)
+        weights = np.log(counts + alpha) - np.log(totals + alpha * int(known.sum()))
+        weights[known == 0] = 0
+        log_prior = np.log(class_sizes / class_sizes.sum())
+        
+        return cls(
+            intents,
+            log_prior.astype(np.float32),
+            np.ascontiguousarray(weights, dtype=np.float32),
+            known,
+            dim,
+            samples=len(labels)
+        )
+    
+    def scores(self, text: str) -> Dict[str, float]:
+        """
+        Get the probability of each intent for a message.
+        
+        Args:
+            text: Normalized message
+        
+        Returns:
+            intent → probability (summing to 1), or an empty dict if none of
+            the message's features were seen in training
+        """
+        # Unknown buckets have all-zero weight rows, they only need skipping here
+        buckets = self.features(text, self.dim)
+        if not buckets or not self.known[buckets].any():
+            return {}
+        
+        joint = self.log_prior + self.weights[buckets].sum(axis=0)
+        joint = np.exp(joint - joint.max())
+        joint /= joint.sum()
+        return dict(zip(self.intents, joint.tolist()))
+    
+    def predict(self, text: str) -> Optional[Tuple[str, float]]:
+        """
+        Get the most probable intent of a message.
+        
+        Args:
+            text: Normalized message
+        
+        Returns:
+            (intent, probability), or None if the message has no known features
+        """
+        scores = self.scores(text)
+        if not scores:
+            return None
+        intent = max(scores, key=scores.get)
+        return intent, scores[intent]
+    
+    def write(self, path: str) -> None:
+        """
+        Persist the model (replaced atomically).
+        
+        Args:
+            path: Destination file
+        """
+        meta = {
+            "signature": self.signature,
+            "dim": self.dim,
+            "intents": self.intents,
+            "samples": self.samples,
+        }
+        write_snapshot(path, {
+            "meta": json.dumps(meta).encode("utf-8"),
+            "log_prior": self.log_prior.astype("<f4").tobytes(),
+            "weights": self.weights.astype("<f4").tobytes(),
+            "known": self.known.astype("u1").tobytes(),
+        })
+    
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        """
+        Memory-map a persisted model.
+        
+        Args:
+            path: Model file written by write()
+        
+        Returns:
+            IntentClassifier
+        
+        Raises:
+            SnapshotError: If the file is corrupt or was written by another
+                feature extraction version
+        """
+        reader = SnapshotReader(path)
+        meta = reader.json("meta")
+        expected = f"nb-hash-v{cls.VERSION}-{meta.get('dim')}"
+        if meta.get("signature") != expected:
+            raise SnapshotError(f"model signature {meta.get('signature')}, expected {expected}")
+        
+        return cls(
+            meta["intents"],
+            reader.array("log_prior", "<f4"),
+            reader.array("weights", "<f4").reshape(meta["dim"], len(meta["intents"])),
+            reader.array("known", "u1"),
+            meta["dim"],
+            samples=meta.get("samples", 0)
+        )
@@ -0,0 +1,59 @@
+"""
+Keyed Async Lock
+One asyncio lock per key, created on demand and dropped when unused.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable
+
+
+class _KeyedLockEntry:
+    __slots__ = ("lock", "users")
+    
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0  # Holders and waiters
+
+
+class KeyedLock:
+    """
+    Serializes work per key while different keys run fully in parallel.
+    
+    Each key's lock is created on first use and removed as soon as nobody
+    holds or waits for it, so memory grows with the number of keys in use
+    at the same time, not with the number of keys ever seen. Waiters are
+    granted the lock in arrival order (asyncio.Lock is FIFO).
+    """
+    
+    def __init__(self):
+        """Initialize with no keys."""
+        self._entries: Dict[Hashable, _KeyedLockEntry] = {}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def locked(self, key: Hashable) -> bool:
+        """Check whether a key's lock is currently held."""
+        entry = self._entries.get(key)
+        return entry is not None and entry.lock.locked()
+    
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        """
+        Hold the lock of a key for the duration of an async with block.
+        
+        Args:
+            key: Key to serialize on (e.g. a user id)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _KeyedLockEntry()
+        entry.users += 1
+        
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._entries[key]
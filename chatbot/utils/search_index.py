@@ -0,0 +1,708 @@
+"""
+Search Index Structures
+In-memory indexes built once at catalog load time for fast diagnostic lookup.
+
+These structures keep per-query cost proportional to the query terms instead
+of the catalog size, so free-text matching stays fast as the catalog grows.
+"""
+import bisect
+import heapq
+import math
+from collections import deque
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+
+class BM25Index:
+    """
+    Token-level inverted index with Okapi BM25 ranking.
+    
+    Postings, document lengths and IDF weights are precomputed when the index
+    is finalized, so a query only touches the postings of its own terms.
+    
+    Usage:
+        index = BM25Index()
+        index.add_document(0, ["gun", "temperature", "limit"])
+        index.finalize()
+        index.search(["gun", "temperature"], top_k=3)  # → [(0, 1.23)]
+    """
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an empty index.
+        
+        Args:
+            k1: Term frequency saturation parameter
+            b: Document length normalization parameter
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, int]] = {}  # term → {doc_id: tf}
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self.idf: Dict[str, float] = {}
+        self.avg_doc_length: float = 0.0
+        self._length_norms: Dict[Hashable, float] = {}
+        self._shared_postings: Optional[Dict[str, Dict[Hashable, int]]] = None
+    
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+    
+    def __contains__(self, term: str) -> bool:
+        """Check whether any document is posted under a term."""
+        return term in self.postings
+    
+    def copy(self) -> "BM25Index":
+        """
+        Copy the index for modification, leaving this one untouched.
+        
+        Posting lists are shared with this index and copied only when the
+        copy first changes them, so patching a few documents costs little
+        more than the changed postings. Call finalize() on the copy after
+        the last change.
+        
+        Returns:
+            Unfinalized BM25Index with the same documents
+        """
+        index = BM25Index(self.k1, self.b)
+        index.postings = dict(self.postings)
+        index.doc_lengths = dict(self.doc_lengths)
+        index._shared_postings = self.postings
+        return index
+    
+    def _term_postings(self, term: str) -> Dict[Hashable, int]:
+        """Get a term's postings for writing (copying them if still shared)."""
+        doc_postings = self.postings.get(term)
+        if doc_postings is None:
+            doc_postings = self.postings[term] = {}
+        elif self._shared_postings is not None and doc_postings is self._shared_postings.get(term):
+            doc_postings = self.postings[term] = dict(doc_postings)
+        return doc_postings
+    
+    def add_document(
+        self,
+        doc_id: Hashable,
+        tokens: Iterable[str],
+        synonyms: Optional[Mapping[str, Sequence[str]]] = None
+    ) -> None:
+        """
+        Add a document's terms to the index.
+        
+        Call finalize() after the last document is added.
+        
+        Args:
+            doc_id: Document identifier returned by search()
+            tokens: Document terms
+            synonyms: Optional term → synonyms; each term is also posted under
+                its synonyms, so queries using them match without expansion
+                (synonyms do not count towards the document length)
+        """
+        length = 0
+        for token in tokens:
+            for term in (token, *synonyms.get(token, ())) if synonyms else (token,):
+                doc_postings = self._term_postings(term)
+                doc_postings[doc_id] = doc_postings.get(doc_id, 0) + 1
+            length += 1
+        
+        self.doc_lengths[doc_id] = length
+    
+    def remove_document(
+        self,
+        doc_id: Hashable,
+        tokens: Iterable[str],
+        synonyms: Optional[Mapping[str, Sequence[str]]] = None
+    ) -> None:
+        """
+        Remove a document's terms from the index.
+        
+        Call finalize() after the last change.
+        
+        Args:
+            doc_id: Document identifier
+            tokens: The terms the document was added with
+            synonyms: The synonyms the document was added with
+        """
+        for token in tokens:
+            for term in (token, *synonyms.get(token, ())) if synonyms else (token,):
+                if doc_id not in self.postings.get(term, ()):
+                    continue
+                doc_postings = self._term_postings(term)
+                doc_postings[doc_id] -= 1
+                if doc_postings[doc_id] <= 0:
+                    del doc_postings[doc_id]
+                if not doc_postings:
+                    del self.postings[term]
+        
+        self.doc_lengths.pop(doc_id, None)
+    
+    def finalize(self) -> None:
+        """Precompute IDF weights and per-document length normalization."""
+        self._shared_postings = None
+        doc_count = len(self.doc_lengths)
+        self.avg_doc_length = (
+            sum(self.doc_lengths.values()) / doc_count if doc_count else 0.0
+        )
+        
+        self.idf = {
+            term: math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+        
+        avg_length = self.avg_doc_length or 1.0
+        self._length_norms = {
+            doc_id: self.k1 * (1 - self.b + self.b * length / avg_length)
+            for doc_id, length in self.doc_lengths.items()
+        }
+    
+    def search(
+        self,
+        tokens: Iterable[str],
+        top_k: int = 5,
+        min_terms: int = 1
+    ) -> List[Tuple[Hashable, float]]:
+        """
+        Rank documents against query terms.
+        
+        Args:
+            tokens: Query terms (duplicates are ignored)
+            top_k: Maximum number of results
+            min_terms: Minimum number of distinct query terms a document must contain
+        
+        Returns:
+            List of (doc_id, score) tuples, best first
+        """
+        scores: Dict[Hashable, float] = {}
+        matched_terms: Dict[Hashable, int] = {}
+        
+        for term in dict.fromkeys(tokens):
+            doc_postings = self.postings.get(term)
+            if not doc_postings:
+                continue
+            
+            idf = self.idf[term]
+            for doc_id, tf in doc_postings.items():
+                weight = idf * tf * (self.k1 + 1) / (tf + self._length_norms[doc_id])
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+                matched_terms[doc_id] = matched_terms.get(doc_id, 0) + 1
+        
+        if min_terms > 1:
+            scores = {
+                doc_id: score for doc_id, score in scores.items()
+                if matched_terms[doc_id] >= min_terms
+            }
+        
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+
+class TrigramIndex:
+    """
+    Character trigram (q-gram) index for fuzzy candidate generation.
+    
+    Texts are padded with spaces so word starts and ends form their own grams.
+    candidates() ranks documents by the share of their trigrams found in the
+    query, letting callers run an exact similarity scorer on a handful of
+    candidates instead of the whole catalog.
+    """
+    
+    def __init__(self, q: int = 3):
+        """
+        Initialize an empty index.
+        
+        Args:
+            q: Gram length
+        """
+        self.q = q
+        self.postings: Dict[str, List[Hashable]] = {}  # gram → [doc_id, ...]
+        self.texts: Dict[Hashable, str] = {}
+        self.gram_counts: Dict[Hashable, int] = {}
+        self._shared_postings: Optional[Dict[str, List[Hashable]]] = None
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def copy(self) -> "TrigramIndex":
+        """
+        Copy the index for modification, leaving this one untouched.
+        
+        Posting lists are shared and copied only when the copy first
+        changes them (see BM25Index.copy()). Call finalize() on the copy
+        after the last change.
+        
+        Returns:
+            TrigramIndex with the same documents
+        """
+        index = TrigramIndex(self.q)
+        index.postings = dict(self.postings)
+        index.texts = dict(self.texts)
+        index.gram_counts = dict(self.gram_counts)
+        index._shared_postings = self.postings
+        return index
+    
+    def _gram_postings(self, gram: str) -> List[Hashable]:
+        """Get a gram's postings for writing (copying them if still shared)."""
+        doc_ids = self.postings.get(gram)
+        if doc_ids is None:
+            doc_ids = self.postings[gram] = []
+        elif self._shared_postings is not None and doc_ids is self._shared_postings.get(gram):
+            doc_ids = self.postings[gram] = list(doc_ids)
+        return doc_ids
+    
+    def grams(self, text: str) -> set:
+        """
+        Get the distinct q-grams of a text.
+        
+        Args:
+            text: Normalized text
+        
+        Returns:
+            Set of q-gram strings
+        """
+        padded = f" {text} "
+        return {padded[i:i + self.q] for i in range(len(padded) - self.q + 1)}
+    
+    def add(self, doc_id: Hashable, text: str) -> None:
+        """
+        Index a normalized text.
+        
+        Args:
+            doc_id: Document identifier returned by candidates()
+            text: Normalized text
+        """
+        grams = self.grams(text)
+        for gram in grams:
+            self._gram_postings(gram).append(doc_id)
+        
+        self.texts[doc_id] = text
+        self.gram_counts[doc_id] = len(grams)
+    
+    def remove(self, doc_id: Hashable) -> None:
+        """
+        Remove an indexed text.
+        
+        Args:
+            doc_id: Document identifier (ignored if not indexed)
+        """
+        text = self.texts.pop(doc_id, None)
+        if text is None:
+            return
+        
+        for gram in self.grams(text):
+            doc_ids = self._gram_postings(gram)
+            doc_ids.remove(doc_id)
+            if not doc_ids:
+                del self.postings[gram]
+        
+        del self.gram_counts[doc_id]
+    
+    def finalize(self) -> None:
+        """Stop tracking postings shared with the index this one was copied from."""
+        self._shared_postings = None
+    
+    def candidates(self, query: str, limit: int = 10) -> List[Tuple[Hashable, float]]:
+        """
+        Generate candidate documents by trigram overlap.
+        
+        Args:
+            query: Normalized query text
+            limit: Maximum number of candidates
+        
+        Returns:
+            List of (doc_id, coverage) tuples where coverage is the share of the
+            document's trigrams present in the query, best first
+        """
+        overlap: Dict[Hashable, int] = {}
+        for gram in self.grams(query):
+            for doc_id in self.postings.get(gram, ()):
+                overlap[doc_id] = overlap.get(doc_id, 0) + 1
+        
+        return heapq.nlargest(
+            limit,
+            ((doc_id, shared / self.gram_counts[doc_id]) for doc_id, shared in overlap.items()),
+            key=lambda item: item[1]
+        )
+
+
+def edit_distance(source: str, target: str, max_distance: int = 2) -> int:
+    """
+    Damerau-Levenshtein (optimal string alignment) distance.
+    
+    Transposed neighbours ("pamyent" → "payment") count as one edit.
+    
+    Args:
+        source: First string
+        target: Second string
+        max_distance: Distances above this are reported as max_distance + 1
+    
+    Returns:
+        Edit distance, capped at max_distance + 1
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+    
+    previous_previous: List[int] = []
+    previous = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        current = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (
+                i > 1 and j > 1
+                and source[i - 1] == target[j - 2]
+                and source[i - 2] == target[j - 1]
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    
+    return min(previous[-1], max_distance + 1)
+
+
+class DeletionIndex:
+    """
+    SymSpell-style deletion-neighbourhood index for typo correction.
+    
+    Every indexed term is stored under all strings reachable from it by up to
+    max_distance character deletions. A lookup generates the same deletions
+    for the input word, so candidate terms are found with hash lookups only
+    and verified with edit_distance().
+    """
+    
+    def __init__(self, max_distance: int = 2):
+        """
+        Initialize an empty index.
+        
+        Args:
+            max_distance: Largest edit distance supported by lookup()
+        """
+        self.max_distance = max_distance
+        self.terms: set = set()
+        self.deletes: Dict[str, set] = {}  # deletion variant → {term, ...}
+    
+    def __len__(self) -> int:
+        return len(self.terms)
+    
+    def __contains__(self, term: str) -> bool:
+        return term in self.terms
+    
+    def _variants(self, word: str, max_distance: int) -> set:
+        """Generate the word and every string reachable by deleting characters."""
+        variants = {word}
+        frontier = {word}
+        for _ in range(max_distance):
+            next_frontier = set()
+            for variant in frontier:
+                if len(variant) <= 1:
+                    continue
+                for i in range(len(variant)):
+                    next_frontier.add(variant[:i] + variant[i + 1:])
+            next_frontier -= variants
+            variants |= next_frontier
+            frontier = next_frontier
+        return variants
+    
+    def add(self, term: str) -> None:
+        """
+        Index a term.
+        
+        Args:
+            term: Correctly spelled term
+        """
+        if term in self.terms:
+            return
+        
+        self.terms.add(term)
+        for variant in self._variants(term, self.max_distance):
+            self.deletes.setdefault(variant, set()).add(term)
+    
+    def lookup(self, word: str, max_distance: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Find indexed terms within an edit distance of a word.
+        
+        Args:
+            word: Possibly misspelled word
+            max_distance: Override for the index's max_distance (never larger)
+        
+        Returns:
+            List of (term, distance) tuples, closest first
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        
+        if word in self.terms:
+            return [(word, 0)]
+        
+        candidates = set()
+        for variant in self._variants(word, max_distance):
+            candidates.update(self.deletes.get(variant, ()))
+        
+        matches = []
+        for term in candidates:
+            distance = edit_distance(word, term, max_distance)
+            if distance <= max_distance:
+                matches.append((term, distance))
+        
+        matches.sort(key=lambda item: (item[1], item[0]))
+        return matches
+
+
+class _TrieNode:
+    __slots__ = ("children", "top")
+    
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.top: List[Tuple[Any, Hashable]] = []  # (rank, item), best first
+
+
+class PrefixTrie:
+    """
+    Burst trie for typeahead completion.
+    
+    Prefixes shared by more than bucket_size keys are trie nodes that store
+    their top_k completions, computed once in finalize(). Below them, keys
+    live in one sorted array, and a rarer prefix is answered by a bisect over
+    at most bucket_size keys. A lookup therefore costs one step per query
+    character plus a small bounded scan, whatever the catalog size, and the
+    trie only holds nodes for busy prefixes.
+    
+    Usage:
+        trie = PrefixTrie()
+        trie.add("er001", 0, rank=0)
+        trie.add("gun temperature limit", 0, rank=1)
+        trie.finalize()
+        trie.search("gun te")  # → [0]
+    """
+    
+    def __init__(self, top_k: int = 10, bucket_size: int = 64):
+        """
+        Initialize an empty trie.
+        
+        Args:
+            top_k: Completions kept per node (upper bound for search limits)
+            bucket_size: Largest number of keys answered by scanning
+        """
+        self.top_k = top_k
+        self.bucket_size = max(bucket_size, top_k)
+        self.root = _TrieNode()
+        self.node_count = 1
+        self.keys: List[str] = []
+        self.entries: List[Tuple[Any, Hashable]] = []  # (rank, item) per key
+        self._pending: List[Tuple[str, Any, Hashable]] = []
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    def add(self, key: str, item: Hashable, rank: Any) -> None:
+        """
+        Add a key leading to an item.
+        
+        Call finalize() after the last key is added.
+        
+        Args:
+            key: Normalized key text
+            item: Value returned by search() (an item may have several keys)
+            rank: Sort key, lower ranks are suggested first
+        """
+        self._pending.append((key, rank, item))
+    
+    def finalize(self) -> None:
+        """Sort the keys and precompute the completions of busy prefixes."""
+        indexed = [(key, rank, item) for key, (rank, item) in zip(self.keys, self.entries)]
+        pending = sorted(indexed + self._pending, key=lambda entry: entry[0])
+        self._pending = []
+        self.keys = [key for key, _, _ in pending]
+        self.entries = [(rank, item) for _, rank, item in pending]
+        
+        self.root = _TrieNode()
+        self.node_count = 1
+        self._build(self.root, 0, 0, len(self.keys))
+    
+    def _build(self, node: _TrieNode, depth: int, lo: int, hi: int) -> None:
+        """Fill node (prefix of length depth, keys[lo:hi]) and its busy children."""
+        keys = self.keys
+        
+        # Keys equal to the prefix sort first
+        i = lo
+        while i < hi and len(keys[i]) == depth:
+            i += 1
+        candidates = self.entries[lo:i]
+        
+        while i < hi:
+            prefix = keys[i][:depth + 1]
+            j = bisect.bisect_left(keys, prefix[:-1] + chr(ord(prefix[-1]) + 1), i, hi)
+            if j - i > self.bucket_size:
+                child = node.children[prefix[-1]] = _TrieNode()
+                self.node_count += 1
+                self._build(child, depth + 1, i, j)
+                candidates.extend(child.top)
+            else:
+                candidates.extend(self.entries[i:j])
+            i = j
+        
+        node.top = self._best(candidates)
+    
+    def _best(self, candidates: Iterable[Tuple[Any, Hashable]]) -> List[Tuple[Any, Hashable]]:
+        """top_k distinct items by best rank."""
+        best: Dict[Hashable, Any] = {}
+        for rank, item in candidates:
+            if item not in best or rank < best[item]:
+                best[item] = rank
+        return heapq.nsmallest(
+            self.top_k,
+            ((rank, item) for item, rank in best.items()),
+            key=lambda entry: entry[0]
+        )
+    
+    def search(self, prefix: str, limit: int = 10) -> List[Hashable]:
+        """
+        Get the best items with a key starting with prefix.
+        
+        Args:
+            prefix: Normalized query prefix
+            limit: Maximum number of items (at most top_k)
+        
+        Returns:
+            Items, best first
+        """
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                # Rare prefix: at most bucket_size keys, scan them
+                lo = bisect.bisect_left(self.keys, prefix)
+                hi = bisect.bisect_left(self.keys, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo)
+                return [item for _, item in self._best(self.entries[lo:hi])[:limit]]
+        return [item for _, item in node.top[:limit]]
+
+
+class KeywordAutomaton:
+    """
+    Word-level Aho–Corasick automaton over keyword phrases.
+    
+    Phrases are sequences of whole words, so "hi" never matches inside
+    "this". search() finds every occurrence of every phrase in one pass over
+    the message words, independent of the number of phrases.
+    
+    Phrases can be added and removed at any time; failure links are
+    recomputed (one pass over the automaton) on the next search. Nodes of
+    removed phrases are kept without outputs.
+    
+    Usage:
+        automaton = KeywordAutomaton()
+        automaton.add(("payment", "failed"), "wallet")
+        automaton.add(("payment",), "payment")
+        automaton.search(["my", "payment", "failed"])
+        # → [(1, 2, "payment"), (1, 3, "wallet")]
+    """
+    
+    def __init__(self):
+        """Initialize an empty automaton (node 0 is the root)."""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._outputs: List[List[Tuple[int, Any]]] = [[]]  # (phrase length, value)
+        self._fail: List[int] = [0]
+        self._output_link: List[int] = [-1]  # Nearest failure ancestor with outputs
+        self._linked = True
+    
+    def __len__(self) -> int:
+        return sum(len(outputs) for outputs in self._outputs)
+    
+    def _node(self, words: Sequence[str], create: bool) -> Optional[int]:
+        """Walk (or extend) the goto path of a phrase."""
+        node = 0
+        for word in words:
+            child = self._goto[node].get(word)
+            if child is None:
+                if not create:
+                    return None
+                child = len(self._goto)
+                self._goto[node][word] = child
+                self._goto.append({})
+                self._outputs.append([])
+                self._fail.append(0)
+                self._output_link.append(-1)
+            node = child
+        return node
+    
+    def add(self, words: Sequence[str], value: Any) -> None:
+        """
+        Add a phrase.
+        
+        Args:
+            words: Phrase words (non-empty)
+            value: Reported by search() for each occurrence
+        """
+        if not words:
+            return
+        node = self._node(words, create=True)
+        if (len(words), value) not in self._outputs[node]:
+            self._outputs[node].append((len(words), value))
+            self._linked = False
+    
+    def remove(self, words: Sequence[str], value: Any) -> None:
+        """
+        Remove a phrase added with this value (ignored if absent).
+        
+        Args:
+            words: Phrase words
+            value: Value the phrase was added with
+        """
+        node = self._node(words, create=False)
+        if node is not None and (len(words), value) in self._outputs[node]:
+            self._outputs[node].remove((len(words), value))
+            self._linked = False
+    
+    def _link(self) -> None:
+        """Compute failure and output links breadth-first."""
+        self._fail[0] = 0
+        self._output_link[0] = -1
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._output_link[child] = -1
+            queue.append(child)
+        
+        while queue:
+            node = queue.popleft()
+            for word, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(word, 0)
+                self._fail[child] = target if target != child else 0
+                
+                suffix = self._fail[child]
+                self._output_link[child] = suffix if self._outputs[suffix] else self._output_link[suffix]
+                queue.append(child)
+        
+        self._linked = True
+    
+    def search(self, words: Sequence[str]) -> List[Tuple[int, int, Any]]:
+        """
+        Find every phrase occurrence.
+        
+        Args:
+            words: Message words
+        
+        Returns:
+            List of (start word, end word (exclusive), value), ordered by end
+            word and then longest phrase first
+        """
+        if not self._linked:
+            self._link()
+        
+        goto, fail, outputs, output_link = self._goto, self._fail, self._outputs, self._output_link
+        matches = []
+        node = 0
+        for end, word in enumerate(words, start=1):
+            child = goto[node].get(word)
+            while child is None and node:
+                node = fail[node]
+                child = goto[node].get(word)
+            node = child or 0
+            
+            match_node = node if outputs[node] else output_link[node]
+            while match_node > 0:
+                for length, value in outputs[match_node]:
+                    matches.append((end - length, end, value))
+                match_node = output_link[match_node]
+        
+        return matches
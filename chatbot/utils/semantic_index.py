@@ -0,0 +1,372 @@
+"""
+Semantic Index (CPU-only, no network)
+Hashed embeddings with an approximate nearest-neighbour index.
+
+Texts are embedded with a hashing vectorizer (no vocabulary to store):
+- word features
+- character trigram features (robust to typos and inflections)
+- domain concept features (DOMAIN_CONCEPTS maps everyday words onto the
+  vocabulary of the catalog: "plug" → gun, "hot" → temperature)
+
+Feature weights are IDF-scaled over the catalog, vectors are L2-normalized
+and stored as int8 rows with one float scale per row. Queries probe the
+closest IVF (inverted file) clusters only, so a search touches a few hundred
+rows regardless of catalog size. Rows are stored grouped by cluster, so each
+probed cluster is a contiguous slice of the memory-mapped matrix, and only
+the few dimensions where the (sparse) query vector is non-zero are read.
+
+The index is persisted in the catalog snapshot container format
+(catalog_snapshot.py) and memory-mapped on load. NumPy is required.
+"""
+import json
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+from .text_utils import STOP_WORDS
+from .catalog_snapshot import SnapshotReader, write_snapshot
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+# File name suffix used next to the catalog JSON (error_codes_complete.vec)
+SEMANTIC_SUFFIX = ".vec"
+
+# Everyday wording → concept shared with the catalog's technical wording
+DOMAIN_CONCEPTS: Dict[str, List[str]] = {
+    "temperature": [
+        "temperature", "temp", "hot", "heat", "heated", "heating", "warm",
+        "overheat", "overheating", "overheated", "thermal", "burning", "melting",
+    ],
+    "gun": ["gun", "plug", "connector", "nozzle", "handle", "socket"],
+    "cable": ["cable", "wire", "wiring", "lead", "cord"],
+    "earth": ["earth", "earthing", "ground", "grounding", "neutral", "ne"],
+    # Neutral-earth: "earth fault" on the screen is usually the NE voltage fault
+    "ne": ["ne", "neutral", "earth", "earthing", "ground", "grounding"],
+    "leakage": ["leakage", "leak", "leaking", "shock", "rcd", "rccb", "residual"],
+    "smoke": ["smoke", "smoking", "fire", "flame", "flames", "smell", "burnt"],
+    "communication": [
+        "communication", "communicate", "communicating", "comm", "comms",
+        "connect", "connection", "offline", "network", "link", "rs485", "can",
+    ],
+    "display": ["display", "screen", "hmi", "dashboard", "monitor", "touchscreen"],
+    "emergency": ["emergency", "esd", "estop", "mushroom", "red"],
+    "mains": ["mains", "grid", "supply", "input", "utility", "power"],
+    "low": ["low", "under", "undervoltage", "undercurrent", "drop", "dropping", "sag", "less"],
+    "high": ["high", "over", "overvoltage", "overcurrent", "exceeds", "exceeded", "spike", "surge", "above"],
+    "voltage": ["voltage", "volt", "volts", "undervoltage", "overvoltage"],
+    "current": ["current", "amp", "amps", "ampere", "undercurrent", "overcurrent"],
+    "tamper": ["tamper", "tampered", "door", "opened", "lid", "panel"],
+    "rfid": ["rfid", "card", "tag", "badge", "tap"],
+    "meter": ["meter", "metering", "energy", "kwh"],
+    "fuse": ["fuse", "blown", "fused"],
+    "authentication": [
+        "authentication", "auth", "authorize", "authorise", "authorized",
+        "authorised", "deauthorised", "login", "unauthorized", "unauthorised",
+    ],
+    "disconnected": ["disconnected", "unplugged", "removed", "pulled", "detached"],
+    "insulation": ["insulation", "isolation", "isolated", "insulated"],
+    "vehicle": ["ev", "car", "vehicle", "bike", "scooter"],
+    "stopped": ["stop", "stopped", "stops", "halted", "ended", "terminated", "interrupted"],
+    "server": ["server", "backend", "cloud", "ocpp", "remote", "remotely"],
+    "rectifier": ["rectifier", "rectifiers", "module", "modules", "charger"],
+    "contactor": ["contactor", "relay", "clicking", "click"],
+    "precharge": ["precharge", "pre"],
+    "trip": ["trip", "tripped", "tripping", "breaker", "mcb", "rccb"],
+}
+
+_WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+class HashingEmbedder:
+    """
+    Stateless text → sparse feature hashing.
+    
+    Feature ids are stable across processes (crc32, not Python's salted
+    hash), so persisted vectors stay valid.
+    """
+    
+    VERSION = 1
+    
+    # Relative feature weights
+    WORD_WEIGHT = 1.0
+    CONCEPT_WEIGHT = 1.5
+    TRIGRAM_WEIGHT = 0.3
+    
+    def __init__(self, dim: int = 1024, concepts: Optional[Dict[str, List[str]]] = None):
+        """
+        Args:
+            dim: Hash space size (power of two)
+            concepts: Concept → words lexicon (defaults to DOMAIN_CONCEPTS)
+        """
+        self.dim = dim
+        self.concepts = DOMAIN_CONCEPTS if concepts is None else concepts
+        self.word_concepts: Dict[str, List[str]] = {}
+        for concept, words in self.concepts.items():
+            for word in words:
+                self.word_concepts.setdefault(word, []).append(concept)
+    
+    @property
+    def signature(self) -> str:
+        """Identifies the vectorizer configuration (persisted indexes must match)."""
+        lexicon = zlib.crc32(json.dumps(self.concepts, sort_keys=True).encode("utf-8"))
+        return f"hash-v{self.VERSION}-{self.dim}-{lexicon:08x}"
+    
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        h = zlib.crc32(feature.encode("utf-8"))
+        return h % self.dim, (1.0 if h & 0x80000000 else -1.0)
+    
+    def features(self, text: str) -> Dict[int, float]:
+        """
+        Hash a text into signed bucket weights.
+        
+        Args:
+            text: Raw or normalized text
+        
+        Returns:
+            bucket → weight
+        """
+        weights: Dict[int, float] = {}
+        
+        def add(feature: str, weight: float) -> None:
+            bucket, sign = self._bucket(feature)
+            weights[bucket] = weights.get(bucket, 0.0) + sign * weight
+        
+        for word in _WORD_PATTERN.findall(text.lower()):
+            if word in STOP_WORDS or len(word) < 2:
+                continue
+            add(f"w:{word}", self.WORD_WEIGHT)
+            for concept in self.word_concepts.get(word, ()):
+                add(f"c:{concept}", self.CONCEPT_WEIGHT)
+            if len(word) > 3:
+                padded = f"<{word}>"
+                for i in range(len(padded) - 2):
+                    add(f"g:{padded[i:i + 3]}", self.TRIGRAM_WEIGHT)
+        
+        return weights
+    
+    def embed(self, text: str, idf=None) -> "np.ndarray":
+        """
+        Embed a text as an L2-normalized dense vector.
+        
+        Args:
+            text: Text to embed
+            idf: Optional per-bucket IDF weights
+        
+        Returns:
+            float32 vector of length dim (all zeros for texts without features)
+        """
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for bucket, weight in self.features(text).items():
+            vector[bucket] = weight
+        if idf is not None:
+            vector *= idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+def _kmeans(vectors, clusters: int, iterations: int = 10, seed: int = 0):
+    """Spherical k-means on normalized rows; returns unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > 20000:
+        sample = vectors[rng.choice(len(vectors), 20000, replace=False)]
+    
+    centroids = sample[rng.choice(len(sample), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for cluster in range(clusters):
+            members = sample[assignment == cluster]
+            if len(members):
+                centroids[cluster] = members.sum(axis=0)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms == 0, 1, norms)
+    return centroids.astype(np.float32)
+
+
+class SemanticIndex:
+    """
+    Int8-quantized embedding matrix with an IVF approximate search.
+    """
+    
+    # Below this many documents every row is scored (one list)
+    EXACT_SEARCH_LIMIT = 1024
+    
+    # IVF lists per sqrt(documents): ~sqrt(n) / 4 rows per list
+    LISTS_PER_SQRT = 4
+    
+    def __init__(self, embedder: HashingEmbedder, idf, vectors, scales, centroids, list_offsets, list_ids):
+        """
+        Wrap built or memory-mapped arrays (use build() or load()).
+        
+        Args:
+            embedder: Vectorizer used for documents and queries
+            idf: float32 [dim] bucket IDF weights
+            vectors: int8 [n, dim] quantized document vectors, grouped by list
+            scales: float32 [n] dequantization scale per row
+            centroids: float32 [dim, lists] IVF centroids, one column per list
+            list_offsets: int64 [lists + 1] first row of each list
+            list_ids: int32 [n] document id of each row
+        """
+        self.embedder = embedder
+        self.idf = idf
+        self.vectors = vectors
+        self.scales = scales
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+    
+    def __len__(self) -> int:
+        return len(self.scales)
+    
+    @classmethod
+    def build(cls, texts: Sequence[str], embedder: Optional[HashingEmbedder] = None) -> "SemanticIndex":
+        """
+        Embed documents and build the IVF index.
+        
+        Args:
+            texts: Document texts (document id = position)
+            embedder: Vectorizer (defaults to HashingEmbedder())
+        
+        Returns:
+            Built SemanticIndex
+        """
+        embedder = embedder or HashingEmbedder()
+        features = [embedder.features(text) for text in texts]
+        
+        # IDF over hash buckets
+        document_frequency = np.zeros(embedder.dim, dtype=np.float32)
+        for doc in features:
+            document_frequency[list(doc)] += 1
+        idf = np.log((1 + len(features)) / (1 + document_frequency)).astype(np.float32) + 1
+        
+        dense = np.zeros((len(features), embedder.dim), dtype=np.float32)
+        for row, doc in enumerate(features):
+            dense[row, list(doc)] = list(doc.values())
+        dense *= idf
+        norms = np.linalg.norm(dense, axis=1, keepdims=True)
+        dense /= np.where(norms == 0, 1, norms)
+        
+        peaks = np.abs(dense).max(axis=1) if len(dense) else np.zeros(0, dtype=np.float32)
+        scales = np.where(peaks == 0, 1, peaks / 127).astype(np.float32)
+        vectors = np.round(dense / scales[:, None]).astype(np.int8)
+        
+        if len(dense) <= cls.EXACT_SEARCH_LIMIT:
+            centroids = np.zeros((embedder.dim, 1), dtype=np.float32)
+            assignment = np.zeros(len(dense), dtype=np.int64)
+        else:
+            clusters = min(len(dense) // 16, int(cls.LISTS_PER_SQRT * np.sqrt(len(dense))))
+            centroids = np.ascontiguousarray(_kmeans(dense, clusters).T)
+            assignment = np.concatenate([
+                np.argmax(dense[start:start + 8192] @ centroids, axis=1)
+                for start in range(0, len(dense), 8192)
+            ])
+        
+        order = np.argsort(assignment, kind="stable").astype(np.int32)
+        counts = np.bincount(assignment, minlength=centroids.shape[1])
+        list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        
+        return cls(embedder, idf, vectors[order], scales[order], centroids, list_offsets, order)
+    
+    def search(self, text: str, top_k: int = 1, nprobe: int = 8) -> List[Tuple[int, float]]:
+        """
+        Find the documents closest to a text.
+        
+        Args:
+            text: Query text
+            top_k: Maximum number of results
+            nprobe: IVF lists searched (more is slower and more exact)
+        
+        Returns:
+            List of (doc_id, cosine similarity) tuples, best first
+        """
+        query = self.embedder.embed(text, self.idf)
+        dims = np.flatnonzero(query)
+        if not len(dims) or not len(self):
+            return []
+        weights = query[dims]
+        
+        lists_count = self.centroids.shape[1]
+        if lists_count == 1:
+            lists = [0]
+        else:
+            nprobe = min(nprobe, lists_count)
+            lists = np.argpartition(-(weights @ self.centroids[dims]), nprobe - 1)[:nprobe]
+        
+        rows, scores = [], []
+        for l in lists:
+            start, end = int(self.list_offsets[l]), int(self.list_offsets[l + 1])
+            if start < end:
+                block = self.vectors[start:end][:, dims].astype(np.float32)
+                rows.append(np.arange(start, end))
+                scores.append((block @ weights) * self.scales[start:end])
+        if not rows:
+            return []
+        
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        top_k = min(top_k, len(rows))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(self.list_ids[rows[i]]), float(scores[i])) for i in best]
+    
+    def write(self, path: str, fingerprint: str) -> None:
+        """
+        Persist the index (replaced atomically).
+        
+        Args:
+            path: Destination file
+            fingerprint: Identifies the catalog content the index was built from
+        """
+        meta = {
+            "signature": self.embedder.signature,
+            "fingerprint": fingerprint,
+            "dim": self.embedder.dim,
+        }
+        write_snapshot(path, {
+            "meta": json.dumps(meta).encode("utf-8"),
+            "idf": self.idf.astype("<f4").tobytes(),
+            "vectors": self.vectors.tobytes(),
+            "scales": self.scales.astype("<f4").tobytes(),
+            "centroids": self.centroids.astype("<f4").tobytes(),
+            "lists.offsets": self.list_offsets.astype("<i8").tobytes(),
+            "lists.ids": self.list_ids.astype("<i4").tobytes(),
+        })
+    
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        fingerprint: str,
+        embedder: Optional[HashingEmbedder] = None
+    ) -> Optional["SemanticIndex"]:
+        """
+        Memory-map a persisted index.
+        
+        Args:
+            path: Index file
+            fingerprint: Expected catalog fingerprint
+            embedder: Vectorizer the index must have been built with
+        
+        Returns:
+            SemanticIndex, or None if the file was built from other content
+            or with another vectorizer configuration
+        
+        Raises:
+            SnapshotError: If the file is corrupt
+        """
+        embedder = embedder or HashingEmbedder()
+        reader = SnapshotReader(path)
+        meta = reader.json("meta")
+        if meta.get("signature") != embedder.signature or meta.get("fingerprint") != fingerprint:
+            return None
+        
+        return cls(
+            embedder,
+            reader.array("idf", "<f4"),
+            reader.array("vectors", "i1").reshape(-1, embedder.dim),
+            reader.array("scales", "<f4"),
+            reader.array("centroids", "<f4").reshape(embedder.dim, -1),
+            reader.array("lists.offsets", "<i8"),
+            reader.array("lists.ids", "<i4"),
+        )
@@ -0,0 +1,110 @@
+"""
+Domain Synonym Table
+Field vocabulary ("plug", "hot", "earthing") mapped onto catalog vocabulary
+("gun", "temperature", "earth").
+
+The table is loaded from synonyms.json next to error_codes_complete.json:
+    
+    {
+        "gun": ["plug", "connector", "nozzle"],
+        "temperature": ["hot", "overheat", "thermal"]
+    }
+
+Each key and its words form one group of interchangeable terms. Groups are
+compiled into the indexes at load time (every word of a group gets postings
+for the others), so a query pays nothing extra for synonym matching.
+"""
+import hashlib
+import json
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from ..core.logger import setup_logger
+from .text_utils import tokenize
+
+logger = setup_logger(__name__)
+
+# File name looked up next to the default catalog JSON
+SYNONYMS_FILENAME = "synonyms.json"
+
+
+class SynonymTable:
+    """
+    Symmetric term → synonyms mapping over index terms.
+    """
+    
+    def __init__(self, groups: Optional[Mapping[str, Iterable[str]]] = None):
+        """
+        Compile synonym groups.
+        
+        Words are normalized with tokenize(), so they match index terms;
+        words that are not a single index term (stop words, words of two
+        characters or less, phrases) are skipped.
+        
+        Args:
+            groups: Catalog term → field words used for it
+        """
+        members: Dict[str, List[str]] = {}
+        
+        for head, words in (groups or {}).items():
+            group = []
+            for word in [head, *words]:
+                terms = tokenize(word)
+                if len(terms) != 1:
+                    logger.warning(f"Skipping synonym '{word}' (not a single index term)")
+                    continue
+                if terms[0] not in group:
+                    group.append(terms[0])
+            
+            # A word in several groups expands to all of them
+            for term in group:
+                expansion = members.setdefault(term, [])
+                expansion.extend(other for other in group if other != term and other not in expansion)
+        
+        self.expansions: Dict[str, Tuple[str, ...]] = {
+            term: tuple(expansion) for term, expansion in members.items() if expansion
+        }
+    
+    @classmethod
+    def from_file(cls, path: str) -> "SynonymTable":
+        """
+        Load synonym groups from a JSON file.
+        
+        Args:
+            path: synonyms.json
+        
+        Returns:
+            SynonymTable (empty if the file is missing or invalid)
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                groups = json.load(f)
+        except FileNotFoundError:
+            logger.info(f"No synonym table at {path}, synonym expansion disabled")
+            return cls()
+        except json.JSONDecodeError as e:
+            logger.error(f"Invalid JSON in synonym table {path}: {e}")
+            return cls()
+        
+        table = cls(groups)
+        logger.info(f"Loaded {len(table)} synonym terms from {path}")
+        return table
+    
+    def __len__(self) -> int:
+        return len(self.expansions)
+    
+    def get(self, term: str) -> Tuple[str, ...]:
+        """
+        Get the synonyms of an index term.
+        
+        Args:
+            term: Index term (see tokenize())
+        
+        Returns:
+            Synonyms, without the term itself (empty if none)
+        """
+        return self.expansions.get(term, ())
+    
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the compiled table (indexes built with another table are stale)."""
+        encoded = json.dumps(self.expansions, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
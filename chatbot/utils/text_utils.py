@@ -3,10 +3,50 @@ Text Processing Utilities
 Smart text handling for EV charging diagnostic chatbot.
 """
 import re
-from typing import Optional
+from typing import Iterator, NamedTuple, Optional
 from difflib import SequenceMatcher
 
 
+# Common English stop words ignored by keyword extraction and tokenization
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'is', 'it', 'this', 'that', 'i', 'my'
+})
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Devanagari digits (०-९) are accepted wherever ASCII digits are
+_DEVANAGARI_DIGITS = str.maketrans('०१२३४५६७८९', '0123456789')
+
+# OCR-style letter/digit confusions accepted inside prefixed codes (ER0O1)
+_OCR_DIGITS = str.maketrans('oOiIlL', '001111')
+
+# Spelled-out prefixes that all mean the standard "ER" prefix
+ER_PREFIXES = frozenset({'e', 'er', 'err', 'error'})
+
+# Single scanner for every supported error code surface form:
+# ER001, er-001, ER 001, ERR001, E1, "error 15", "error code 1", 301
+_CODE_SCANNER = re.compile(
+    r'(?<![a-z0-9])'
+    r'(?:(?P<word>error\s*code|error|err|er)\s*[-_:#]?\s*|(?P<glued>[a-z]{1,3})[-_]?)?'
+    r'(?P<digits>[0-9o][0-9oil]{0,4})'
+    r'(?![a-z0-9])',
+    re.IGNORECASE
+)
+
+# Words that mark a bare number as an error code ("showing 301")
+_CODE_CONTEXT_KEYWORDS = ('error', 'code', 'fault', 'issue', 'problem', 'showing')
+
+
+class CodeToken(NamedTuple):
+    """An error code candidate found in a message."""
+    
+    prefix: str   # "ER", "" for bare numbers, or another vendor prefix ("F")
+    digits: str   # Digits as typed, with OCR confusions corrected ("0O1" → "001")
+    surface: str  # Prefix letters as typed + digits, used for typo correction
+    start: int    # Character offset in the message
+
+
 def normalize_text(text: str) -> str:
     """
     Normalize text for processing.
@@ -29,61 +69,116 @@ def normalize_text(text: str) -> str:
     return text
 
 
-def extract_error_pattern(message: str) -> Optional[str]:
+def scan_error_codes(message: str) -> Iterator[CodeToken]:
     """
-    Extract error code patterns from user message using regex.
+    Scan a message once for error code candidates, in order of appearance.
     
     Supports patterns like:
-    - ER001, ER015 (standard format)
-    - er001 (lowercase)
-    - Error 15, ERROR 001 (with 'error' prefix)
-    - 301, 404 (numeric codes)
+    - ER001, er-001, ER 001, ERR001 (standard format and variants)
+    - Error 15, ERROR CODE 001 (with 'error' prefix)
     - E301, E15 (E prefix)
+    - ER0O1 (OCR-style letter/digit confusion)
+    - ३०१ (Devanagari digits)
+    - 301, 404 (bare numbers, only when the message is just the number or
+      mentions error/code/fault/issue/problem/showing)
     
     Args:
         message: User's input message
         
-    Returns:
-        Extracted error code in standardized format or None
+    Yields:
+        CodeToken for each candidate
     """
     if not message:
-        return None
+        return
     
-    # Pattern 1: ER### format (case insensitive)
-    pattern1 = re.search(r'\b(er\d{3,4})\b', message, re.IGNORECASE)
-    if pattern1:
-        return pattern1.group(1).upper()
-    
-    # Pattern 2: "error ###" or "error code ###"
-    pattern2 = re.search(r'\berror\s*(?:code)?\s*(\d{1,4})\b', message, re.IGNORECASE)
-    if pattern2:
-        error_num = pattern2.group(1).zfill(3)
-        return f"ER{error_num}"
-    
-    # Pattern 3: E### format
-    pattern3 = re.search(r'\b(e\d{1,4})\b', message, re.IGNORECASE)
-    if pattern3:
-        error_num = pattern3.group(1)[1:].zfill(3)
-        return f"ER{error_num}"
-    
-    # Pattern 4: Standalone 3-4 digit numbers (less specific, check context)
-    pattern4 = re.search(r'\b(\d{3,4})\b', message)
-    if pattern4:
-        # Return as-is if it's a short message (likely user typing just the code)
-        # or if context keywords suggest it's an error code
-        message_stripped = message.strip()
-        if len(message_stripped) <= 4 or re.match(r'^\d{3,4}\s*$', message_stripped):
-            # Just a number - return as-is, let diagnostic engine handle format
-            return pattern4.group(1)
+    text = message.translate(_DEVANAGARI_DIGITS)
+    bare_numbers_allowed = None  # Evaluated lazily, most messages never need it
+    
+    for match in _CODE_SCANNER.finditer(text):
+        raw_digits = match.group('digits')
+        if not any(char.isdigit() for char in raw_digits):
+            continue
+        
+        word = match.group('word')
+        glued = match.group('glued')
         
-        # Check for context keywords
-        context_keywords = ['error', 'code', 'fault', 'issue', 'problem', 'showing']
-        if any(keyword in message.lower() for keyword in context_keywords):
-            return pattern4.group(1)
+        if word or glued:
+            letters = (word or glued).lower()
+            prefix = 'ER' if letters.split()[0] in ER_PREFIXES else letters.upper()
+            digits = raw_digits.translate(_OCR_DIGITS)
+            surface = (glued.upper() if glued else 'ER') + digits
+        else:
+            if not raw_digits.isdigit() or not 3 <= len(raw_digits) <= 4:
+                continue
+            if bare_numbers_allowed is None:
+                stripped = text.strip()
+                bare_numbers_allowed = (
+                    len(stripped) <= 4
+                    or re.match(r'^\d{3,4}\s*$', stripped) is not None
+                    or any(keyword in text.lower() for keyword in _CODE_CONTEXT_KEYWORDS)
+                )
+            if not bare_numbers_allowed:
+                continue
+            prefix = ''
+            digits = raw_digits
+            surface = raw_digits
+        
+        yield CodeToken(prefix=prefix, digits=digits, surface=surface, start=match.start())
+
+
+def extract_error_pattern(message: str) -> Optional[str]:
+    """
+    Extract error code patterns from user message using regex.
+    
+    See scan_error_codes() for the supported formats. Catalog-aware
+    resolution (aliases, typo tolerance) lives in ErrorCodeResolver.
+    
+    Args:
+        message: User's input message
+        
+    Returns:
+        Extracted error code in standardized format or None
+    """
+    for token in scan_error_codes(message):
+        if token.prefix == 'ER':
+            return f"ER{token.digits.zfill(3)}"
+        return f"{token.prefix}{token.digits}"
     
     return None
 
 
+def title_similarity(query: str, title: str, min_score: float = 0.0) -> float:
+    """
+    Score how well a query matches an error title.
+    
+    Combines the character-level SequenceMatcher ratio (60%) with the share
+    of query words present in the title (40%). Cheap upper bounds on the
+    ratio are checked first, so titles that cannot reach min_score are
+    rejected without running the full comparison.
+    
+    Args:
+        query: Normalized query text
+        title: Normalized title text
+        min_score: Score the caller needs to beat (0.0 disables pruning)
+        
+    Returns:
+        Combined score between 0.0 and 1.0 (0.0 when pruned)
+    """
+    query_words = set(query.split())
+    title_words = set(title.split())
+    word_overlap = len(query_words & title_words) / len(query_words) if query_words else 0
+    word_score = word_overlap * 0.4
+    
+    matcher = SequenceMatcher(None, query, title)
+    if min_score > 0.0:
+        if matcher.real_quick_ratio() * 0.6 + word_score < min_score:
+            return 0.0
+        if matcher.quick_ratio() * 0.6 + word_score < min_score:
+            return 0.0
+    
+    return (matcher.ratio() * 0.6) + word_score
+
+
 def fuzzy_match_title(query: str, titles: list[str], threshold: float = 0.6) -> Optional[str]:
     """
     Perform fuzzy matching on error titles/descriptions.
@@ -93,6 +188,9 @@ def fuzzy_match_title(query: str, titles: list[str], threshold: float = 0.6) ->
     - "rfid fail" → "RFID Communication Fail"
     - "ocpp communication" → "OCPP Communication Error"
     
+    This scans every title; DiagnosticEngine uses a prebuilt TrigramIndex to
+    narrow the candidates before calling title_similarity().
+    
     Args:
         query: Search query (normalized)
         titles: List of error titles to match against
@@ -109,18 +207,11 @@ def fuzzy_match_title(query: str, titles: list[str], threshold: float = 0.6) ->
     best_ratio = 0.0
     
     for title in titles:
-        title_normalized = normalize_text(title)
-        
-        # Calculate similarity ratio
-        ratio = SequenceMatcher(None, query_normalized, title_normalized).ratio()
-        
-        # Also check if query words are in title (partial match boost)
-        query_words = set(query_normalized.split())
-        title_words = set(title_normalized.split())
-        word_overlap = len(query_words & title_words) / len(query_words) if query_words else 0
-        
-        # Combined score
-        combined_score = (ratio * 0.6) + (word_overlap * 0.4)
+        combined_score = title_similarity(
+            query_normalized,
+            normalize_text(title),
+            min_score=max(threshold, best_ratio)
+        )
         
         if combined_score > best_ratio and combined_score >= threshold:
             best_ratio = combined_score
@@ -177,17 +268,33 @@ def extract_keywords(text: str) -> list[str]:
     if not text:
         return []
     
-    # Remove common stop words
-    stop_words = {
-        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-        'of', 'with', 'by', 'from', 'is', 'it', 'this', 'that', 'i', 'my'
-    }
-    
     # Normalize and split
     normalized = normalize_text(text)
     words = normalized.split()
     
     # Filter out stop words and short words
-    keywords = [w for w in words if w not in stop_words and len(w) > 2]
+    keywords = [w for w in words if w not in STOP_WORDS and len(w) > 2]
     
     return keywords
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into index terms for keyword search.
+    
+    Unlike extract_keywords(), punctuation is treated as a separator so that
+    "comm." and "comm" or "(local)" and "local" produce the same term.
+    
+    Args:
+        text: Input text
+        
+    Returns:
+        List of lowercase alphanumeric terms (stop words and short words removed)
+    """
+    if not text:
+        return []
+    
+    return [
+        term for term in _TOKEN_PATTERN.findall(normalize_text(text))
+        if term not in STOP_WORDS and len(term) > 2
+    ]
@@ -0,0 +1,265 @@
+"""
+Vectorized Search Indexes (optional NumPy backend)
+Compiled, array-based versions of the catalog search indexes.
+
+The pure-Python indexes in search_index.py walk posting lists entry by entry.
+For very large catalogs (tens of thousands of vendor codes) the same postings
+are compiled here into CSR (compressed sparse row) arrays with precomputed
+weights, so each query is scored with a single sparse matrix-vector product
+(np.bincount over the gathered postings) regardless of catalog size.
+
+NumPy is optional. Use numpy_available() before building these indexes.
+"""
+from typing import Dict, Iterable, List, Tuple
+from .search_index import BM25Index, TrigramIndex
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+
+def numpy_available() -> bool:
+    """
+    Check if the NumPy backend can be used.
+    
+    Returns:
+        True if numpy is importable, False otherwise
+    """
+    return np is not None
+
+
+def _compile_postings(postings: Dict[str, Dict[int, float]]) -> tuple:
+    """
+    Compile term → {doc: weight} postings into CSR arrays.
+    
+    Terms are numbered in sorted order so the vocabulary can also be stored
+    as a sorted string table (see catalog_snapshot.py) and searched by bisection.
+    
+    Returns:
+        (vocabulary, offsets, doc_ids, weights)
+    """
+    vocabulary: Dict[str, int] = {}
+    offsets = [0]
+    doc_ids: List[int] = []
+    weights: List[float] = []
+    
+    for term, docs in sorted(postings.items()):
+        vocabulary[term] = len(vocabulary)
+        doc_ids.extend(docs.keys())
+        weights.extend(docs.values())
+        offsets.append(len(doc_ids))
+    
+    return (
+        vocabulary,
+        np.asarray(offsets, dtype=np.int64),
+        np.asarray(doc_ids, dtype=np.int32),
+        np.asarray(weights, dtype=np.float32),
+    )
+
+
+def _gather(offsets, term_ids) -> "np.ndarray":
+    """
+    Build the positions of every posting belonging to the given terms.
+    
+    Equivalent to concatenating range(offsets[t], offsets[t + 1]) for each
+    term, without a Python-level loop.
+    """
+    starts = offsets[term_ids]
+    lengths = offsets[term_ids + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    
+    run_starts = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return run_starts + np.arange(total, dtype=np.int64)
+
+
+def _top_k(scores, top_k: int, mask=None) -> List[Tuple[int, float]]:
+    """Return the top_k (doc_id, score) pairs with positive score, best first."""
+    if mask is not None:
+        scores = np.where(mask, scores, 0.0)
+    
+    candidates = np.flatnonzero(scores > 0)
+    if candidates.size == 0:
+        return []
+    
+    if candidates.size > top_k:
+        best = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+        candidates = candidates[best]
+    
+    # Highest score first, lowest doc id first on ties (matches BM25Index order)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return [(int(doc_id), float(scores[doc_id])) for doc_id in candidates[order]]
+
+
+class CompiledBM25Index:
+    """
+    BM25 index compiled into CSR arrays with precomputed per-posting weights.
+    
+    Drop-in replacement for BM25Index.search() when documents are identified
+    by contiguous integer positions (0..n-1).
+    """
+    
+    def __init__(self, index: BM25Index):
+        """
+        Compile a finalized BM25Index.
+        
+        Args:
+            index: Finalized BM25Index with integer document ids
+        """
+        weighted = {}
+        for term, docs in index.postings.items():
+            idf = index.idf[term]
+            weighted[term] = {
+                doc_id: idf * tf * (index.k1 + 1) / (tf + index._length_norms[doc_id])
+                for doc_id, tf in docs.items()
+            }
+        
+        self.doc_count = max(index.doc_lengths, default=-1) + 1
+        self.vocabulary, self.offsets, self.doc_ids, self.weights = _compile_postings(weighted)
+    
+    @classmethod
+    def from_arrays(cls, vocabulary, offsets, doc_ids, weights, doc_count: int) -> "CompiledBM25Index":
+        """
+        Wrap already compiled arrays (e.g. memory-mapped from a catalog snapshot).
+        
+        Args:
+            vocabulary: Mapping of term → row with a get() method
+            offsets: CSR row offsets (int64)
+            doc_ids: Posting document ids (int32)
+            weights: Posting BM25 weights (float32)
+            doc_count: Number of documents
+        
+        Returns:
+            CompiledBM25Index sharing the given arrays
+        """
+        compiled = cls.__new__(cls)
+        compiled.vocabulary = vocabulary
+        compiled.offsets = offsets
+        compiled.doc_ids = doc_ids
+        compiled.weights = weights
+        compiled.doc_count = doc_count
+        return compiled
+    
+    def __len__(self) -> int:
+        return self.doc_count
+    
+    def __contains__(self, term: str) -> bool:
+        """Check whether any document is posted under a term."""
+        return self.vocabulary.get(term) is not None
+    
+    def search(
+        self,
+        tokens: Iterable[str],
+        top_k: int = 5,
+        min_terms: int = 1
+    ) -> List[Tuple[int, float]]:
+        """
+        Rank documents against query terms with one vectorized pass.
+        
+        Args:
+            tokens: Query terms (duplicates are ignored)
+            top_k: Maximum number of results
+            min_terms: Minimum number of distinct query terms a document must contain
+        
+        Returns:
+            List of (doc_id, score) tuples, best first
+        """
+        term_ids = [self.vocabulary.get(t) for t in dict.fromkeys(tokens)]
+        term_ids = [term_id for term_id in term_ids if term_id is not None]
+        if not term_ids:
+            return []
+        
+        positions = _gather(self.offsets, np.asarray(term_ids, dtype=np.int64))
+        docs = self.doc_ids[positions]
+        scores = np.bincount(docs, weights=self.weights[positions], minlength=self.doc_count)
+        
+        mask = None
+        if min_terms > 1:
+            mask = np.bincount(docs, minlength=self.doc_count) >= min_terms
+        
+        return _top_k(scores, top_k, mask)
+
+
+class CompiledTrigramIndex:
+    """
+    Trigram index compiled into CSR arrays.
+    
+    Drop-in replacement for TrigramIndex.candidates() when documents are
+    identified by contiguous integer positions (0..n-1).
+    """
+    
+    def __init__(self, index: TrigramIndex):
+        """
+        Compile a populated TrigramIndex.
+        
+        Args:
+            index: TrigramIndex with integer document ids
+        """
+        self.q = index.q
+        self.texts = index.texts
+        self.doc_count = max(index.texts, default=-1) + 1
+        
+        postings = {gram: dict.fromkeys(docs, 1.0) for gram, docs in index.postings.items()}
+        self.vocabulary, self.offsets, self.doc_ids, _ = _compile_postings(postings)
+        
+        gram_counts = np.ones(self.doc_count, dtype=np.float32)
+        for doc_id, count in index.gram_counts.items():
+            gram_counts[doc_id] = max(count, 1)
+        self.gram_counts = gram_counts
+    
+    @classmethod
+    def from_arrays(cls, vocabulary, offsets, doc_ids, gram_counts, texts, q: int = 3) -> "CompiledTrigramIndex":
+        """
+        Wrap already compiled arrays (e.g. memory-mapped from a catalog snapshot).
+        
+        Args:
+            vocabulary: Mapping of q-gram → row with a get() method
+            offsets: CSR row offsets (int64)
+            doc_ids: Posting document ids (int32)
+            gram_counts: Distinct q-grams per document (float32, at least 1)
+            texts: Indexed text by document id
+            q: Gram length used when the index was built
+        
+        Returns:
+            CompiledTrigramIndex sharing the given arrays
+        """
+        compiled = cls.__new__(cls)
+        compiled.q = q
+        compiled.texts = texts
+        compiled.doc_count = len(gram_counts)
+        compiled.vocabulary = vocabulary
+        compiled.offsets = offsets
+        compiled.doc_ids = doc_ids
+        compiled.gram_counts = gram_counts
+        return compiled
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def grams(self, text: str) -> set:
+        """Get the distinct q-grams of a text (same padding as TrigramIndex)."""
+        padded = f" {text} "
+        return {padded[i:i + self.q] for i in range(len(padded) - self.q + 1)}
+    
+    def candidates(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """
+        Generate candidate documents by trigram coverage with one vectorized pass.
+        
+        Args:
+            query: Normalized query text
+            limit: Maximum number of candidates
+        
+        Returns:
+            List of (doc_id, coverage) tuples, best first
+        """
+        gram_ids = [self.vocabulary.get(g) for g in self.grams(query)]
+        gram_ids = [gram_id for gram_id in gram_ids if gram_id is not None]
+        if not gram_ids:
+            return []
+        
+        positions = _gather(self.offsets, np.asarray(gram_ids, dtype=np.int64))
+        shared = np.bincount(self.doc_ids[positions], minlength=self.doc_count)
+        
+        return _top_k(shared / self.gram_counts, limit)
@@ -0,0 +1,154 @@
+"""
+Intent Classifier Trainer
+Trains the hashed n-gram intent classifier from labeled chat logs.
+
+Usage:
+    python train_intent_classifier.py labeled_chats.jsonl
+    python train_intent_classifier.py logs/*.jsonl --holdout 0.2 --threshold 0.8
+
+Input files hold one JSON object per line with the message and its intent:
+    
+    {"message": "my wallet money was deducted twice", "intent": "wallet"}
+
+Lines without a message or intent are skipped (use --text-field and
+--label-field for other log layouts). A share of the messages is held out
+to report accuracy and how many predictions reach the confidence threshold,
+then the model is trained on all messages and written to
+INTENT_CLASSIFIER_PATH. Restart the application to load it. Requires numpy.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from chatbot.core.config import get_settings
+from chatbot.engine.intent_engine import IntentEngine
+from chatbot.utils.intent_classifier import IntentClassifier
+from chatbot.utils.text_utils import normalize_text
+from chatbot.utils.vector_index import numpy_available
+
+
+def read_samples(paths: List[Path], text_field: str, label_field: str) -> List[Tuple[str, str]]:
+    """
+    Read labeled messages from JSON lines files.
+    
+    Args:
+        paths: Input files
+        text_field: Message key
+        label_field: Intent key
+    
+    Returns:
+        (normalized message, intent) pairs
+    """
+    samples = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"{path}:{line_number}: skipping invalid JSON")
+                    continue
+                
+                text = normalize_text(str(record.get(text_field) or ""))
+                intent = str(record.get(label_field) or "").strip()
+                if text and intent:
+                    samples.append((text, intent))
+    return samples
+
+
+def evaluate(classifier: IntentClassifier, samples: List[Tuple[str, str]], threshold: float) -> str:
+    """
+    Summarize held-out accuracy and confident-prediction coverage.
+    
+    Args:
+        classifier: Model trained without the held-out samples
+        samples: Held-out (message, intent) pairs
+        threshold: Confidence threshold used by the application
+    
+    Returns:
+        Report line
+    """
+    correct = confident = confident_correct = 0
+    for text, intent in samples:
+        prediction = classifier.predict(text)
+        if prediction is None:
+            continue
+        predicted, probability = prediction
+        correct += predicted == intent
+        if probability >= threshold:
+            confident += 1
+            confident_correct += predicted == intent
+    
+    total = len(samples)
+    precision = confident_correct / confident if confident else 0.0
+    return (
+        f"held out {total}: accuracy {correct / total:.1%}, "
+        f"{confident / total:.1%} at or above {threshold} "
+        f"(precision {precision:.1%})"
+    )
+
+
+def main() -> int:
+    """Train the classifier from the command line."""
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sources", nargs="+", type=Path, help="Labeled JSON lines files")
+    parser.add_argument("--output", type=Path, default=Path(settings.INTENT_CLASSIFIER_PATH),
+                        help="Model file (default: INTENT_CLASSIFIER_PATH)")
+    parser.add_argument("--text-field", default="message", help="Message key (default: message)")
+    parser.add_argument("--label-field", default="intent", help="Intent key (default: intent)")
+    parser.add_argument("--dim", type=int, default=1 << 15, help="Hash buckets (default: 32768)")
+    parser.add_argument("--alpha", type=float, default=0.1, help="Smoothing (default: 0.1)")
+    parser.add_argument("--holdout", type=float, default=0.1,
+                        help="Share of messages held out for evaluation (default: 0.1, 0 disables)")
+    parser.add_argument("--threshold", type=float, default=settings.INTENT_CLASSIFIER_THRESHOLD,
+                        help="Confidence threshold to report on (default: INTENT_CLASSIFIER_THRESHOLD)")
+    parser.add_argument("--seed", type=int, default=0, help="Holdout shuffle seed")
+    args = parser.parse_args()
+    
+    if not numpy_available():
+        print("numpy is required to train the intent classifier (pip install numpy)")
+        return 1
+    
+    samples = read_samples(args.sources, args.text_field, args.label_field)
+    if not samples:
+        print("No labeled messages found")
+        return 1
+    
+    counts = {}
+    for _, intent in samples:
+        counts[intent] = counts.get(intent, 0) + 1
+    print(f"{len(samples)} messages: " + ", ".join(f"{intent} {count}" for intent, count in sorted(counts.items())))
+    
+    unknown = set(counts) - set(IntentEngine().get_all_intents())
+    if unknown:
+        print(f"Note: intents without a flow mapping will route to the start node: {', '.join(sorted(unknown))}")
+    
+    try:
+        held_out = int(len(samples) * args.holdout)
+        if held_out:
+            shuffled = list(samples)
+            random.Random(args.seed).shuffle(shuffled)
+            classifier = IntentClassifier.train(shuffled[held_out:], dim=args.dim, alpha=args.alpha)
+            print(evaluate(classifier, shuffled[:held_out], args.threshold))
+        
+        start = time.perf_counter()
+        classifier = IntentClassifier.train(samples, dim=args.dim, alpha=args.alpha)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    except ValueError as e:
+        print(f"Cannot train: {e}")
+        return 1
+    
+    classifier.write(str(args.output))
+    print(f"-> {args.output} ({args.output.stat().st_size / 1024:.0f} KiB, {elapsed_ms:.0f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())